@@ -0,0 +1,206 @@
+"""
+Semantic cache of final answers for near-identical questions.
+
+Much of the traffic asks the same thing in different words ("weather in Jakarta now?",
+"how's Jakarta weather"). Questions are keyed on their intent: the grid cells of the places
+they name (the same cells as the Open-Meteo response cache), the topics they ask about, their
+time expressions, any other numbers, negation, the health conditions and activities they
+mention, and the data freshness window. A question with a time expression the key does not
+recognize ("the week before last") is never cached. Within one key, a stored answer is served
+only if the question is close enough to the one it answered, measured by the cosine
+similarity of small hashed bag-of-words and character-trigram embeddings, so "is it windy in
+Jakarta?" is not answered with the reply to "will it rain in Jakarta?".
+
+Callers that answer the same question in different ways (app.py's answer modes) pass a
+`scope`, so an answer is only served to requests made with the same settings.
+
+Entries expire at the next upstream refresh boundary, when the readings the answer was
+written from are replaced, so a cached answer is never staler than the data cache.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import math
+import re
+import threading
+
+import geocoder
+from topic_classifier import AIR_QUALITY_PATTERN, WEATHER_PATTERN, tokenize
+from weather_cache import response_cache
+
+# Minimum cosine similarity between a new question and a cached one to reuse its answer
+SIMILARITY_THRESHOLD = 0.85
+
+# Dimensions of the hashed embedding
+EMBEDDING_DIMENSIONS = 4096
+
+MAX_KEYS = 512
+MAX_ENTRIES_PER_KEY = 8
+
+# Words that do not change what is being asked once places, topics and times are in the key
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "it", "its", "in", "at", "on", "for", "of", "to", "and", "or",
+    "what", "whats", "how", "hows", "s", "like", "me", "tell", "show", "give", "please", "there", "i", "can",
+    "do", "does", "right", "now", "currently", "current", "today", "todays", "moment", "this",
+}
+
+# Time expressions kept apart in the key; questions without one are about current conditions
+WEEKDAYS = r"monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+MONTHS = r"january|february|march|april|may|june|july|august|september|october|november|december"
+COUNTS = r"\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|a\s+couple\s+of|a\s+few"
+UNITS = r"hours?|days?|weeks?|months?|years?"
+PARTS_OF_DAY = r"morning|afternoon|evening|night"
+TIME_PATTERN = re.compile(
+    rf"\b((in\s+)?({COUNTS})\s+({UNITS})(\s+(ago|from\s+now))?|"
+    rf"(this|next|last|past|coming|previous)\s+({PARTS_OF_DAY}|weekend|{UNITS}|{WEEKDAYS}|{MONTHS})|"
+    rf"(tomorrow|yesterday)(\s+({PARTS_OF_DAY}))?|tonight|weekend|hourly|forecast|"
+    rf"{WEEKDAYS}|{MONTHS}|(19|20)\d\d|\d{{1,2}}(:\d\d)?\s*(am|pm)|noon|midnight|"
+    rf"in\s+the\s+({PARTS_OF_DAY})|later\s+today)\b",
+    re.IGNORECASE,
+)
+# Words that signal a time expression; any left after the recognized ones make a question uncacheable
+TIME_WORD_PATTERN = re.compile(
+    rf"\b({UNITS}|{PARTS_OF_DAY}|ago|later|earlier|since|until|till|before|after|soon|upcoming|"
+    r"season|spring|summer|autumn|fall|winter|decade|fortnight|o'?clock|am|pm|date)\b",
+    re.IGNORECASE,
+)
+# Pollutant names whose digits are not numbers the question asks about
+POLLUTANT_PATTERN = re.compile(r"\b(pm\s*2[.,]?5|pm\s*10|no2|so2|o3|co2?)\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"(?<![\w.])\d+(?:[.,]\d+)?(?![\w.])")
+NEGATION_PATTERN = re.compile(r"n['’]t\b|\b(not|no|never|none|without)\b", re.IGNORECASE)
+# Health conditions, protective gear and activities that change the advice an answer gives
+QUALIFIER_PATTERN = re.compile(
+    r"\b(asthma\w*|copd|allerg\w*|hay\s*fever|pregnan\w*|elderly|senior\w*|bab(y|ies)|infants?|toddlers?|"
+    r"kids?|child\w*|heart|lungs?|respiratory|sensitive|masks?|respirators?|n95|ffp2|"
+    r"run\w*|jog\w*|cycl\w*|bik\w*|hik\w*|walk\w*|swim\w*|exercis\w*|workout|sport\w*|picnic\w*|"
+    r"beach|camp\w*|fly\w*|flight\w*|driv\w*|laundry|garden\w*|dogs?)\b",
+    re.IGNORECASE,
+)
+
+
+def _normalized(match) -> str:
+    return " ".join(match.group(0).lower().split())
+
+
+@dataclass(frozen=True, slots=True)
+class CachedAnswer:
+    question: str
+    embedding: dict
+    answer: str
+    expires_at: float
+
+
+def intent_key(question: str, now: float):
+    """
+    Return (cells, topics, times, numbers, negated, qualifiers, window) for a question, or None
+    if it cannot be cached.
+    """
+    places = geocoder.find_in_text(question)
+    topics = tuple(topic for topic, pattern in (("weather", WEATHER_PATTERN), ("air_quality", AIR_QUALITY_PATTERN))
+                   if pattern.search(question))
+    if not places or not topics:
+        return None
+    text = POLLUTANT_PATTERN.sub(" ", question)
+    times = tuple(sorted({_normalized(match) for match in TIME_PATTERN.finditer(text)})) or ("now",)
+    text = TIME_PATTERN.sub(" ", text)
+    if TIME_WORD_PATTERN.search(text):
+        return None
+    cells = tuple(sorted({response_cache.quantize(place.latitude, place.longitude) for place in places}))
+    numbers = tuple(sorted({number.replace(",", ".") for number in NUMBER_PATTERN.findall(text)}))
+    negated = NEGATION_PATTERN.search(question) is not None
+    qualifiers = tuple(sorted({_normalized(match) for match in QUALIFIER_PATTERN.finditer(question)}))
+    return cells, topics, times, numbers, negated, qualifiers, int(now // response_cache.refresh_seconds)
+
+
+def _bucket(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=4).digest(), "big") % EMBEDDING_DIMENSIONS
+
+
+def embed(question: str) -> dict:
+    """Unit-length sparse embedding of the question's content words and their character trigrams."""
+    place_words = {word for place in geocoder.find_in_text(question) for word in geocoder.normalize(place.name).split()}
+    words = [w for w in tokenize(question) if w not in STOP_WORDS and w not in place_words]
+    vector = {}
+    for word in words:
+        padded = f"#{word}#"
+        features = [f"w:{word}"] + [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        for feature in features:
+            index = _bucket(feature)
+            vector[index] = vector.get(index, 0.0) + (2.0 if feature.startswith("w:") else 1.0)
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def similarity(a: dict, b: dict) -> float:
+    if not a and not b:
+        # Nothing left but places, topics and times, which the key already matched
+        return 1.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class AnswerCache:
+    """Final answers grouped by intent key, matched by embedding similarity within a key."""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_keys: int = MAX_KEYS, clock=None):
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.clock = clock or response_cache.clock
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._entries = OrderedDict()  # (scope, intent key) -> [CachedAnswer]
+        self._lock = threading.Lock()
+
+    def get(self, question: str, scope: str = ""):
+        """Return a cached answer, written under `scope`, to a question close enough to `question`, or None."""
+        now = self.clock()
+        key = intent_key(question, now)
+        if key is None:
+            with self._lock:
+                self.uncacheable += 1
+            return None
+        key = (scope, key)
+        embedding = embed(question)
+        with self._lock:
+            entries = [entry for entry in self._entries.get(key, ()) if entry.expires_at > now]
+            best = max(entries, key=lambda entry: similarity(embedding, entry.embedding), default=None)
+            if best is None or similarity(embedding, best.embedding) < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return best.answer
+
+    def set(self, question: str, answer: str, scope: str = "") -> None:
+        """Cache the answer to `question` under `scope` until the data it was written from is refreshed."""
+        now = self.clock()
+        key = intent_key(question, now)
+        if key is None:
+            return
+        key = (scope, key)
+        entry = CachedAnswer(question, embed(question), str(answer), response_cache.expires_at(now))
+        with self._lock:
+            entries = [e for e in self._entries.pop(key, ()) if e.expires_at > now and e.question != question]
+            self._entries[key] = (entries + [entry])[-MAX_ENTRIES_PER_KEY:]
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "keys": len(self._entries),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide answer cache used by app.py and the HTTP service
+answer_cache = AnswerCache()
@@ -1,42 +1,20 @@
-from agents import Agent, Runner, function_tool
+from agents import Agent, Runner
 import asyncio
 import streamlit as st
 from dotenv import load_dotenv
-import requests
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history
 
 load_dotenv()
 
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """
-    Fetches current weather data for a given location using the Open-Meteo API.
-
-    Args:
-        latitude (float): The latitude of the location.
-        longitude (float): The longitude of the location.
-
-    Returns:
-        dict: A dictionary containing the weather data or an error message if the request fails.
-    """
-    try:
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": latitude,
-            "longitude": longitude,
-            "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-            "timezone": "auto"
-        }
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # Raise an error for HTTP issues
-        return response.json()
-    except requests.RequestException as e:
-        return {"error": f"Failed to fetch weather data: {e}"}
-
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
     # instructions="You provide accurate and concise weather updates based on user queries in plain language.",
     instructions="""
     You are a weather assistant agent.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
     Given current weather data (including temperature, humidity, wind speed/direction, precipitation, and weather codes), provide:
     1. A clear and concise explanation of the current weather conditions.
     2. Practical suggestions or precautions for outdoor activities, travel, health, or clothing based on the data.
@@ -49,7 +27,7 @@ weather_specialist_agent = Agent(
     Suggestions:
     - Offer actionable advice relevant to the weather conditions.
     """,
-    tools=[get_current_weather],
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again" # or "stop_on_first_tool"
 )
 
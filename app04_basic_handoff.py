@@ -1,30 +1,21 @@
-from agents import Agent, Runner, function_tool
-import asyncio
+from agents import Agent
 import streamlit as st
 from dotenv import load_dotenv
-import requests
+import streaming
+from ui import StreamView, get_runtime
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast
 
 load_dotenv()
 
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """Fetch current weather data for the given latitude and longitude."""
-    
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
     instructions="""
     You are a weather specialist agent.
     Your task is to analyze current weather data, including temperature, humidity, wind speed and direction, precipitation, and weather codes.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
 
     For each query, provide:
     1. A clear, concise summary of the current weather conditions in plain language.
@@ -38,29 +29,18 @@ weather_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the weather.
     """,
-    tools=[get_current_weather],
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again"
 )
 
-@function_tool
-def get_current_air_quality(latitude: float, longitude: float) -> dict:
-    """Fetch current air quality data for the given latitude and longitude."""
-
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 air_quality_specialist_agent = Agent(
     name="Air Quality Specialist Agent",
     instructions="""
     You are an air quality specialist agent.
     Your role is to interpret current air quality data and communicate it clearly to users.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_air_quality_batch`, which takes place names.
+    For questions about later today, tomorrow or the coming days, use `get_air_quality_forecast`, which returns a summary of the hourly forecast.
 
     For each query, provide:
     1. A concise summary of the air quality conditions in plain language, including key pollutants and their levels.
@@ -74,7 +54,7 @@ air_quality_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the air quality.
     """,
-    tools=[get_current_air_quality],
+    tools=[geocode, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast],
     tool_use_behavior="run_llm_again"
 )
 
@@ -92,8 +72,8 @@ triage_agent = Agent(
     handoffs=[weather_specialist_agent, air_quality_specialist_agent]
 )
 
-async def run_agent(user_input: str):
-    result = await Runner.run(triage_agent, user_input)
+async def run_agent(user_input: str, on_update=None):
+    result = await streaming.run(triage_agent, user_input, on_update)
     return result.final_output
 
 def main():
@@ -101,12 +81,12 @@ def main():
     user_input = st.text_input("Enter your query about weather or air quality:")
 
     if st.button("Get Update"):
-        with st.spinner("Thinking..."):
-            if user_input:
-                agent_response = asyncio.run(run_agent(user_input))
-                st.write(agent_response)
-            else:
-                st.write("Please enter a question about the weather or air quality.")
+        if user_input:
+            with StreamView() as view:
+                agent_response = view.wait(get_runtime().submit(run_agent(user_input, on_update=view.update)))
+                view.finish(agent_response)
+        else:
+            st.write("Please enter a question about the weather or air quality.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,30 +1,37 @@
-from agents import Agent, Runner, function_tool, handoff, RunContextWrapper
-import asyncio
+from agents import Agent, handoff, RunContextWrapper
+from dataclasses import dataclass
+from typing import Callable, Optional
 import streamlit as st
 from dotenv import load_dotenv
-import requests
+import streaming
+from streaming import StreamUpdate
+from ui import StreamView, get_runtime
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast
+import geocoder
 
 load_dotenv()
 
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """Fetch current weather data for the given latitude and longitude."""
-    
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
+def with_handoff_place(instructions: str):
+    """Return dynamic instructions that add the place the handoff callback resolved, if any."""
+    def build(ctx: RunContextWrapper, agent: Agent) -> str:
+        place = getattr(ctx.context, "place", None)
+        if place is None:
+            return instructions
+        return instructions + (
+            f"\n    The user is asking about {place.name} (latitude: {place.latitude}, longitude: {place.longitude}). "
+            "Use these coordinates directly instead of calling `geocode`.\n"
+        )
+    return build
 
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
-    instructions="""
+    instructions=with_handoff_place("""
     You are a weather specialist agent.
     Your task is to analyze current weather data, including temperature, humidity, wind speed and direction, precipitation, and weather codes.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
 
     For each query, provide:
     1. A clear, concise summary of the current weather conditions in plain language.
@@ -37,30 +44,19 @@ weather_specialist_agent = Agent(
 
     Suggestions:
     - List relevant advice or precautions based on the weather.
-    """,
-    tools=[get_current_weather],
+    """),
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again"
 )
 
-@function_tool
-def get_current_air_quality(latitude: float, longitude: float) -> dict:
-    """Fetch current air quality data for the given latitude and longitude."""
-
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 air_quality_specialist_agent = Agent(
     name="Air Quality Specialist Agent",
-    instructions="""
+    instructions=with_handoff_place("""
     You are an air quality specialist agent.
     Your role is to interpret current air quality data and communicate it clearly to users.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_air_quality_batch`, which takes place names.
+    For questions about later today, tomorrow or the coming days, use `get_air_quality_forecast`, which returns a summary of the hourly forecast.
 
     For each query, provide:
     1. A concise summary of the air quality conditions in plain language, including key pollutants and their levels.
@@ -73,25 +69,38 @@ air_quality_specialist_agent = Agent(
 
     Suggestions:
     - List relevant advice or precautions based on the air quality.
-    """,
-    tools=[get_current_air_quality],
+    """),
+    tools=[geocode, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast],
     tool_use_behavior="run_llm_again"
 )
 
 from pydantic import BaseModel, Field
 
+# Run context of a triage run, read by the handoff callbacks and the specialists' instructions
+@dataclass
+class HandoffContext:
+    # Receives progress notices; runs execute off the Streamlit script thread
+    on_update: Optional[Callable[[StreamUpdate], None]] = None
+    # Place resolved by the handoff callback, passed on to the specialist
+    place: Optional[geocoder.Place] = None
+
 class HandoffRequest(BaseModel):
     specialist_agent: str = Field(..., description="Name of the specialist agent to hand off to")
     handoff_reason: str = Field(..., description="Reason for the handoff")
-    latitude: float = Field(..., description="Latitude of the location")
-    longitude: float = Field(..., description="Longitude of the location")
-
-async def on_handoff_callback(ctx: RunContextWrapper, user_input: HandoffRequest):
-    st.info(f"""
+    location: str = Field(..., description="Name of the place the user is asking about, e.g. 'Jakarta' or 'Portland, US'")
+
+async def on_handoff_callback(ctx: RunContextWrapper[HandoffContext], user_input: HandoffRequest):
+    # Resolve coordinates locally instead of asking the LLM to produce them, and hand them to the specialist
+    place = geocoder.resolve(user_input.location)
+    ctx.context.place = place
+    coordinates = f"{place.latitude}, {place.longitude}" if place else "unknown"
+    # Runs execute off the Streamlit script thread, so the notice goes through the run's update callback
+    if ctx.context.on_update is not None:
+        ctx.context.on_update(StreamUpdate("info", f"""
             Handing off to {user_input.specialist_agent} for further processing...\n
             Handoff reason: {user_input.handoff_reason} \n
-            Location : {user_input.latitude}, {user_input.longitude} \n
-            """)
+            Location : {user_input.location} ({coordinates}) \n
+            """))
 
 weather_handoff = handoff(
     agent=weather_specialist_agent,
@@ -123,8 +132,8 @@ triage_agent = Agent(
     handoffs=[weather_handoff, air_quality_handoff]
 )
 
-async def run_agent(user_input: str):
-    result = await Runner.run(triage_agent, user_input)
+async def run_agent(user_input: str, on_update=None):
+    result = await streaming.run(triage_agent, user_input, on_update, context=HandoffContext(on_update=on_update))
     return result.final_output
 
 def main():
@@ -132,12 +141,12 @@ def main():
     user_input = st.text_input("Enter your query about weather or air quality:")
 
     if st.button("Get Update"):
-        with st.spinner("Thinking..."):
-            if user_input:
-                agent_response = asyncio.run(run_agent(user_input))
-                st.write(agent_response)
-            else:
-                st.write("Please enter a question about the weather or air quality.")
+        if user_input:
+            with StreamView() as view:
+                agent_response = view.wait(get_runtime().submit(run_agent(user_input, on_update=view.update)))
+                view.finish(agent_response)
+        else:
+            st.write("Please enter a question about the weather or air quality.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,30 +1,23 @@
-from agents import Agent, Runner, function_tool
-import asyncio
+from agents import Agent
 import streamlit as st
 from dotenv import load_dotenv
-import requests
+import streaming
+from ui import StreamView, get_runtime
+from run_stats import ModeComparison
+from weather_summaries import ANSWER_MODES
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast, get_weather_summary, get_air_quality_summary
 
 load_dotenv()
 
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """Fetch current weather data for the given latitude and longitude."""
-    
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
     instructions="""
     You are a weather specialist agent.
     Your task is to analyze current weather data, including temperature, humidity, wind speed and direction, precipitation, and weather codes.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
 
     For each query, provide:
     1. A clear, concise summary of the current weather conditions in plain language.
@@ -38,29 +31,18 @@ weather_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the weather.
     """,
-    tools=[get_current_weather],
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again"
 )
 
-@function_tool
-def get_current_air_quality(latitude: float, longitude: float) -> dict:
-    """Fetch current air quality data for the given latitude and longitude."""
-
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 air_quality_specialist_agent = Agent(
     name="Air Quality Specialist Agent",
     instructions="""
     You are an air quality specialist agent.
     Your role is to interpret current air quality data and communicate it clearly to users.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_air_quality_batch`, which takes place names.
+    For questions about later today, tomorrow or the coming days, use `get_air_quality_forecast`, which returns a summary of the hourly forecast.
 
     For each query, provide:
     1. A concise summary of the air quality conditions in plain language, including key pollutants and their levels.
@@ -74,7 +56,7 @@ air_quality_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the air quality.
     """,
-    tools=[get_current_air_quality],
+    tools=[geocode, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast],
     tool_use_behavior="run_llm_again"
 )
 
@@ -85,35 +67,66 @@ orchestrator_agent = Agent(
     Your task is to manage the interaction between the Weather Specialist Agent and the Air Quality Specialist Agent.
     You will receive a query from the user and will decide which agent to invoke based on the content of the query.
     If both weather and air quality information is requested, you will invoke both agents and combine their responses into one clear answer.
+    If the query is about several places, ask each agent about all of them in a single call instead of one call per place.
     """,
     tools=[
         weather_specialist_agent.as_tool(
             tool_name="get_weather_update",
-            tool_description="Get current weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
+            tool_description="Get current, forecast or past weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
         ),
         air_quality_specialist_agent.as_tool(
             tool_name="get_air_quality_update",
-            tool_description="Get current air quality information and suggestion including pollutants and their levels."
+            tool_description="Get current or forecast air quality information and suggestion including pollutants and their levels."
         )
     ],
     tool_use_behavior="run_llm_again"
 )
 
-async def run_agent(user_input: str):
-    result = await Runner.run(orchestrator_agent, user_input)
+# Same job without specialist agents: the tools return summaries computed locally from the API data
+data_orchestrator_agent = Agent(
+    name="Orchestrator Agent",
+    instructions="""
+    You are an orchestrator agent with five data tools.
+    Analyze the user's query and call, with the name of the place the user asked about:
+      - `get_weather_summary` for current weather (temperature, humidity, wind, precipitation).
+      - `get_air_quality_summary` for current air quality (pollutants, AQI).
+      - `get_weather_forecast` for weather later today, tonight, tomorrow or the coming days (rain windows, UV, best hours outdoors).
+      - `get_air_quality_forecast` for air quality later today, tomorrow or the coming days (peak AQI hours, cleanest hours).
+      - `get_weather_history` for past weather, e.g. to compare today with yesterday, last week or last year.
+    If the query requires both, call both tools.
+    If the query is about several places, call the tools for all of them in the same turn.
+    The summaries are already decoded and aggregated: weather conditions, AQI bands, local times and flags for conditions that need precautions.
+    Return a single, clear response that addresses the user's question with concise summaries and actionable advice,
+    and clearly highlight recommended safety measures for every flag.
+    """,
+    tools=[get_weather_summary, get_air_quality_summary, get_weather_forecast, get_air_quality_forecast, get_weather_history],
+    tool_use_behavior="run_llm_again"
+)
+
+# Latency and model calls of the specialist chain versus the data tools
+answer_mode_stats = ModeComparison(ANSWER_MODES)
+
+async def run_agent(user_input: str, on_update=None, answer_mode: str = "specialist agents"):
+    agent = orchestrator_agent if answer_mode == "specialist agents" else data_orchestrator_agent
+    with answer_mode_stats.measure(answer_mode):
+        result = await streaming.run(agent, user_input, on_update)
     return result.final_output
 
 def main():
     st.title("Weather and Air Quality Assistant")
     user_input = st.text_input("Enter your query about weather or air quality:")
+    answer_mode = st.sidebar.radio("Answer mode", ANSWER_MODES)
 
     if st.button("Get Update"):
-        with st.spinner("Thinking..."):
-            if user_input:
-                agent_response = asyncio.run(run_agent(user_input))
-                st.write(agent_response)
-            else:
-                st.write("Please enter a question about the weather or air quality.")
+        if user_input:
+            with StreamView() as view:
+                agent_response = view.wait(get_runtime().submit(run_agent(user_input, on_update=view.update, answer_mode=answer_mode)))
+                view.finish(agent_response)
+        else:
+            st.write("Please enter a question about the weather or air quality.")
+
+    with st.sidebar.expander("Latency and model calls by answer mode"):
+        st.json(answer_mode_stats.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
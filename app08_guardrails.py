@@ -1,153 +1,28 @@
 from agents import (
-    Agent, 
-    Runner, 
-    function_tool, 
-    
-    GuardrailFunctionOutput, 
-    input_guardrail, 
+    Agent,
     InputGuardrailTripwireTriggered,
-    output_guardrail,
-    OutputGuardrailTripwireTriggered
+    OutputGuardrailTripwireTriggered,
     )
-import asyncio
-import requests
 import streamlit as st
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from guardrails import IncrementalProfessionalismCheck, injection_detection_guardrail, off_topic_guardrail, professionalism_guardrail
+from topic_classifier import topic_classifier
+import streaming
+from ui import StreamView, get_runtime
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast
 
 load_dotenv()
 
-# Define output model for the guardrail agent to classify if input is off-topic
-class TopicClassificationOutput(BaseModel):
-    is_off_topic: bool = Field(
-        description="True if the input is off-topic (not related to weather/air quality and not a greeting), False otherwise"
-    )
-    reasoning: str = Field(
-        description="Brief explanation of why the input was classified as on-topic or off-topic"
-    )
-
-# Create the guardrail agent to determine if input is off-topic
-topic_classification_agent = Agent(
-    name="Topic Classification Agent",
-    instructions=(
-        "You are a topic classifier for a weather and air quality application. "
-        "Your task is to determine if a user's question is on-topic. "
-        "Allowed topics include: "
-        "1. Weather-related: current weather, weather forecast, temperature, precipitation, wind, humidity, etc. "
-        "2. Air quality-related: air pollution, AQI, PM2.5, ozone, air conditions, etc. "
-        "3. Location-based inquiries about weather or air conditions "
-        "4. Polite greetings and conversational starters (e.g., 'hello', 'hi', 'good morning') "
-        "5. Questions that combine greetings with weather/air quality topics "
-        "Mark as OFF-TOPIC only if the query is clearly unrelated to weather/air quality AND not a simple greeting. "
-        "Examples of off-topic: math problems, cooking recipes, sports scores, technical support, jokes (unless weather-related). "
-        "Examples of on-topic: 'Hello, what's the weather?', 'Hi there', 'Good morning, how's the air quality?', 'What's the temperature?' "
-        "The final output MUST be a JSON object conforming to the TopicClassificationOutput model."
-    ),
-    output_type=TopicClassificationOutput,
-    model="gpt-4o-mini" # Use a fast and cost-effective model
-)
-
-# Create the input guardrail function
-@input_guardrail
-async def off_topic_guardrail(ctx, agent, input) -> GuardrailFunctionOutput:
-    """
-    Classifies user input to ensure it is on-topic for a weather and air quality app.
-    """
-
-    result = await Runner.run(topic_classification_agent, input, context=ctx.context)
-    return GuardrailFunctionOutput(
-        output_info=result.final_output.reasoning,
-        tripwire_triggered=result.final_output.is_off_topic
-    )
-
-# Rule-based input guardrail to detect jailbreaking and prompt injection query
-@input_guardrail
-async def injection_detection_guardrail(ctx, agent, input) -> GuardrailFunctionOutput:
-    """
-    Detects potential jailbreaking or prompt injection attempts in user input.
-    """
-
-    # Simple keyword-based detection
-    injection_patterns = [
-        "ignore previous instructions",
-        "you are now a",
-        "forget everything above",
-        "developer mode",
-        "override safety",
-        "disregard guidelines"
-    ]
-
-    if any(keyword in input.lower() for keyword in injection_patterns):
-        return GuardrailFunctionOutput(
-            output_info="Potential jailbreaking or prompt injection detected.",
-            tripwire_triggered=True
-        )
-
-    return GuardrailFunctionOutput(
-        output_info="No jailbreaking or prompt injection detected.",
-        tripwire_triggered=False
-    )
-
-# Define output model for Output Guardrail Agent
-class ResponseCheckerOutput(BaseModel):
-    is_not_professional: bool = Field(
-        description="True if the output is not professional, False otherwise"
-    )
-    reasoning: str = Field(
-        description="Brief explanation of why the output was classified as professional or unprofessional"
-    )
-
-# Create Output Guardrail Agent
-response_checker_agent = Agent(
-    name="Response Checker Agent",
-    instructions="""
-    You are a response checker agent.
-    Your task is to evaluate the professionalism of the output generated by other agents.
-
-    For each response, provide:
-    1. A classification of the response as professional or unprofessional.
-    2. A brief explanation of the reasoning behind the classification.
-
-    Structure your response in two sections:
-    Professionalism Classification:
-    - State whether the response is professional or unprofessional.
-
-    Reasoning:
-    - Provide a brief explanation of the classification.
-    """,
-    output_type=ResponseCheckerOutput,
-    model="gpt-4o-mini"
-)
-
-# Define output guardrail function
-@output_guardrail
-async def professionalism_guardrail(ctx, agent, output) -> GuardrailFunctionOutput:
-    result = await Runner.run(response_checker_agent, output, context=ctx.context)
-    return GuardrailFunctionOutput(
-        output_info=result.final_output.reasoning,
-        tripwire_triggered=result.final_output.is_not_professional
-    )
-
-# Define function tools and specialized agents for weather and air qualities
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """Fetch current weather data for the given latitude and longitude."""
-    
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
+# Define specialized agents for weather and air qualities using the shared function tools
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
     instructions="""
     You are a weather specialist agent.
     Your task is to analyze current weather data, including temperature, humidity, wind speed and direction, precipitation, and weather codes.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
 
     For each query, provide:
     1. A clear, concise summary of the current weather conditions in plain language.
@@ -161,29 +36,18 @@ weather_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the weather.
     """,
-    tools=[get_current_weather],
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again"
 )
 
-@function_tool
-def get_current_air_quality(latitude: float, longitude: float) -> dict:
-    """Fetch current air quality data for the given latitude and longitude."""
-
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 air_quality_specialist_agent = Agent(
     name="Air Quality Specialist Agent",
     instructions="""
     You are an air quality specialist agent.
     Your role is to interpret current air quality data and communicate it clearly to users.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_air_quality_batch`, which takes place names.
+    For questions about later today, tomorrow or the coming days, use `get_air_quality_forecast`, which returns a summary of the hourly forecast.
 
     For each query, provide:
     1. A concise summary of the air quality conditions in plain language, including key pollutants and their levels.
@@ -197,7 +61,7 @@ air_quality_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the air quality.
     """,
-    tools=[get_current_air_quality],
+    tools=[geocode, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast],
     tool_use_behavior="run_llm_again"
 )
 
@@ -209,15 +73,16 @@ orchestrator_agent = Agent(
     Your task is to manage the interaction between the Weather Specialist Agent and the Air Quality Specialist Agent.
     You will receive a query from the user and will decide which agent to invoke based on the content of the query.
     If both weather and air quality information is requested, you will invoke both agents and combine their responses into one clear answer.
+    If the query is about several places, ask each agent about all of them in a single call instead of one call per place.
     """,
     tools=[
         weather_specialist_agent.as_tool(
             tool_name="get_weather_update",
-            tool_description="Get current weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
+            tool_description="Get current, forecast or past weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
         ),
         air_quality_specialist_agent.as_tool(
             tool_name="get_air_quality_update",
-            tool_description="Get current air quality information and suggestion including pollutants and their levels."
+            tool_description="Get current or forecast air quality information and suggestion including pollutants and their levels."
         )
     ],
     tool_use_behavior="run_llm_again",
@@ -226,8 +91,8 @@ orchestrator_agent = Agent(
 )
 
 # Define the run_agent function
-async def run_agent(user_input: str):
-    result = await Runner.run(orchestrator_agent, user_input)
+async def run_agent(user_input: str, on_update=None):
+    result = await streaming.run(orchestrator_agent, user_input, on_update, output_check=IncrementalProfessionalismCheck())
     return result.final_output
 
 # Define the main function of the Streamlit app
@@ -236,21 +101,25 @@ def main():
     user_input = st.text_input("Enter your query about weather or air quality:")
 
     if st.button("Get Update"):
-        with st.spinner("Thinking..."):
-            if user_input:
-                try:
-                    agent_response = asyncio.run(run_agent(user_input))
-                    st.write(agent_response)
-                except InputGuardrailTripwireTriggered as e:
-                    st.write("I can only help with weather and air quality related questions. Please try asking something else! ")
-                    st.error("Info: {}".format(e.guardrail_result.output.output_info))
-                except OutputGuardrailTripwireTriggered as e:
-                    st.write("The response didn't meet our quality standards. Please try again.")
-                    st.error("Info: {}".format(e.guardrail_result.output.output_info))
-                except Exception as e:
-                    st.error(e)
-            else:
-                st.write("Please enter a question about the weather or air quality.")
+        if user_input:
+            try:
+                with StreamView() as view:
+                    agent_response = view.wait(get_runtime().submit(run_agent(user_input, on_update=view.update)))
+                    view.finish(agent_response)
+            except InputGuardrailTripwireTriggered as e:
+                st.write("I can only help with weather and air quality related questions. Please try asking something else! ")
+                st.error("Info: {}".format(e.guardrail_result.output.output_info))
+            except OutputGuardrailTripwireTriggered as e:
+                st.write("The response didn't meet our quality standards. Please try again.")
+                st.error("Info: {}".format(e.guardrail_result.output.output_info))
+            except Exception as e:
+                st.error(e)
+        else:
+            st.write("Please enter a question about the weather or air quality.")
+
+    # Report how many inputs each off-topic classifier tier settled
+    with st.sidebar.expander("Off-topic guardrail tiers"):
+        st.json(topic_classifier.stats())
 
 if __name__ == "__main__":
     main()
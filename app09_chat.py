@@ -1,85 +1,27 @@
 from agents import (
-    Agent, 
-    Runner, 
-    function_tool, 
-    
-    GuardrailFunctionOutput, 
-    input_guardrail, 
+    Agent,
     InputGuardrailTripwireTriggered,
-    output_guardrail,
-    OutputGuardrailTripwireTriggered
     )
-import asyncio
-import requests
 import streamlit as st
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from guardrails import off_topic_guardrail
+from session_memory import ConversationMemory
+import streaming
+from ui import StreamView, get_runtime
+from weather_tools import geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast
 
 load_dotenv()
 
-# Define output model for the guardrail agent to classify if input is off-topic
-class TopicClassificationOutput(BaseModel):
-    is_off_topic: bool = Field(
-        description="True if the input is off-topic (not related to weather/air quality and not a greeting), False otherwise"
-    )
-    reasoning: str = Field(
-        description="Brief explanation of why the input was classified as on-topic or off-topic"
-    )
-
-# Create the guardrail agent to determine if input is off-topic
-topic_classification_agent = Agent(
-    name="Topic Classification Agent",
-    instructions=(
-        "You are a topic classifier for a weather and air quality application. "
-        "Your task is to determine if a user's question is on-topic. "
-        "Allowed topics include: "
-        "1. Weather-related: current weather, weather forecast, temperature, precipitation, wind, humidity, etc. "
-        "2. Air quality-related: air pollution, AQI, PM2.5, ozone, air conditions, etc. "
-        "3. Location-based inquiries about weather or air conditions "
-        "4. Polite greetings and conversational starters (e.g., 'hello', 'hi', 'good morning') "
-        "5. Questions that combine greetings with weather/air quality topics "
-        "Mark as OFF-TOPIC only if the query is clearly unrelated to weather/air quality AND not a simple greeting. "
-        "Examples of off-topic: math problems, cooking recipes, sports scores, technical support, jokes (unless weather-related). "
-        "Examples of on-topic: 'Hello, what's the weather?', 'Hi there', 'Good morning, how's the air quality?', 'What's the temperature?' "
-        "The final output MUST be a JSON object conforming to the TopicClassificationOutput model."
-    ),
-    output_type=TopicClassificationOutput,
-    model="gpt-4o-mini" # Use a fast and cost-effective model
-)
-
-# Create the input guardrail function
-@input_guardrail
-async def off_topic_guardrail(ctx, agent, input) -> GuardrailFunctionOutput:
-    """
-    Classifies user input to ensure it is on-topic for a weather and air quality app.
-    """
-
-    result = await Runner.run(topic_classification_agent, input, context=ctx.context)
-    return GuardrailFunctionOutput(
-        output_info=result.final_output.reasoning,
-        tripwire_triggered=result.final_output.is_off_topic
-    )
-
-# Define function tools and specialized agents for weather and air qualities
-@function_tool
-def get_current_weather(latitude: float, longitude: float) -> dict:
-    """Fetch current weather data for the given latitude and longitude."""
-    
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
+# Define specialized agents for weather and air qualities using the shared function tools
 weather_specialist_agent = Agent(
     name="Weather Specialist Agent",
     instructions="""
     You are a weather specialist agent.
     Your task is to analyze current weather data, including temperature, humidity, wind speed and direction, precipitation, and weather codes.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_weather_batch`, which takes place names.
+    For questions about later today, tonight, tomorrow or the coming days, use `get_weather_forecast`, which returns a summary of the hourly forecast.
+    To compare with the past (yesterday, last week, the same day last year), use `get_weather_history` together with the current readings.
 
     For each query, provide:
     1. A clear, concise summary of the current weather conditions in plain language.
@@ -93,29 +35,18 @@ weather_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the weather.
     """,
-    tools=[get_current_weather],
+    tools=[geocode, get_current_weather, get_current_weather_batch, get_weather_forecast, get_weather_history],
     tool_use_behavior="run_llm_again"
 )
 
-@function_tool
-def get_current_air_quality(latitude: float, longitude: float) -> dict:
-    """Fetch current air quality data for the given latitude and longitude."""
-
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
 air_quality_specialist_agent = Agent(
     name="Air Quality Specialist Agent",
     instructions="""
     You are an air quality specialist agent.
     Your role is to interpret current air quality data and communicate it clearly to users.
+    Unless the query already gives coordinates, resolve the location with the `geocode` tool instead of estimating its latitude and longitude.
+    For questions about several places, fetch them all in one call with `get_current_air_quality_batch`, which takes place names.
+    For questions about later today, tomorrow or the coming days, use `get_air_quality_forecast`, which returns a summary of the hourly forecast.
 
     For each query, provide:
     1. A concise summary of the air quality conditions in plain language, including key pollutants and their levels.
@@ -129,7 +60,7 @@ air_quality_specialist_agent = Agent(
     Suggestions:
     - List relevant advice or precautions based on the air quality.
     """,
-    tools=[get_current_air_quality],
+    tools=[geocode, get_current_air_quality, get_current_air_quality_batch, get_air_quality_forecast],
     tool_use_behavior="run_llm_again"
 )
 
@@ -141,24 +72,31 @@ orchestrator_agent = Agent(
     Your task is to manage the interaction between the Weather Specialist Agent and the Air Quality Specialist Agent.
     You will receive a query from the user and will decide which agent to invoke based on the content of the query.
     If both weather and air quality information is requested, you will invoke both agents and combine their responses into one clear answer.
+    If the query is about several places, ask each agent about all of them in a single call instead of one call per place.
     """,
     tools=[
         weather_specialist_agent.as_tool(
             tool_name="get_weather_update",
-            tool_description="Get current weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
+            tool_description="Get current, forecast or past weather information and suggestion including temperature, humidity, wind speed and direction, precipitation, and weather codes."
         ),
         air_quality_specialist_agent.as_tool(
             tool_name="get_air_quality_update",
-            tool_description="Get current air quality information and suggestion including pollutants and their levels."
+            tool_description="Get current or forecast air quality information and suggestion including pollutants and their levels."
         )
     ],
     tool_use_behavior="run_llm_again",
     input_guardrails=[off_topic_guardrail]
 )
 
-# Define the run_agent function
-async def run_agent(user_input: str):
-    result = await Runner.run(orchestrator_agent, user_input)
+# Define the run_agent function; with a memory, follow-ups see the earlier turns in bounded form
+async def run_agent(user_input: str, on_update=None, memory: ConversationMemory = None):
+    if memory is None:
+        result = await streaming.run(orchestrator_agent, user_input, on_update)
+        return result.final_output
+    agent_input = await memory.build_input(user_input)
+    with memory.collecting():
+        result = await streaming.run(orchestrator_agent, agent_input, on_update)
+    memory.add_turn(user_input, result.final_output)
     return result.final_output
 
 # Define the main function of the Streamlit app
@@ -168,6 +106,9 @@ def main():
     # Initialize chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "memory" not in st.session_state:
+        st.session_state.memory = ConversationMemory()
+    memory = st.session_state.memory
     
     # Display chat messages
     for message in st.session_state.messages:
@@ -184,8 +125,9 @@ def main():
         # Get and show assistant response
         with st.chat_message("assistant"):
             try:
-                response = asyncio.run(run_agent(prompt))
-                st.markdown(response)
+                with StreamView() as view:
+                    response = view.wait(get_runtime().submit(run_agent(prompt, on_update=view.update, memory=memory)))
+                    view.finish(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
             except InputGuardrailTripwireTriggered:
                 error_msg = "I can only help with weather and air quality questions. Please try something else!"
@@ -199,7 +141,13 @@ def main():
     # Clear chat button
     if st.button("Clear Chat"):
         st.session_state.messages = []
+        st.session_state.memory = ConversationMemory()
         st.rerun()
 
+    # Show what the next turn will carry over from this conversation
+    with st.sidebar.expander("Conversation memory"):
+        st.caption(f"{len(memory.turns)} recent turns kept verbatim (max {memory.max_turns})")
+        st.markdown(memory.preamble() or "_Nothing summarized yet._")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,192 @@
+"""
+Offline batch evaluation of an agent over a JSONL file of queries.
+
+Queries are streamed from the input file into a bounded queue that a fixed number of workers
+drain, so a slow model slows down reading instead of piling up work in memory. Each result is
+appended to the output JSONL as soon as it is ready, which makes the output file the
+checkpoint: a rerun skips every query that already has a finished result and retries the
+ones that errored or timed out.
+
+Usage:
+    python batch_eval.py queries.jsonl results.jsonl --agent app07_customized_agents_as_tools:orchestrator_agent --concurrency 8
+
+`--agent` names an `Agent` (run with `Runner.run`) or an app's async `run_agent(user_input)`
+function, which also covers app-level paths such as fan-out. Each input line is a JSON object
+with the query text under `--field` (default "query") and an optional "id"; lines without an
+id are identified by their line number.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+
+from agents import Agent, InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered, Runner, set_trace_processors, trace
+
+from run_stats import trace_usage
+from streaming import LatencySamples
+
+# Results that are not retried when a run is resumed
+FINISHED_STATUSES = ("ok", "input_guardrail", "output_guardrail")
+
+
+def load_agent(spec: str):
+    """Import an agent or run function from a `module:attribute` spec, e.g. `app04_basic_handoff:triage_agent`."""
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "orchestrator_agent")
+
+
+async def run_target(target, query: str):
+    """Run `query` through an `Agent` or an async `run_agent` function and return the final output."""
+    if isinstance(target, Agent):
+        return (await Runner.run(target, query)).final_output
+    return await target(query)
+
+
+def load_checkpoint(path: str) -> set:
+    """Return the ids that already have a finished result in the output file."""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line; that query is retried
+                continue
+            if record.get("status") in FINISHED_STATUSES:
+                finished.add(record["id"])
+            else:
+                finished.discard(record["id"])
+    return finished
+
+
+def read_queries(path: str, field: str):
+    """
+    Yield (id, query, problem) triples from a JSONL file. `problem` describes a line that
+    cannot be run (invalid JSON or no query under `field`), and is None otherwise.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            query_id = f"line-{number}"
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield query_id, None, f"Invalid JSON on line {number}: {e}"
+                continue
+            if not isinstance(entry, dict):
+                yield query_id, None, f"Line {number} is not a JSON object"
+                continue
+            query_id = str(entry.get("id", query_id))
+            if not isinstance(entry.get(field), str):
+                yield query_id, None, f"Line {number} has no '{field}' string"
+                continue
+            yield query_id, entry[field], None
+
+
+async def run_query(agent, query_id: str, query: str, timeout: float) -> dict:
+    """Run one query in its own trace and describe the outcome, latency and usage."""
+    record = {"id": query_id, "query": query}
+    start = time.perf_counter()
+    with trace("Batch evaluation", group_id=query_id) as current:
+        try:
+            output = await asyncio.wait_for(run_target(agent, query), timeout)
+            record.update(status="ok", output=str(output))
+        except InputGuardrailTripwireTriggered as e:
+            record.update(status="input_guardrail", output=str(e.guardrail_result.output.output_info))
+        except OutputGuardrailTripwireTriggered as e:
+            record.update(status="output_guardrail", output=str(e.guardrail_result.output.output_info))
+        except asyncio.TimeoutError:
+            record.update(status="timeout", output=None)
+        except Exception as e:
+            record.update(status="error", output=f"{type(e).__name__}: {e}")
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        record.update(trace_usage.pop(current.trace_id))
+    return record
+
+
+async def evaluate(agent, queries_path: str, output_path: str, field: str = "query",
+                   concurrency: int = 4, timeout: float = 120.0) -> dict:
+    """Run every unfinished query through `agent`, appending results to `output_path`."""
+    # Ids finished by earlier runs; queries completed in this run are not skipped ones
+    finished = frozenset(load_checkpoint(output_path))
+    skipped = 0
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = LatencySamples()
+    statuses = {}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record: dict) -> None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record = await run_query(agent, *item, timeout)
+                write(record)
+                latencies.record(record["latency_ms"] / 1000)
+                done = sum(statuses.values())
+                if done % 10 == 0:
+                    rate = done / (time.perf_counter() - started)
+                    print(f"{done} queries done ({rate:.2f}/s)", file=sys.stderr)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for query_id, query, problem in read_queries(queries_path, field):
+                if query_id in finished:
+                    skipped += 1
+                    continue
+                if problem is not None:
+                    # Recorded like a failed run, so one bad line does not stop the batch
+                    write({"id": query_id, "query": None, "status": "error", "output": problem, "latency_ms": 0.0})
+                    continue
+                # Blocks while the queue is full, so reading never runs ahead of the workers
+                await queue.put((query_id, query))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    return {
+        "skipped": skipped,
+        "statuses": statuses,
+        "latency": latencies.summary(),
+        "elapsed_s": round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through an agent.")
+    parser.add_argument("queries", help="input JSONL file")
+    parser.add_argument("output", help="output JSONL file; also the checkpoint for resuming")
+    parser.add_argument("--agent", default="app:orchestrator_agent", help="agent as module:attribute")
+    parser.add_argument("--field", default="query", help="JSON field holding the query text")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries in flight at once")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per query")
+    parser.add_argument("--export-traces", action="store_true",
+                        help="also export traces to the default tracing backend")
+    args = parser.parse_args()
+
+    if not args.export_traces:
+        # Keep only the local usage counter; a replay should not upload thousands of traces
+        set_trace_processors([trace_usage])
+    summary = asyncio.run(evaluate(
+        load_agent(args.agent), args.queries, args.output, args.field, args.concurrency, args.timeout
+    ))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Microbenchmark for the injection guardrail matcher.
+# Compares the Aho-Corasick automaton with the old `any(keyword in text ...)` loop and a
+# single compiled regex, using 10k synthetic phrases against a 4 KB input.
+#
+# Usage: python benchmarks/bench_injection_matcher.py [--patterns 10000] [--input-bytes 4096]
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pattern_matcher import AhoCorasick, normalize_text
+
+WORDS = (
+    "ignore previous instructions system prompt developer mode override safety rules "
+    "pretend act as unrestricted reveal hidden policy forget everything above jailbreak "
+    "bypass filter admin root token secret disregard guidelines you are now a new persona"
+).split()
+
+FILLER = (
+    "What is the weather like in Jakarta this afternoon? Should I bring an umbrella or "
+    "a light jacket, and is the air quality good enough for a run along the river? "
+)
+
+
+def make_patterns(count: int, rng: random.Random) -> list:
+    patterns = set()
+    while len(patterns) < count:
+        patterns.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 6))))
+    return sorted(patterns)
+
+
+def best_of(repeats: int, fn) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the injection guardrail matcher.")
+    parser.add_argument("--patterns", type=int, default=10_000)
+    parser.add_argument("--input-bytes", type=int, default=4096)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    patterns = make_patterns(args.patterns, rng)
+    text = normalize_text((FILLER * (args.input_bytes // len(FILLER) + 1))[:args.input_bytes])
+
+    start = time.perf_counter()
+    automaton = AhoCorasick(patterns)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    regex = re.compile("|".join(re.escape(p) for p in sorted(patterns, key=len, reverse=True)))
+    regex_build_seconds = time.perf_counter() - start
+
+    # Benign input: every matcher has to scan the whole text, which is the worst case
+    results = {
+        "aho-corasick": best_of(args.repeats, lambda: automaton.search(text)),
+        "compiled regex": best_of(args.repeats, lambda: regex.search(text)),
+        "keyword loop": best_of(max(1, args.repeats // 4), lambda: any(p in text for p in patterns)),
+    }
+
+    print(f"{len(patterns)} patterns, {len(text)} byte input")
+    print(f"build: aho-corasick {build_seconds * 1000:.1f} ms, compiled regex {regex_build_seconds * 1000:.1f} ms")
+    for name, seconds in results.items():
+        throughput = len(text) / seconds / 1e6
+        print(f"{name:>15}: {seconds * 1e6:10.1f} us/input  {1 / seconds:10.0f} inputs/s  {throughput:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
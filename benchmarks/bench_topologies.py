@@ -0,0 +1,157 @@
+# End-to-end benchmark of the agent topologies against the in-process fakes.
+# Runs the same query corpus through the single agent, handoff, agents-as-tools and guardrailed
+# apps at several concurrency levels, and reports latency percentiles, model and tool calls per
+# query, prompt/completion tokens per query and throughput. Results are written as JSON with
+# sorted keys so runs from different commits can be diffed.
+#
+# Usage: python benchmarks/bench_topologies.py [--concurrency 1 4 16] [--rounds 2] [--queries corpus.jsonl]
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agents import set_trace_processors
+
+import fakes
+from batch_eval import load_agent, run_query
+from run_stats import USAGE_FIELDS, trace_usage
+from streaming import LatencySamples
+from answer_cache import answer_cache
+from weather_cache import response_cache
+
+TOPOLOGIES = {
+    "single agent (app03)": "app03_tooluse_agent:weather_specialist_agent",
+    "handoff (app04)": "app04_basic_handoff:triage_agent",
+    "customized handoff (app05)": "app05_customized_handoff:run_agent",
+    "agents as tools (app06)": "app06_agents_as_tools:orchestrator_agent",
+    "data tools (app06)": "app06_agents_as_tools:data_orchestrator_agent",
+    "customized agents as tools (app07)": "app07_customized_agents_as_tools:run_agent",
+    "guardrails (app08)": "app08_guardrails:orchestrator_agent",
+    "guardrailed orchestrator (app.py)": "app:run_agent",
+}
+
+CORPUS = [
+    "What's the weather like in Jakarta right now?",
+    "Is it going to rain in Bandung this afternoon?",
+    "How hot is it in Surabaya today?",
+    "Is the air quality safe for a run in Medan?",
+    "What is the PM2.5 level in Jakarta?",
+    "Should I wear a mask outside in Semarang?",
+    "What's the weather and air quality in Yogyakarta?",
+    "Is it windy and is the air clean in Denpasar?",
+    "Compare the weather in Jakarta, Bandung and Surabaya",
+    "Hello! What's the temperature in Makassar?",
+    "Good morning, how humid is it in Palembang?",
+    "Can I go hiking near Malang this weekend?",
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_corpus(path: str) -> list:
+    if path is None:
+        return CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+async def run_level(target, queries: list, concurrency: int, timeout: float) -> dict:
+    """Run every query with at most `concurrency` in flight and summarize the records."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int, query: str) -> dict:
+        async with semaphore:
+            return await run_query(target, str(index), query, timeout)
+
+    # Each level starts cold so topologies see the same Open-Meteo traffic and answer every query
+    response_cache.clear()
+    answer_cache.clear()
+    start = time.perf_counter()
+    records = await asyncio.gather(*(one(i, q) for i, q in enumerate(queries)))
+    elapsed = time.perf_counter() - start
+
+    latencies = LatencySamples()
+    for record in records:
+        latencies.record(record["latency_ms"] / 1000)
+    return {
+        "concurrency": concurrency,
+        "queries": len(records),
+        "failed": sum(record["status"] != "ok" for record in records),
+        "latency": latencies.summary(),
+        "per_query": {field: round(statistics.fmean(r[field] for r in records), 2) for field in USAGE_FIELDS},
+        "throughput_qps": round(len(records) / elapsed, 2),
+    }
+
+
+async def run_benchmark(topologies: dict, queries: list, levels: list, timeout: float) -> list:
+    results = []
+    for name, spec in topologies.items():
+        target = load_agent(spec)
+        for concurrency in levels:
+            result = await run_level(target, queries, concurrency, timeout)
+            result["topology"] = name
+            results.append(result)
+            print(
+                f"{name:38} c={concurrency:<3} p50={result['latency']['p50_ms']:>8} ms "
+                f"p99={result['latency']['p99_ms']:>8} ms model_calls={result['per_query']['model_calls']:<5} "
+                f"qps={result['throughput_qps']}",
+                file=sys.stderr,
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent topologies against in-process fakes.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=2, help="times the corpus is repeated per level")
+    parser.add_argument("--queries", help="JSONL corpus with a `query` field (default: built-in corpus)")
+    parser.add_argument("--topology", action="append", choices=sorted(TOPOLOGIES), help="run only these topologies")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="fake model delay between chunks (s)")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="fake Open-Meteo latency (s)")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="share of failing Open-Meteo requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per query")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/topologies-<commit>.json)")
+    args = parser.parse_args()
+
+    set_trace_processors([trace_usage])
+    fakes.install(
+        model=fakes.ScriptedModel(args.model_latency, args.token_latency),
+        weather_api=fakes.FakeOpenMeteo(latency=args.api_latency, error_rate=args.api_error_rate),
+    )
+    topologies = {name: TOPOLOGIES[name] for name in args.topology} if args.topology else TOPOLOGIES
+    queries = load_corpus(args.queries) * args.rounds
+    results = asyncio.run(run_benchmark(topologies, queries, args.concurrency, args.timeout))
+
+    commit = git_commit()
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"topologies-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "python": platform.python_version(),
+            "settings": {k: v for k, v in vars(args).items() if k != "output"},
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Hermetic stand-ins for the model provider and the Open-Meteo APIs, for offline load tests.
+
+    import fakes
+    fakes.install()                      # scripted model + fake Open-Meteo
+    fakes.install(model=fakes.ReplayTransport("cassette.jsonl", fallback=fakes.ScriptedModel()))
+
+After `install()`, every agent whose model is given by name (all agents in the apps) sends
+its Chat Completions requests to the in-process model transport, and `open_meteo` sends its
+requests to the in-process API stub. The weather archive moves to a temporary directory, so
+fake readings never end up in the real history.
+"""
+import tempfile
+
+import httpx
+from agents import set_default_openai_api, set_default_openai_client
+from openai import AsyncOpenAI
+
+import open_meteo
+from weather_archive import archive
+from fakes.model import RecordingTransport, ReplayTransport, ScriptedModel
+from fakes.open_meteo_server import FakeOpenMeteo
+
+__all__ = ["FakeOpenMeteo", "RecordingTransport", "ReplayTransport", "ScriptedModel", "install"]
+
+
+def install(model: httpx.AsyncBaseTransport = None, weather_api: httpx.AsyncBaseTransport = None,
+            archive_dir: str = None):
+    """
+    Route model calls and Open-Meteo requests to in-process transports; return them.
+    Archived weather goes to `archive_dir` (default: a new temporary directory).
+    """
+    model = model or ScriptedModel()
+    weather_api = weather_api or FakeOpenMeteo()
+    client = AsyncOpenAI(
+        api_key="fake",
+        base_url="http://fake-openai.local/v1",
+        http_client=httpx.AsyncClient(transport=model),
+        max_retries=0,
+    )
+    set_default_openai_client(client, use_for_tracing=False)
+    set_default_openai_api("chat_completions")
+    open_meteo.set_transport(weather_api)
+    archive.use(archive_dir or tempfile.mkdtemp(prefix="weather-archive-"), source="fake")
+    return model, weather_api
@@ -0,0 +1,365 @@
+"""
+In-process stand-ins for the OpenAI Chat Completions API.
+
+Each class is an httpx transport for an `AsyncOpenAI` client; `fakes.install()` makes that
+client the default for every agent, including nested specialist and guardrail runs.
+
+- `ScriptedModel` answers like a well-behaved model, deterministically: it calls the tools
+  that match the question's topic (handoffs and specialist tools included), then writes an
+  answer from their outputs, and fills structured outputs from their JSON schema.
+- `RecordingTransport` forwards requests to the real API and appends every exchange to a
+  JSONL cassette; `ReplayTransport` serves a cassette back without any network.
+
+Streamed responses are sent as server-sent events with simulated time to first token and
+per-token delays, so streaming code paths and their latency can be measured offline.
+"""
+from collections import defaultdict
+import asyncio
+import hashlib
+import json
+import re
+import threading
+
+import httpx
+
+import geocoder
+from topic_classifier import AIR_QUALITY_PATTERN, WEATHER_PATTERN
+
+# Words that start questions but are never place names
+NON_PLACE_WORDS = {
+    "what", "how", "is", "are", "should", "will", "can", "could", "do", "does", "tell", "give",
+    "hi", "hello", "hey", "good", "compare", "the", "i", "please", "and", "or", "in", "at",
+}
+# Questions about a time ahead, which a model answers with the forecast tools
+FORECAST_PATTERN = re.compile(
+    r"\b(forecast|later|tonight|tomorrow|weekend|this\s+(afternoon|evening|week)|next\s+\w+|coming\s+days|will\s+it)\b",
+    re.IGNORECASE,
+)
+# Questions about the past, which a model answers with the history tool
+HISTORY_PATTERN = re.compile(
+    r"\b(yesterday|last\s+(week|month|year)|ago|compared?|usual|normal)\b",
+    re.IGNORECASE,
+)
+CAPITALIZED_WORDS = re.compile(r"\b[A-Z][\w'-]+(?:\s+[A-Z][\w'-]+)?")
+DEFAULT_PLACE = "Jakarta"
+
+
+def request_key(body: bytes) -> str:
+    """Stable key of a request body, independent of JSON key order."""
+    canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class TokenStream(httpx.AsyncByteStream):
+    """Server-sent events body that waits before the first event and between events."""
+
+    def __init__(self, events: list, first_delay: float, delay: float):
+        self.events = events
+        self.first_delay = first_delay
+        self.delay = delay
+
+    async def __aiter__(self):
+        for index, event in enumerate(self.events):
+            pause = self.first_delay if index == 0 else self.delay
+            if pause:
+                await asyncio.sleep(pause)
+            yield event
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _instance(schema: dict, defs: dict, text: str):
+    """Build a value matching a JSON schema: false, zero, empty lists and short strings."""
+    if "$ref" in schema:
+        return _instance(defs[schema["$ref"].rsplit("/", 1)[-1]], defs, text)
+    if "anyOf" in schema:
+        return _instance(schema["anyOf"][0], defs, text)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _instance(prop, defs, text) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    if kind == "boolean":
+        return False
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "null":
+        return None
+    return text
+
+
+class ScriptedModel(httpx.AsyncBaseTransport):
+    """
+    Deterministic Chat Completions endpoint that behaves like a cooperative model.
+
+    Args:
+        first_token_latency: seconds before the first streamed event (or the whole response).
+        token_latency: seconds between streamed text chunks.
+    """
+
+    def __init__(self, first_token_latency: float = 0.2, token_latency: float = 0.01):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        with self._lock:
+            self.requests += 1
+        payload = json.loads(body)
+        key = request_key(body)
+        message = self.reply(payload, key)
+        usage = {
+            "prompt_tokens": estimate_tokens(json.dumps(payload.get("messages", []))),
+            "completion_tokens": estimate_tokens(json.dumps(message)),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{key[:24]}"
+        model = payload.get("model", "gpt-4o")
+        if payload.get("stream"):
+            events = self._stream_events(completion_id, model, message, usage)
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                stream=TokenStream(events, self.first_token_latency, self.token_latency),
+                request=request,
+            )
+        await asyncio.sleep(self.first_token_latency)
+        return httpx.Response(200, json={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": 0,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": usage,
+        }, request=request)
+
+    def reply(self, payload: dict, key: str) -> dict:
+        """Return the assistant message for a Chat Completions request."""
+        messages = payload.get("messages", [])
+        user_index = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        question = _text_of(messages[user_index].get("content")) if user_index >= 0 else ""
+        since_question = messages[user_index + 1:]
+
+        response_format = payload.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = _instance(schema, schema.get("$defs", {}), "Scripted assessment.")
+            return {"role": "assistant", "content": json.dumps(content)}
+
+        called = {
+            call["function"]["name"]
+            for m in since_question if m.get("role") == "assistant"
+            for call in m.get("tool_calls") or []
+        }
+        tools = [tool["function"] for tool in payload.get("tools") or [] if tool.get("type") == "function"]
+        chosen = self.choose_tools(question, tools)
+        # Call the tools once per question; after a handoff the new agent's tools are not called yet
+        if chosen and not any(tool["name"] in called for tool in chosen):
+            places = self.places(question)
+            return {"role": "assistant", "content": None, "tool_calls": [
+                {
+                    "id": f"call_{key[:12]}_{index}",
+                    "type": "function",
+                    "function": {"name": tool["name"], "arguments": json.dumps(self.arguments(tool, question, places))},
+                }
+                for index, tool in enumerate(chosen)
+            ]}
+
+        results = [_text_of(m.get("content")) for m in since_question if m.get("role") == "tool"]
+        answer = f"Here is the information you asked for about: {question.strip()}"
+        if results:
+            answer += "\n\n" + "\n\n".join(result[:600] for result in results)
+        answer += "\n\nPlease take the usual precautions for these conditions."
+        return {"role": "assistant", "content": answer}
+
+    @staticmethod
+    def choose_tools(question: str, tools: list) -> list:
+        """Pick the tools a model would call for the question's topics, one per topic."""
+        topics = []
+        if WEATHER_PATTERN.search(question) or not AIR_QUALITY_PATTERN.search(question):
+            topics.append("weather")
+        if AIR_QUALITY_PATTERN.search(question):
+            topics.append("air_quality")
+        if HISTORY_PATTERN.search(question):
+            period = "history"
+        elif FORECAST_PATTERN.search(question):
+            period = "forecast"
+        else:
+            period = "current"
+        chosen = []
+        for topic in topics:
+            matching = [t for t in tools if topic in t["name"].lower().replace(" ", "_")]
+            # Prefer single-place data tools over batch variants, which a real model uses rarely,
+            # and the tools for the period the question is about
+            matching.sort(key=lambda t: ("batch" in t["name"], ScriptedModel.period_of(t["name"]) != period))
+            if matching:
+                chosen.append(matching[0])
+        return chosen
+
+    @staticmethod
+    def period_of(tool_name: str) -> str:
+        for period in ("history", "forecast"):
+            if period in tool_name:
+                return period
+        return "current"
+
+    @staticmethod
+    def places(question: str) -> list:
+        places = []
+        for words in CAPITALIZED_WORDS.findall(question):
+            if words.split()[0].lower() in NON_PLACE_WORDS:
+                continue
+            place = geocoder.lookup(words)
+            if place is not None and place not in places:
+                places.append(place)
+        return places or [geocoder.lookup(DEFAULT_PLACE)]
+
+    @staticmethod
+    def arguments(tool: dict, question: str, places: list) -> dict:
+        arguments = {}
+        for name, prop in tool.get("parameters", {}).get("properties", {}).items():
+            if name == "latitude":
+                arguments[name] = places[0].latitude
+            elif name == "longitude":
+                arguments[name] = places[0].longitude
+            elif prop.get("type") == "array":
+                arguments[name] = [place.name for place in places]
+            elif name in ("location", "place"):
+                arguments[name] = places[0].name
+            elif name == "specialist_agent":
+                arguments[name] = tool["name"].replace("handoff_to_", "").replace("_", " ").title()
+            elif name == "days":
+                arguments[name] = 2
+            elif name == "days_ago":
+                lowered = question.lower()
+                arguments[name] = 1 if "yesterday" in lowered else 365 if "last year" in lowered else 7
+            elif prop.get("type") in ("integer", "number"):
+                arguments[name] = 0
+            elif prop.get("type") == "boolean":
+                arguments[name] = False
+            else:
+                arguments[name] = question
+        return arguments
+
+    @staticmethod
+    def _stream_events(completion_id: str, model: str, message: dict, usage: dict) -> list:
+        def event(delta=None, finish_reason=None, usage=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        events = [event({"role": "assistant", "content": ""})]
+        if message.get("tool_calls"):
+            for index, call in enumerate(message["tool_calls"]):
+                events.append(event({"tool_calls": [{"index": index, **call}]}))
+            events.append(event({}, "tool_calls"))
+        else:
+            words = re.findall(r"\S+\s*", message["content"])
+            events.extend(event({"content": "".join(words[i:i + 3])}) for i in range(0, len(words), 3))
+            events.append(event({}, "stop"))
+        events.append(event(usage=usage))
+        events.append(b"data: [DONE]\n\n")
+        return events
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to the real API and appends each exchange to a JSONL cassette."""
+
+    def __init__(self, path: str, transport: httpx.AsyncBaseTransport = None):
+        self.path = path
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "key": request_key(body),
+                "status": response.status_code,
+                "content_type": response.headers.get("content-type", ""),
+                "body": content.decode("utf-8"),
+            }) + "\n")
+        return httpx.Response(
+            response.status_code,
+            headers={"content-type": response.headers.get("content-type", "")},
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded exchanges by request key, replaying streams event by event.
+
+    Repeated identical requests get the recorded responses in order, then the last one again.
+    Requests that were never recorded go to `fallback` (e.g. a `ScriptedModel`), or fail.
+    """
+
+    def __init__(self, path: str, fallback: httpx.AsyncBaseTransport = None,
+                 first_token_latency: float = 0.2, token_latency: float = 0.01):
+        self.fallback = fallback
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.misses = 0
+        self._exchanges = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self._exchanges[exchange["key"]].append(exchange)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = request_key(body)
+        with self._lock:
+            recorded = self._exchanges.get(key)
+            if recorded:
+                exchange = recorded[min(self._served[key], len(recorded) - 1)]
+                self._served[key] += 1
+            else:
+                self.misses += 1
+        if not recorded:
+            if self.fallback is None:
+                return httpx.Response(500, json={"error": {"message": f"No recorded response for request {key[:12]}"}}, request=request)
+            return await self.fallback.handle_async_request(request)
+        headers = {"content-type": exchange["content_type"]}
+        if exchange["content_type"].startswith("text/event-stream"):
+            events = [f"{event}\n\n".encode() for event in exchange["body"].split("\n\n") if event.strip()]
+            return httpx.Response(
+                exchange["status"],
+                headers=headers,
+                stream=TokenStream(events, self.first_token_latency, self.token_latency),
+                request=request,
+            )
+        await asyncio.sleep(self.first_token_latency)
+        return httpx.Response(exchange["status"], headers=headers, content=exchange["body"].encode(), request=request)
@@ -0,0 +1,230 @@
+"""
+In-process stand-in for the Open-Meteo forecast and air quality APIs.
+
+`FakeOpenMeteo` is an httpx transport, so it answers the requests `open_meteo` makes without
+any sockets. Readings are derived from a hash of the seed, the coordinates and the variable
+name, so the same request always gets the same payload. Latency and errors are injected per
+request; whether a request fails depends only on the seed, the request and how many times it
+was already made, so a replay fails the same requests even when they run concurrently.
+
+`hourly` and `daily` requests are answered with `forecast_days` of series starting at midnight
+UTC of the current day, or with `start_date` to `end_date` for history requests, like the real
+API for a location at UTC: hourly values follow a daily cycle around the location's base
+reading, and daily values are aggregated from the hours.
+"""
+from collections import Counter
+from datetime import date
+import asyncio
+import hashlib
+import json
+import math
+import threading
+import time
+
+import httpx
+
+UNITS = {
+    "temperature_2m": "°C",
+    "relative_humidity_2m": "%",
+    "dew_point_2m": "°C",
+    "apparent_temperature": "°C",
+    "precipitation": "mm",
+    "weathercode": "wmo code",
+    "windspeed_10m": "km/h",
+    "winddirection_10m": "°",
+    "european_aqi": "EAQI",
+    "us_aqi": "USAQI",
+    "pm10": "μg/m³",
+    "pm2_5": "μg/m³",
+    "carbon_monoxide": "μg/m³",
+    "nitrogen_dioxide": "μg/m³",
+    "sulphur_dioxide": "μg/m³",
+    "ozone": "μg/m³",
+    "precipitation_probability": "%",
+    "uv_index": "",
+    "is_day": "",
+}
+
+# Daily variables and the hourly variable and aggregate they are computed from
+DAILY = {
+    "weathercode": ("weathercode", max),
+    "temperature_2m_max": ("temperature_2m", max),
+    "temperature_2m_min": ("temperature_2m", min),
+    "precipitation_sum": ("precipitation", sum),
+    "precipitation_probability_max": ("precipitation_probability", max),
+    "uv_index_max": ("uv_index", max),
+}
+
+# Value range of each variable; weather codes are drawn from a fixed list instead
+RANGES = {
+    "temperature_2m": (-5.0, 38.0),
+    "relative_humidity_2m": (20, 100),
+    "dew_point_2m": (-10.0, 27.0),
+    "apparent_temperature": (-8.0, 44.0),
+    "precipitation": (0.0, 12.0),
+    "windspeed_10m": (0.0, 60.0),
+    "winddirection_10m": (0, 359),
+    "european_aqi": (5, 110),
+    "us_aqi": (10, 320),
+    "pm10": (3.0, 120.0),
+    "pm2_5": (2.0, 90.0),
+    "carbon_monoxide": (100.0, 2000.0),
+    "nitrogen_dioxide": (2.0, 80.0),
+    "sulphur_dioxide": (1.0, 60.0),
+    "ozone": (10.0, 160.0),
+    "precipitation_probability": (0, 100),
+    "uv_index": (0.0, 11.0),
+}
+WEATHER_CODES = [0, 1, 2, 3, 45, 51, 61, 63, 65, 80, 95]
+
+
+def _fraction(*parts) -> float:
+    """Deterministic number in [0, 1) derived from `parts`."""
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+class FakeOpenMeteo(httpx.AsyncBaseTransport):
+    """
+    httpx transport answering Open-Meteo `current`, `hourly` and `daily` requests with deterministic payloads.
+
+    Args:
+        latency: seconds added to every request.
+        error_rate: share of requests answered with `error_status` instead of a payload.
+        error_status: HTTP status of injected errors, e.g. 500 or 429.
+        seed: changes every reading and every injected error.
+        observed_at: the `current.time` of every payload.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, error_status: int = 503,
+                 seed: int = 0, observed_at: str = "2025-01-01T12:00"):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.observed_at = observed_at
+        self.requests = 0
+        self.errors = 0
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        key = (request.url.path, tuple(sorted(params.items())))
+        with self._lock:
+            self.requests += 1
+            self._attempts[key] += 1
+            attempt = self._attempts[key]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if _fraction(self.seed, "error", key, attempt) < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return httpx.Response(self.error_status, json={"error": True, "reason": "Injected error"}, request=request)
+
+        variables = params.get("current", "").split(",")
+        latitudes = params.get("latitude", "0").split(",")
+        longitudes = params.get("longitude", "0").split(",")
+        if "hourly" in params or "daily" in params:
+            if "start_date" in params:
+                first_day = date.fromisoformat(params["start_date"])
+                days = (date.fromisoformat(params["end_date"]) - first_day).days + 1
+                midnight = (first_day - date(1970, 1, 1)).days * 86400
+            else:
+                days = int(params.get("forecast_days", 7))
+                midnight = int(time.time() // 86400 * 86400)
+            payloads = [
+                self.forecast_payload(float(latitude), float(longitude), params.get("hourly", ""),
+                                      params.get("daily", ""), midnight, days)
+                for latitude, longitude in zip(latitudes, longitudes)
+            ]
+        else:
+            payloads = [
+                self.payload(float(latitude), float(longitude), variables)
+                for latitude, longitude in zip(latitudes, longitudes)
+            ]
+        # Like the real API: one location gets an object, several get a list
+        body = payloads[0] if len(payloads) == 1 else payloads
+        return httpx.Response(
+            200,
+            content=json.dumps(body).encode(),
+            headers={"content-type": "application/json"},
+            request=request,
+        )
+
+    def payload(self, latitude: float, longitude: float, variables: list) -> dict:
+        current = {"time": self.observed_at, "interval": 900}
+        for variable in variables:
+            fraction = _fraction(self.seed, latitude, longitude, variable)
+            if variable == "weathercode":
+                current[variable] = WEATHER_CODES[int(fraction * len(WEATHER_CODES))]
+            elif variable in RANGES:
+                low, high = RANGES[variable]
+                value = low + fraction * (high - low)
+                current[variable] = round(value) if isinstance(low, int) else round(value, 1)
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "generationtime_ms": 0.05,
+            "utc_offset_seconds": 0,
+            "timezone": "GMT",
+            "timezone_abbreviation": "GMT",
+            "elevation": 10.0,
+            "current_units": {"time": "iso8601", "interval": "seconds", **{v: UNITS[v] for v in variables if v in UNITS}},
+            "current": current,
+        }
+
+    def hourly_value(self, latitude: float, longitude: float, variable: str, hour: int):
+        """Reading of `variable` in the `hour`-th hour since the epoch (UTC)."""
+        if variable == "is_day":
+            return int(6 <= hour % 24 < 18)
+        base = _fraction(self.seed, latitude, longitude, variable)
+        if variable == "weathercode":
+            # Codes hold for six hours at a time
+            return WEATHER_CODES[int(_fraction(self.seed, latitude, longitude, variable, hour // 6) * len(WEATHER_CODES))]
+        if variable not in RANGES:
+            return None
+        if variable == "uv_index":
+            # No UV at night, peaking at solar noon
+            fraction = base * max(0.0, math.sin(math.pi * (hour % 24 - 6) / 12))
+        else:
+            cycle = math.sin(2 * math.pi * (hour % 24 - 9) / 24)
+            noise = _fraction(self.seed, latitude, longitude, variable, hour) - 0.5
+            fraction = min(1.0, max(0.0, 0.6 * base + 0.25 * (cycle + 1) / 2 + 0.3 * noise))
+        if variable == "precipitation":
+            # Dry most hours, with showers when the hour's draw is high
+            fraction = max(0.0, fraction - 0.55) / 0.45
+        low, high = RANGES[variable]
+        value = low + fraction * (high - low)
+        return round(value) if isinstance(low, int) else round(value, 1)
+
+    def forecast_payload(self, latitude: float, longitude: float, hourly: str, daily: str, midnight: int, days: int) -> dict:
+        hours = range(days * 24)
+        series = {
+            variable: [self.hourly_value(latitude, longitude, variable, midnight // 3600 + hour) for hour in hours]
+            for variable in set(hourly.split(",")) | {DAILY[v][0] for v in daily.split(",") if v in DAILY}
+            if variable
+        }
+        payload = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "generationtime_ms": 0.05,
+            "utc_offset_seconds": 0,
+            "timezone": "GMT",
+            "timezone_abbreviation": "GMT",
+            "elevation": 10.0,
+        }
+        if hourly:
+            payload["hourly_units"] = {"time": "iso8601", **{v: UNITS.get(v, "") for v in hourly.split(",")}}
+            payload["hourly"] = {
+                "time": [time.strftime("%Y-%m-%dT%H:%M", time.gmtime(midnight + hour * 3600)) for hour in hours],
+                **{v: series[v] for v in hourly.split(",")},
+            }
+        if daily:
+            payload["daily"] = {"time": [time.strftime("%Y-%m-%d", time.gmtime(midnight + day * 86400)) for day in range(days)]}
+            for variable in daily.split(","):
+                source, aggregate = DAILY[variable]
+                payload["daily"][variable] = [
+                    round(aggregate(series[source][day * 24:(day + 1) * 24]), 1) for day in range(days)
+                ]
+        return payload
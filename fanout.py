@@ -0,0 +1,134 @@
+"""
+Deterministic fan-out of specialist agents for questions that need more than one of them.
+
+With LLM routing the orchestrator often calls `get_weather_update` and `get_air_quality_update`
+in consecutive turns, each wrapping a full nested specialist run. When the topic rules show
+that a question is about both weather and air quality, `fan_out` runs the specialists
+concurrently under one shared deadline and merges their reports in a single orchestrator call.
+"""
+from dataclasses import dataclass
+import asyncio
+import time
+
+from agents import Agent, InputGuardrailTripwireTriggered, RunContextWrapper, Runner
+from agents.tracing import guardrail_span
+
+import streaming
+from streaming import LatencySamples, StreamUpdate
+from topic_classifier import AIR_QUALITY_PATTERN, WEATHER_PATTERN
+
+# Routing of combined weather and air quality questions:
+# - "fan-out": run every specialist concurrently, then one orchestrator call merges the reports.
+# - "llm": let the orchestrator model decide which specialist tools to call, turn by turn.
+ROUTING_MODES = ("fan-out", "llm")
+
+# Shared deadline for all specialists of one fan-out
+SPECIALIST_DEADLINE_SECONDS = 30.0
+
+MERGE_INSTRUCTIONS = """
+    The specialist reports for the user's question are included after it, so do not call any tools.
+    Merge them into a single, clear response with concise summaries and actionable advice.
+    If a report is missing, tell the user which information is unavailable.
+    """
+
+
+@dataclass
+class Specialist:
+    # Name shown in progress updates, matching the orchestrator tool it replaces
+    tool_name: str
+    # Heading of the specialist's report in the merge input
+    title: str
+    agent: Agent
+
+
+# Wall-clock latency of combined questions per routing mode
+routing_latencies = {mode: LatencySamples() for mode in ROUTING_MODES}
+
+
+def needs_fan_out(text: str) -> bool:
+    """Return True if the question asks about both weather and air quality."""
+    return bool(WEATHER_PATTERN.search(text) and AIR_QUALITY_PATTERN.search(text))
+
+
+def _notify(on_update, update: StreamUpdate) -> None:
+    if on_update is not None:
+        on_update(update)
+
+
+async def _run_guardrail(guardrail, agent, input, context):
+    # Recorded like the guardrail spans of `Runner.run`, so fan-out runs trace the same way
+    with guardrail_span(guardrail.get_name()) as span:
+        result = await guardrail.run(agent, input, RunContextWrapper(context))
+        span.span_data.triggered = result.output.tripwire_triggered
+        return result
+
+
+async def check_input(agent, input, guardrails: list, context=None) -> None:
+    """Run input guardrails concurrently and raise on the first tripwire."""
+    tasks = [asyncio.create_task(_run_guardrail(g, agent, input, context)) for g in guardrails]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result.output.tripwire_triggered:
+                raise InputGuardrailTripwireTriggered(result)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _run_specialist(specialist: Specialist, input, on_update, ends_at: float):
+    """Return the specialist's report (None if it missed the deadline) and its duration."""
+    _notify(on_update, StreamUpdate("tool_call", specialist.tool_name))
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            Runner.run(specialist.agent, input),
+            max(0.0, ends_at - asyncio.get_running_loop().time())
+        )
+        report = result.final_output
+    except asyncio.TimeoutError:
+        report = None
+    _notify(on_update, StreamUpdate("tool_output", specialist.tool_name))
+    return report, time.perf_counter() - start
+
+
+async def fan_out(orchestrator, specialists: list, input: str, on_update=None, output_check=None,
+                  deadline: float = SPECIALIST_DEADLINE_SECONDS):
+    """
+    Answer `input` by running `specialists` concurrently and merging their reports.
+
+    The orchestrator's input guardrails keep their execution mode: blocking ones finish before
+    any specialist starts, the others run alongside the specialists. The merge is a single run
+    of the orchestrator without tools, streamed like `streaming.run`; its result is returned.
+    """
+    await check_input(orchestrator, input, [g for g in orchestrator.input_guardrails if not g.run_in_parallel])
+
+    start = time.perf_counter()
+    ends_at = asyncio.get_running_loop().time() + deadline
+    tasks = [
+        asyncio.create_task(check_input(orchestrator, input, [g for g in orchestrator.input_guardrails if g.run_in_parallel])),
+        *(asyncio.create_task(_run_specialist(s, input, on_update, ends_at)) for s in specialists),
+    ]
+    try:
+        _, *outcomes = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - start
+    one_by_one = sum(duration for _, duration in outcomes)
+    _notify(on_update, StreamUpdate("info", (
+        f"Ran {len(specialists)} specialists concurrently in {elapsed * 1000:.0f} ms "
+        f"(about {one_by_one * 1000:.0f} ms one after another)."
+    )))
+
+    reports = "\n\n".join(
+        f"{s.title}:\n{report if report is not None else 'No report: the specialist did not answer in time.'}"
+        for s, (report, _) in zip(specialists, outcomes)
+    )
+    merger = orchestrator.clone(
+        instructions=orchestrator.instructions + MERGE_INSTRUCTIONS,
+        tools=[],
+        input_guardrails=[],
+    )
+    return await streaming.run(merger, f"{input}\n\n{reports}", on_update, output_check)
@@ -0,0 +1,385 @@
+"""
+Columnar decoding and local aggregation of Open-Meteo hourly and daily forecasts.
+
+A week of hourly forecast is 168 rows per variable; as JSON that costs the model thousands of
+prompt tokens and leaves the arithmetic to it. `Series.decode` turns an `hourly` or `daily`
+block into a `datetime64` time axis and one float array per variable (missing values become
+NaN), and the summarizers below compute what forecast questions ask about with vectorized
+operations: rain windows, the peak UV and AQI hour of each day, a humidex comfort index and
+the best hours to be outdoors. Only those summaries are handed to the model.
+"""
+from dataclasses import dataclass
+from typing import Optional
+import time
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from weather_summaries import (
+    EUROPEAN_AQI_BANDS,
+    EUROPEAN_AQI_TOP_BAND,
+    FREEZING_C,
+    HEAT_FEELS_LIKE_C,
+    HEAVY_RAIN_MM,
+    POLLUTANT_GUIDELINES,
+    STRONG_WIND_KMH,
+    US_AQI_BANDS,
+    US_AQI_TOP_BAND,
+    band,
+    describe_weather_code,
+)
+
+# Hours in which rain is likely: at least this probability or at least this much rain
+RAIN_PROBABILITY_PCT = 50
+RAIN_MM = 0.2
+MAX_RAIN_WINDOWS = 4
+
+HIGH_UV_INDEX = 6
+
+# A comfortable hour outdoors: daylight, humidex in this range, little wind and rain
+COMFORT_HUMIDEX = (18.0, 29.0)
+COMFORT_WIND_KMH = 30
+COMFORT_RAIN_PROBABILITY_PCT = 30
+OUTDOOR_WINDOW_HOURS = 3
+
+# European AQI above which hours count as poor air, and the hours searched for clean air
+POOR_AIR_EUROPEAN_AQI = 60
+DAYTIME_HOURS = (6, 22)
+MAX_POOR_AIR_WINDOWS = 4
+
+ONE_HOUR = np.timedelta64(1, "h")
+
+
+@dataclass(frozen=True, slots=True)
+class Series:
+    """A forecast block as a time axis and one float64 array per variable."""
+    time: np.ndarray
+    columns: dict
+
+    @classmethod
+    def decode(cls, payload: dict, block: str = "hourly") -> "Series":
+        data = payload.get(block) or {}
+        unit = "D" if block == "daily" else "m"
+        times = np.array(data.get("time", []), dtype=f"datetime64[{unit}]")
+        columns = {name: np.array(values, dtype=float) for name, values in data.items() if name != "time"}
+        return cls(times, columns)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def get(self, name: str) -> np.ndarray:
+        """Return a variable's values, all NaN if the payload did not include it."""
+        values = self.columns.get(name)
+        return values if values is not None else np.full(len(self), np.nan)
+
+    def select(self, mask: np.ndarray) -> "Series":
+        return Series(self.time[mask], {name: values[mask] for name, values in self.columns.items()})
+
+    def between(self, start, end) -> "Series":
+        """Rows with `start <= time < end`."""
+        return self.select((self.time >= start) & (self.time < end))
+
+    def day_starts(self) -> tuple:
+        """Return (dates, index of each date's first row); rows must be in time order."""
+        days = self.time.astype("datetime64[D]")
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]]) if len(days) else np.array([], dtype=int)
+        return days[starts], starts
+
+
+def local_now(payload: dict, clock=time.time) -> np.datetime64:
+    """Current wall-clock time at the payload's location, on the same axis as its series."""
+    return np.datetime64(int(clock() + payload.get("utc_offset_seconds", 0)), "s").astype("datetime64[m]")
+
+
+def runs(mask: np.ndarray) -> tuple:
+    """Return (starts, ends) of the runs of True in `mask`, with exclusive ends."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def daily_peaks(series: Series, name: str) -> tuple:
+    """Return (daily maxima, index of the first hour reaching each) of an hourly variable."""
+    values = series.get(name)
+    _, starts = series.day_starts()
+    if not len(starts):
+        return np.array([]), np.array([], dtype=int)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    maxima = np.maximum.reduceat(filled, starts)
+    counts = np.diff(np.r_[starts, len(values)])
+    peaks = np.flatnonzero(filled == np.repeat(maxima, counts))
+    # Every day has at least one row equal to its maximum; keep the first of each
+    _, first = np.unique(np.searchsorted(starts, peaks, side="right") - 1, return_index=True)
+    return np.where(np.isinf(maxima), np.nan, maxima), peaks[first]
+
+
+def daily_means(series: Series, name: str) -> np.ndarray:
+    """Mean of an hourly variable per day, ignoring missing hours."""
+    values = series.get(name)
+    _, starts = series.day_starts()
+    if not len(starts):
+        return np.array([])
+    present = ~np.isnan(values)
+    totals = np.add.reduceat(np.where(present, values, 0.0), starts)
+    counts = np.add.reduceat(present.astype(int), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def humidex(temperature_c: np.ndarray, humidity_pct: np.ndarray) -> np.ndarray:
+    """Humidex from temperature and relative humidity, via the Magnus dew point."""
+    gamma = np.log(np.clip(humidity_pct, 1, 100) / 100) + 17.625 * temperature_c / (243.04 + temperature_c)
+    dew_point = 243.04 * gamma / (17.625 - gamma)
+    vapour_pressure = 6.11 * np.exp(5417.7530 * (1 / 273.16 - 1 / (273.15 + dew_point)))
+    return temperature_c + 0.5555 * (vapour_pressure - 10)
+
+
+def discomfort(series: Series) -> tuple:
+    """
+    Return (humidex, penalty) per hour. The penalty is 0 for a comfortable hour and grows
+    with degrees outside the comfortable humidex range, rain chance, wind and high UV; it is
+    infinite at night.
+    """
+    index = humidex(series.get("temperature_2m"), series.get("relative_humidity_2m"))
+    low, high = COMFORT_HUMIDEX
+    penalty = (
+        np.clip(low - index, 0, None) + np.clip(index - high, 0, None)
+        + np.clip(np.nan_to_num(series.get("precipitation_probability")) - COMFORT_RAIN_PROBABILITY_PCT, 0, None) / 10
+        + np.clip(np.nan_to_num(series.get("windspeed_10m")) - COMFORT_WIND_KMH, 0, None) / 5
+        + np.clip(np.nan_to_num(series.get("uv_index")) - HIGH_UV_INDEX, 0, None)
+    )
+    penalty = np.where((series.get("is_day") == 1) & ~np.isnan(penalty), penalty, np.inf)
+    return index, penalty
+
+
+def best_window(cost: np.ndarray, hours: int):
+    """Index of the first hour of the `hours`-long window with the lowest total cost, or None."""
+    if len(cost) < hours:
+        return None
+    totals = np.convolve(cost, np.ones(hours), mode="valid")
+    start = int(np.argmin(totals))
+    return start if np.isfinite(totals[start]) else None
+
+
+def _number(value, digits: int = 1):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _max(values: np.ndarray):
+    """Largest non-missing value rounded for output, or None."""
+    present = values[~np.isnan(values)]
+    return _number(present.max()) if len(present) else None
+
+
+def _hour(value) -> str:
+    return np.datetime_as_string(value, unit="m")
+
+
+class RainWindow(BaseModel):
+    start: str
+    end: str
+    max_probability_pct: Optional[float] = None
+    total_mm: Optional[float] = None
+
+
+class OutdoorWindow(BaseModel):
+    start: str
+    end: str
+    humidex: Optional[float] = Field(default=None, description="Mean humidex over the window")
+    max_rain_probability_pct: Optional[float] = None
+    max_uv_index: Optional[float] = None
+
+
+class DayForecast(BaseModel):
+    date: str
+    conditions: str = Field(description="Decoded WMO weather code of the day")
+    temperature_min_c: Optional[float] = None
+    temperature_max_c: Optional[float] = None
+    feels_like_max_c: Optional[float] = None
+    precipitation_mm: Optional[float] = None
+    precipitation_probability_pct: Optional[float] = None
+    uv_index_max: Optional[float] = None
+    uv_peak_hour: Optional[str] = None
+    comfortable_hours: int = Field(default=0, description="Daylight hours with comfortable humidex, wind and rain chance")
+
+
+class WeatherForecastSummary(BaseModel):
+    location: str
+    starts_at: Optional[str] = None
+    hours: int = 0
+    days: list[DayForecast] = Field(default_factory=list)
+    rain_windows: list[RainWindow] = Field(default_factory=list, description="Periods when rain is likely")
+    best_outdoor_window: Optional[OutdoorWindow] = None
+    flags: list[str] = Field(default_factory=list, description="Conditions that need precautions")
+
+    def headline(self) -> str:
+        """One compact line for the chat memory."""
+        parts = [
+            f"{day.date} {day.conditions} {day.temperature_min_c}-{day.temperature_max_c}°C rain {day.precipitation_probability_pct}%"
+            for day in self.days
+        ]
+        parts.extend(f"rain {window.start}-{window.end[-5:]}" for window in self.rain_windows[:2])
+        return "; ".join(parts)
+
+
+class AirQualityWindow(BaseModel):
+    start: str
+    end: str
+    european_aqi_max: Optional[float] = None
+
+
+class AirQualityDay(BaseModel):
+    date: str
+    european_aqi_max: Optional[float] = None
+    european_band: Optional[str] = None
+    european_peak_hour: Optional[str] = None
+    us_aqi_max: Optional[float] = None
+    us_band: Optional[str] = None
+    pollutant_means_ugm3: dict[str, float] = Field(default_factory=dict)
+    flags: list[str] = Field(default_factory=list, description="Daily mean pollutants above WHO guidelines")
+
+
+class AirQualityForecastSummary(BaseModel):
+    location: str
+    starts_at: Optional[str] = None
+    hours: int = 0
+    days: list[AirQualityDay] = Field(default_factory=list)
+    poor_air_windows: list[AirQualityWindow] = Field(default_factory=list, description=f"Periods with European AQI above {POOR_AIR_EUROPEAN_AQI}")
+    cleanest_window: Optional[AirQualityWindow] = Field(default=None, description="Daytime hours with the lowest European AQI")
+    flags: list[str] = Field(default_factory=list)
+
+    def headline(self) -> str:
+        """One compact line for the chat memory."""
+        return "; ".join(
+            f"{day.date} EAQI max {day.european_aqi_max} ({day.european_band}) at {day.european_peak_hour}"
+            for day in self.days
+        )
+
+
+def summarize_weather_forecast(location: str, payload: dict, days: int = 2, now=None) -> WeatherForecastSummary:
+    """Summarize the hourly and daily blocks of a forecast payload from `now` to the end of the `days`-th day."""
+    now = local_now(payload) if now is None else now
+    today = now.astype("datetime64[D]")
+    hourly = Series.decode(payload, "hourly").between(now.astype("datetime64[h]"), today + days)
+    daily = Series.decode(payload, "daily").between(today, today + days)
+    summary = WeatherForecastSummary(location=location, hours=len(hourly))
+    if not len(hourly):
+        return summary
+    summary.starts_at = _hour(hourly.time[0])
+
+    index, penalty = discomfort(hourly)
+    comfortable = penalty == 0
+    dates, starts = hourly.day_starts()
+    comfortable_hours = np.add.reduceat(comfortable.astype(int), starts)
+    uv_max, uv_peak = daily_peaks(hourly, "uv_index")
+    feels_like_max, _ = daily_peaks(hourly, "apparent_temperature")
+    # Days come from the hourly series, so today is included even after the daily block's midnight row
+    daily_rows = {date: i for i, date in enumerate(daily.time)}
+    for i, date in enumerate(dates):
+        row = daily_rows.get(date)
+
+        def day(name):
+            return _number(daily.get(name)[row]) if row is not None else None
+
+        code = day("weathercode")
+        summary.days.append(DayForecast(
+            date=str(date),
+            conditions=describe_weather_code(code),
+            temperature_min_c=day("temperature_2m_min"),
+            temperature_max_c=day("temperature_2m_max"),
+            feels_like_max_c=_number(feels_like_max[i]),
+            precipitation_mm=day("precipitation_sum"),
+            precipitation_probability_pct=day("precipitation_probability_max"),
+            uv_index_max=_number(uv_max[i]),
+            uv_peak_hour=_hour(hourly.time[uv_peak[i]])[-5:] if not np.isnan(uv_max[i]) else None,
+            comfortable_hours=int(comfortable_hours[i]),
+        ))
+
+    probability = hourly.get("precipitation_probability")
+    rain = hourly.get("precipitation")
+    starts, ends = runs((np.nan_to_num(probability) >= RAIN_PROBABILITY_PCT) | (np.nan_to_num(rain) >= RAIN_MM))
+    for start, end in zip(starts[:MAX_RAIN_WINDOWS], ends[:MAX_RAIN_WINDOWS]):
+        summary.rain_windows.append(RainWindow(
+            start=_hour(hourly.time[start]),
+            end=_hour(hourly.time[end - 1] + ONE_HOUR),
+            max_probability_pct=_max(probability[start:end]),
+            total_mm=_number(np.nansum(rain[start:end])),
+        ))
+
+    start = best_window(penalty, OUTDOOR_WINDOW_HOURS)
+    if start is not None:
+        window = slice(start, start + OUTDOOR_WINDOW_HOURS)
+        summary.best_outdoor_window = OutdoorWindow(
+            start=_hour(hourly.time[start]),
+            end=_hour(hourly.time[start + OUTDOOR_WINDOW_HOURS - 1] + ONE_HOUR),
+            humidex=_number(np.mean(index[window])),
+            max_rain_probability_pct=_max(probability[window]),
+            max_uv_index=_max(hourly.get("uv_index")[window]),
+        )
+
+    checks = [
+        ("thunderstorm", (hourly.get("weathercode") >= 95) & (hourly.get("weathercode") <= 99)),
+        ("extreme heat", hourly.get("apparent_temperature") >= HEAT_FEELS_LIKE_C),
+        ("freezing", hourly.get("temperature_2m") <= FREEZING_C),
+        ("heavy rain", rain >= HEAVY_RAIN_MM),
+        ("strong wind", hourly.get("windspeed_10m") >= STRONG_WIND_KMH),
+        ("high UV", hourly.get("uv_index") >= HIGH_UV_INDEX),
+    ]
+    for name, mask in checks:
+        if mask.any():
+            summary.flags.append(f"{name} from {_hour(hourly.time[np.argmax(mask)])}")
+    return summary
+
+
+def summarize_air_quality_forecast(location: str, payload: dict, days: int = 2, now=None) -> AirQualityForecastSummary:
+    """Summarize the hourly block of an air quality payload; days are aggregated locally."""
+    now = local_now(payload) if now is None else now
+    today = now.astype("datetime64[D]")
+    hourly = Series.decode(payload, "hourly").between(now.astype("datetime64[h]"), today + days)
+    summary = AirQualityForecastSummary(location=location, hours=len(hourly))
+    if not len(hourly):
+        return summary
+    summary.starts_at = _hour(hourly.time[0])
+
+    dates, _ = hourly.day_starts()
+    european_max, european_peak = daily_peaks(hourly, "european_aqi")
+    us_max, _ = daily_peaks(hourly, "us_aqi")
+    means = {name: daily_means(hourly, name) for name in POLLUTANT_GUIDELINES if name in hourly.columns}
+    for i, date in enumerate(dates):
+        pollutants = {name: _number(values[i]) for name, values in means.items() if not np.isnan(values[i])}
+        summary.days.append(AirQualityDay(
+            date=str(date),
+            european_aqi_max=_number(european_max[i]),
+            european_band=band(_number(european_max[i]), EUROPEAN_AQI_BANDS, EUROPEAN_AQI_TOP_BAND),
+            european_peak_hour=_hour(hourly.time[european_peak[i]])[-5:] if not np.isnan(european_max[i]) else None,
+            us_aqi_max=_number(us_max[i]),
+            us_band=band(_number(us_max[i]), US_AQI_BANDS, US_AQI_TOP_BAND),
+            pollutant_means_ugm3=pollutants,
+            flags=[
+                f"{name} daily mean above WHO guideline ({value} > {POLLUTANT_GUIDELINES[name]})"
+                for name, value in pollutants.items()
+                if value > POLLUTANT_GUIDELINES[name]
+            ],
+        ))
+
+    european = hourly.get("european_aqi")
+    starts, ends = runs(np.nan_to_num(european) > POOR_AIR_EUROPEAN_AQI)
+    for start, end in zip(starts[:MAX_POOR_AIR_WINDOWS], ends[:MAX_POOR_AIR_WINDOWS]):
+        summary.poor_air_windows.append(AirQualityWindow(
+            start=_hour(hourly.time[start]),
+            end=_hour(hourly.time[end - 1] + ONE_HOUR),
+            european_aqi_max=_max(european[start:end]),
+        ))
+
+    hour_of_day = (hourly.time - hourly.time.astype("datetime64[D]")).astype("timedelta64[h]").astype(int)
+    daytime = (hour_of_day >= DAYTIME_HOURS[0]) & (hour_of_day < DAYTIME_HOURS[1])
+    start = best_window(np.where(daytime & ~np.isnan(european), european, np.inf), OUTDOOR_WINDOW_HOURS)
+    if start is not None:
+        summary.cleanest_window = AirQualityWindow(
+            start=_hour(hourly.time[start]),
+            end=_hour(hourly.time[start + OUTDOOR_WINDOW_HOURS - 1] + ONE_HOUR),
+            european_aqi_max=_max(european[start:start + OUTDOOR_WINDOW_HOURS]),
+        )
+    if summary.poor_air_windows:
+        summary.flags.append(f"poor air from {summary.poor_air_windows[0].start}")
+    return summary
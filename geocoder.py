@@ -0,0 +1,265 @@
+"""
+Deterministic offline geocoder backed by the bundled gazetteer in data/gazetteer.tsv.
+
+The gazetteer is a GeoNames-style table (name, alternate names, coordinates, country
+code, population). It is indexed once per process into:
+- a sorted array of normalized names for exact and unique-prefix lookups with `bisect`, and
+- a static k-d tree over unit-sphere vectors for nearest-place (reverse) lookups.
+
+Both lookups run in microseconds without any network access, and always return the
+same coordinates for the same place, which keeps the response caches warm.
+"""
+from array import array
+from dataclasses import dataclass
+import bisect
+import csv
+import functools
+import math
+import os
+import re
+import unicodedata
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.tsv")
+)
+EARTH_RADIUS_KM = 6371.0
+
+# Prefix matches shorter than this are too ambiguous to be useful
+MIN_PREFIX_LENGTH = 3
+
+# Farthest a gazetteer place may be from coordinates given with its name and still be taken for it
+MAX_COORDINATE_MISMATCH_KM = 50.0
+
+# A place given by coordinates, optionally after its name: "Tromsø (69.65, 18.96)" or "69.65, 18.96"
+COORDINATES_PATTERN = re.compile(
+    r"^\s*(?P<name>.*?)[\s,]*\(?\s*(?P<latitude>[-+]?\d{1,2}(?:\.\d+)?)\s*,\s*"
+    r"(?P<longitude>[-+]?\d{1,3}(?:\.\d+)?)\s*\)?\s*$"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Place:
+    name: str
+    country_code: str
+    latitude: float
+    longitude: float
+    population: int
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "country_code": self.country_code,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        }
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return " ".join("".join(c if c.isalnum() else " " for c in stripped).split())
+
+
+def _distance_km(place: Place, latitude: float, longitude: float) -> float:
+    """Great-circle distance between a place and the coordinates."""
+    a, b = _to_unit_vector(place.latitude, place.longitude), _to_unit_vector(latitude, longitude)
+    chord = math.sqrt(sum((p - q) ** 2 for p, q in zip(a, b)))
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def _to_unit_vector(latitude: float, longitude: float) -> tuple:
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+class KDTree:
+    """Static 3-d tree over points, stored implicitly as a median-ordered index array."""
+
+    def __init__(self, points: list):
+        self.points = points
+        self.order = array("I", range(len(points)))
+        self._build(0, len(points), 0)
+
+    def _build(self, lo: int, hi: int, axis: int) -> None:
+        if hi - lo <= 1:
+            return
+        self.order[lo:hi] = array("I", sorted(self.order[lo:hi], key=lambda i: self.points[i][axis]))
+        mid = (lo + hi) // 2
+        self._build(lo, mid, (axis + 1) % 3)
+        self._build(mid + 1, hi, (axis + 1) % 3)
+
+    def nearest(self, query: tuple) -> tuple:
+        """Return (index, squared euclidean distance) of the point closest to `query`."""
+        best = [-1, math.inf]
+        self._search(query, 0, len(self.points), 0, best)
+        return best[0], best[1]
+
+    def _search(self, query: tuple, lo: int, hi: int, axis: int, best: list) -> None:
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        index = self.order[mid]
+        point = self.points[index]
+        distance = sum((q - p) ** 2 for q, p in zip(query, point))
+        if distance < best[1]:
+            best[0], best[1] = index, distance
+
+        delta = query[axis] - point[axis]
+        near, far = ((lo, mid), (mid + 1, hi)) if delta < 0 else ((mid + 1, hi), (lo, mid))
+        self._search(query, near[0], near[1], (axis + 1) % 3, best)
+        if delta * delta < best[1]:
+            self._search(query, far[0], far[1], (axis + 1) % 3, best)
+
+
+class Gazetteer:
+    """In-memory name and spatial index over a list of places."""
+
+    def __init__(self, places: list, alternate_names: list):
+        self.places = places
+        entries = sorted(
+            (normalize(name), index)
+            for index, place in enumerate(places)
+            for name in {place.name, *alternate_names[index]}
+            if name
+        )
+        self._names = [name for name, _ in entries]
+        self._ids = array("I", (index for _, index in entries))
+        self._tree = KDTree([_to_unit_vector(p.latitude, p.longitude) for p in places])
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        """Load a tab-separated gazetteer file with a header row."""
+        places, alternate_names = [], []
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                places.append(Place(
+                    name=row["name"],
+                    country_code=row["country_code"],
+                    latitude=float(row["latitude"]),
+                    longitude=float(row["longitude"]),
+                    population=int(row["population"] or 0),
+                ))
+                alternate_names.append([n.strip() for n in row["alternatenames"].split(",") if n.strip()])
+        return cls(places, alternate_names)
+
+    def _matches(self, key: str, prefix: bool) -> set:
+        start = bisect.bisect_left(self._names, key)
+        end = bisect.bisect_right(self._names, key + "￿") if prefix else bisect.bisect_right(self._names, key)
+        return {self._ids[i] for i in range(start, end)}
+
+    def search(self, query: str, limit: int = 5, prefix: bool = True) -> list:
+        """
+        Return places matching `query`, most populous first.
+
+        The whole name must match a place name; if none does and `prefix` is set, a prefix of
+        at least `MIN_PREFIX_LENGTH` characters is accepted when it names a single place. A
+        trailing ", CC" ISO country code narrows the result (e.g. "Portland, US"). Any other
+        qualifier ("Paris, Texas") cannot be checked, so nothing is returned.
+        """
+        name, comma, qualifier = query.partition(",")
+        country = qualifier.strip().upper()
+        if comma and not (len(country) == 2 and country.isalpha()):
+            return []
+        key = normalize(name)
+        if not key:
+            return []
+
+        def in_country(ids: set) -> list:
+            return [self.places[i] for i in ids if not comma or self.places[i].country_code == country]
+
+        candidates = in_country(self._matches(key, prefix=False))
+        if candidates:
+            return sorted(candidates, key=lambda p: -p.population)[:limit]
+        if prefix and len(key) >= MIN_PREFIX_LENGTH:
+            candidates = in_country(self._matches(key, prefix=True))
+            if len(candidates) == 1:
+                return candidates
+        return []
+
+    def find_in_text(self, text: str, max_words: int = 3) -> list:
+        """
+        Return the places named anywhere in free text, in order of mention.
+
+        Only exact names count (no prefixes), longest first, so "New York weather" finds New
+        York and not York. Each name resolves to its most populous place.
+        """
+        words = normalize(text).split()
+        found = []
+        start = 0
+        while start < len(words):
+            for length in range(min(max_words, len(words) - start), 0, -1):
+                ids = self._matches(" ".join(words[start:start + length]), prefix=False)
+                if ids:
+                    place = max((self.places[i] for i in ids), key=lambda p: p.population)
+                    if place not in found:
+                        found.append(place)
+                    start += length
+                    break
+            else:
+                start += 1
+        return found
+
+    def lookup(self, query: str):
+        """Return the best matching place for `query`, or None."""
+        matches = self.search(query, limit=1)
+        return matches[0] if matches else None
+
+    def nearest(self, latitude: float, longitude: float) -> tuple:
+        """Return (place, great-circle distance in km) of the place closest to the coordinates."""
+        index, chord_squared = self._tree.nearest(_to_unit_vector(latitude, longitude))
+        chord = math.sqrt(chord_squared)
+        return self.places[index], 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+@functools.lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer index, building it on first use."""
+    return Gazetteer.load()
+
+
+def lookup(place: str):
+    """Resolve a place name to a `Place`, or None if it is not in the gazetteer."""
+    return get_gazetteer().lookup(place)
+
+
+def find_in_text(text: str) -> list:
+    """Return the places named in free text, in order of mention."""
+    return get_gazetteer().find_in_text(text)
+
+
+def nearest(latitude: float, longitude: float) -> tuple:
+    """Return the closest known place to the coordinates and its distance in km."""
+    return get_gazetteer().nearest(latitude, longitude)
+
+
+def resolve(query: str, latitude: float = None, longitude: float = None):
+    """
+    Resolve a place name to a `Place`, falling back to coordinates for places the gazetteer
+    does not know. The coordinates come from the arguments or from the query itself
+    ("Tromsø (69.65, 18.96)"). When coordinates are given, only a place with exactly that name
+    within `MAX_COORDINATE_MISMATCH_KM` of them is taken from the gazetteer; otherwise the
+    coordinates are used as given. Return None if neither gives a place.
+    """
+    name = query
+    match = COORDINATES_PATTERN.match(query)
+    if match:
+        name = match.group("name")
+        if latitude is None or longitude is None:
+            latitude, longitude = float(match.group("latitude")), float(match.group("longitude"))
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return lookup(name) if name.strip() else None
+    if name.strip():
+        # The same name can belong to several places ("Portland"); keep the one the coordinates point at
+        candidates = get_gazetteer().search(name, limit=len(get_gazetteer().places), prefix=False)
+        distances = [(_distance_km(place, latitude, longitude), place) for place in candidates]
+        nearby = [(distance, place) for distance, place in distances if distance <= MAX_COORDINATE_MISMATCH_KM]
+        if nearby:
+            return min(nearby, key=lambda item: item[0])[1]
+    return Place(
+        name=name.strip() or f"{latitude}, {longitude}",
+        country_code="",
+        latitude=latitude,
+        longitude=longitude,
+        population=0,
+    )
@@ -0,0 +1,322 @@
+"""
+Guardrails shared by the guardrailed apps (app.py, app08_guardrails.py, app09_chat.py).
+"""
+from agents import (
+    Agent,
+    Runner,
+    GuardrailFunctionOutput,
+    input_guardrail,
+    output_guardrail,
+    OutputGuardrailResult,
+    OutputGuardrailTripwireTriggered,
+    )
+from collections import Counter
+from pydantic import BaseModel, Field
+import asyncio
+import dataclasses
+import os
+import re
+import threading
+
+from pattern_matcher import PatternFileMatcher
+from streaming import LatencySamples
+from topic_classifier import topic_classifier
+
+INJECTION_PATTERNS_PATH = os.getenv(
+    "INJECTION_PATTERNS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "injection_patterns.txt"),
+)
+
+# Execution modes for the input guardrails of a run:
+# - "optimistic": rule-based guardrails finish first (so a cheap tripwire stops the run before any
+#   LLM work is scheduled), then LLM-backed guardrails run concurrently with the agent's first model
+#   call and tool fetches. A tripwire cancels the in-flight turn and its result is discarded.
+# - "sequential": every guardrail finishes before the agent starts.
+GUARDRAIL_MODES = ("optimistic", "sequential")
+
+# Define output model for the guardrail agent to classify if input is off-topic
+class TopicClassificationOutput(BaseModel):
+    is_off_topic: bool = Field(
+        description="True if the input is off-topic (not related to weather/air quality and not a greeting), False otherwise"
+    )
+    reasoning: str = Field(
+        description="Brief explanation of why the input was classified as on-topic or off-topic"
+    )
+
+# Create the guardrail agent to determine if input is off-topic
+topic_classification_agent = Agent(
+    name="Topic Classification Agent",
+    instructions=(
+        "You are a topic classifier for a weather and air quality application. "
+        "Your task is to determine if a user's question is on-topic. "
+        "Allowed topics include: "
+        "1. Weather-related: current weather, weather forecast, temperature, precipitation, wind, humidity, etc. "
+        "2. Air quality-related: air pollution, AQI, PM2.5, ozone, air conditions, etc. "
+        "3. Location-based inquiries about weather or air conditions "
+        "4. Polite greetings and conversational starters (e.g., 'hello', 'hi', 'good morning') "
+        "5. Questions that combine greetings with weather/air quality topics "
+        "Mark as OFF-TOPIC only if the query is clearly unrelated to weather/air quality AND not a simple greeting. "
+        "Examples of off-topic: math problems, cooking recipes, sports scores, technical support, jokes (unless weather-related). "
+        "Examples of on-topic: 'Hello, what's the weather?', 'Hi there', 'Good morning, how's the air quality?', 'What's the temperature?' "
+        "The final output MUST be a JSON object conforming to the TopicClassificationOutput model."
+    ),
+    output_type=TopicClassificationOutput,
+    model="gpt-4o-mini" # Use a fast and cost-effective model
+)
+
+def latest_user_text(input) -> str:
+    """Return the text of the latest user message from a string or a list of input items."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if item.get("role") == "user":
+            content = item.get("content")
+            if isinstance(content, str):
+                return content
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+# Create the input guardrail function
+@input_guardrail
+async def off_topic_guardrail(ctx, agent, input) -> GuardrailFunctionOutput:
+    """
+    Classifies user input to ensure it is on-topic for a weather and air quality app.
+
+    Greetings and clear-cut queries are settled locally by the rule and TF-IDF tiers;
+    ambiguous inputs, and any off-topic verdict on a chat follow-up, are sent to the
+    topic classification agent with the full history.
+    """
+
+    follow_up = not isinstance(input, str) and len(input) > 1
+    decision = topic_classifier.classify_locally(latest_user_text(input), follow_up=follow_up)
+    if decision is not None:
+        return GuardrailFunctionOutput(
+            output_info=decision.reasoning,
+            tripwire_triggered=decision.is_off_topic
+        )
+
+    result = await Runner.run(topic_classification_agent, input, context=ctx.context)
+    return GuardrailFunctionOutput(
+        output_info=result.final_output.reasoning,
+        tripwire_triggered=result.final_output.is_off_topic
+    )
+
+# Known jailbreak phrases, compiled once and rebuilt whenever the pattern file changes
+injection_matcher = PatternFileMatcher(INJECTION_PATTERNS_PATH)
+
+# Rule-based input guardrail to detect jailbreaking and prompt injection query
+@input_guardrail
+async def injection_detection_guardrail(ctx, agent, input) -> GuardrailFunctionOutput:
+    """
+    Detects potential jailbreaking or prompt injection attempts in user input.
+    """
+
+    phrase = injection_matcher.search(latest_user_text(input))
+    if phrase is not None:
+        return GuardrailFunctionOutput(
+            output_info=f"Potential jailbreaking or prompt injection detected ('{phrase}').",
+            tripwire_triggered=True
+        )
+
+    return GuardrailFunctionOutput(
+        output_info="No jailbreaking or prompt injection detected.",
+        tripwire_triggered=False
+    )
+
+# Define output model for Output Guardrail Agent
+class ResponseCheckerOutput(BaseModel):
+    is_not_professional: bool = Field(
+        description="True if the output is not professional, False otherwise"
+    )
+    reasoning: str = Field(
+        description="Brief explanation of why the output was classified as professional or unprofessional"
+    )
+
+# Create Output Guardrail Agent
+response_checker_agent = Agent(
+    name="Response Checker Agent",
+    instructions="""
+    You are a response checker agent.
+    Your task is to evaluate the professionalism of the output generated by other agents.
+
+    For each response, provide:
+    1. A classification of the response as professional or unprofessional.
+    2. A brief explanation of the reasoning behind the classification.
+
+    Structure your response in two sections:
+    Professionalism Classification:
+    - State whether the response is professional or unprofessional.
+
+    Reasoning:
+    - Provide a brief explanation of the classification.
+    """,
+    output_type=ResponseCheckerOutput,
+    model="gpt-4o-mini"
+)
+
+# Local heuristics for the professionalism check: clear failures, and signs that need a closer look
+UNPROFESSIONAL_PATTERN = re.compile(
+    r"\b(damn\w*|hell|crap\w*|shit\w*|fuck\w*|bitch\w*|bastard\w*|ass|asshole\w*|"
+    r"idiot\w*|stupid\w*|moron\w*|dumb\w*|shut\s+up|screw\s+(it|you|this))\b",
+    re.IGNORECASE,
+)
+INFORMAL_PATTERN = re.compile(
+    r"([!?]{3,}|\b(lol|lmao|rofl|omg|wtf|smh|dude|bro|gonna|wanna|gotta|ya|yep|nope|meh|ugh|whatever)\b)",
+    re.IGNORECASE,
+)
+# Dismissive or condescending phrasing that the word lists cannot judge on their own
+TONE_PATTERN = re.compile(
+    r"\b(obviously|clearly\s+you|honestly|seriously|literally|you\s+people|your\s+problem|not\s+my\s+problem|"
+    r"figure\s+it\s+out|who\s+cares|as\s+i\s+said|like\s+i\s+said|of\s+course\s+not|calm\s+down)\b",
+    re.IGNORECASE,
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Longer sentences are left to the response checker agent
+MAX_CLEARED_CHARS = 300
+
+def check_professionalism_locally(chunk: str):
+    """
+    Return (is_not_professional, reasoning) for a sentence-sized chunk if the heuristics settle
+    it, or "unsure" if it needs the response checker agent. Only short sentences with normal
+    casing and no profane, informal or dismissive markers are cleared.
+    """
+    match = UNPROFESSIONAL_PATTERN.search(chunk)
+    if match:
+        return True, f"The response contains inappropriate language ('{match.group(0)}')."
+    letters = [c for c in chunk if c.isalpha()]
+    shouting = len(letters) >= 20 and sum(c.isupper() for c in letters) / len(letters) > 0.6
+    if shouting or len(chunk) > MAX_CLEARED_CHARS or INFORMAL_PATTERN.search(chunk) or TONE_PATTERN.search(chunk):
+        return "unsure"
+    return False, "The sentence has no unprofessional markers."
+
+class IncrementalProfessionalismCheck:
+    """
+    Checks a response for professionalism in sentence-sized chunks as it is produced.
+
+    The local heuristics clear plainly benign sentences and trip the check at once on clear
+    failures. Only the sentences they are unsure about are reviewed by the response checker
+    agent, each sent as soon as it is complete, so the review runs alongside generation and
+    most answers need no agent call. `tripped` is set as soon as any chunk fails.
+    """
+
+    def __init__(self, context=None):
+        self.context = context
+        self.tripped = None
+        self._buffer = ""
+        self._tasks = set()
+
+    @property
+    def name(self) -> str:
+        """Name of the output guardrail this check stands in for."""
+        return professionalism_guardrail.get_name()
+
+    def feed(self, text: str) -> None:
+        """Add generated text and check every sentence it completes."""
+        self._buffer += text
+        *sentences, self._buffer = SENTENCE_END.split(self._buffer)
+        for sentence in sentences:
+            self._check(sentence)
+
+    def _check(self, chunk: str) -> None:
+        if self.tripped is not None or not chunk.strip():
+            return
+        verdict = check_professionalism_locally(chunk)
+        output_check_stats.record("llm" if verdict == "unsure" else "local")
+        if verdict == "unsure":
+            self._send(chunk)
+        elif verdict[0]:
+            self._trip(GuardrailFunctionOutput(output_info=verdict[1], tripwire_triggered=True))
+
+    def _send(self, chunk: str) -> None:
+        task = asyncio.create_task(self._check_with_agent(chunk))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _trip(self, output: GuardrailFunctionOutput) -> None:
+        if self.tripped is None:
+            self.tripped = output
+
+    async def _check_with_agent(self, chunk: str) -> None:
+        result = await Runner.run(response_checker_agent, chunk, context=self.context)
+        if result.final_output.is_not_professional:
+            self._trip(GuardrailFunctionOutput(
+                output_info=result.final_output.reasoning,
+                tripwire_triggered=True
+            ))
+
+    async def finish(self) -> GuardrailFunctionOutput:
+        """Check the remaining text, wait for pending agent checks and return the verdict."""
+        self._check(self._buffer)
+        self._buffer = ""
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        return self.tripped or GuardrailFunctionOutput(
+            output_info="The response uses a professional tone.",
+            tripwire_triggered=False
+        )
+
+    def close(self) -> None:
+        """Cancel agent checks that are still running."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def tripwire(self, agent, agent_output) -> OutputGuardrailTripwireTriggered:
+        """Build the exception raised when a streamed response fails the check."""
+        return OutputGuardrailTripwireTriggered(OutputGuardrailResult(
+            guardrail=professionalism_guardrail,
+            agent_output=agent_output,
+            agent=agent,
+            output=self.tripped,
+        ))
+
+class OutputCheckStats:
+    """Counts how many response chunks were settled locally versus reviewed by the checker agent."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, tier: str) -> None:
+        with self._lock:
+            self.counts[tier] += 1
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            "chunks": total,
+            "local_hits": self.counts["local"],
+            "llm_hits": self.counts["llm"],
+            "local_rate": self.counts["local"] / total if total else 0.0,
+        }
+
+output_check_stats = OutputCheckStats()
+
+# Define output guardrail function
+@output_guardrail
+async def professionalism_guardrail(ctx, agent, output) -> GuardrailFunctionOutput:
+    """
+    Checks the final output sentence by sentence; most sentences are settled locally and
+    the rest are reviewed by the response checker agent concurrently.
+    """
+    check = IncrementalProfessionalismCheck(ctx.context)
+    check.feed(str(output))
+    try:
+        return await check.finish()
+    finally:
+        check.close()
+
+def blocking(guardrail):
+    """Return a copy of an input guardrail that must finish before the agent starts."""
+    return dataclasses.replace(guardrail, run_in_parallel=False)
+
+def input_guardrails_for(mode: str, rule_based: list, model_based: list) -> list:
+    """Arrange rule-based and LLM-backed input guardrails for the given execution mode."""
+    if mode not in GUARDRAIL_MODES:
+        raise ValueError(f"Unknown guardrail mode: {mode}")
+    if mode == "sequential":
+        return [blocking(g) for g in rule_based + model_based]
+    return [blocking(g) for g in rule_based] + list(model_based)
+
+# Process-wide wall-clock latency of guarded runs per execution mode, so the modes can be compared
+run_latencies = {mode: LatencySamples() for mode in GUARDRAIL_MODES}
@@ -0,0 +1,353 @@
+"""
+Prometheus-style runtime metrics for the assistant, served on a local HTTP endpoint.
+
+Counters, gauges and histograms record into a per-thread shard: each thread only ever
+writes its own plain dict, so recording takes no lock and never contends with other
+threads or with a scrape. A scrape copies every shard and sums them, then renders the
+Prometheus text exposition format. Values that other modules already count (cache hits,
+classifier tiers) are read at scrape time through callbacks instead of being recorded twice.
+
+`MetricsProcessor` is a tracing processor that turns spans into metrics: guardrail trips by
+guardrail name, function tool latency and errors, and model tokens per agent.
+
+    from metrics import start_http_server
+    start_http_server(9464)   # then scrape http://127.0.0.1:9464/metrics
+"""
+import asyncio
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered, add_trace_processor
+from agents.tracing import TracingProcessor
+
+from run_stats import MODEL_SPAN_TYPES, TOOL_SPAN_TYPE, span_token_usage
+
+# Histogram buckets in seconds, from a cache hit to a slow multi-agent run
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Shards:
+    """One dict of metric values per thread; the list of shards is only locked when a thread first records."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def local(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def snapshot(self) -> list:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so each copy is consistent
+        return [shard.copy() for shard in shards]
+
+
+_shards = _Shards()
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return (self.name, tuple(str(labels[name]) for name in self.labelnames))
+
+    def collect(self, shards: list) -> dict:
+        """Return {label values: value} summed over all shards."""
+        totals = {}
+        for shard in shards:
+            for (name, labels), value in shard.items():
+                if name == self.name:
+                    totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self, shards: list) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        # Unlabelled metrics are reported as zero before anything was recorded
+        totals = self.collect(shards) or ({} if self.labelnames else {(): 0})
+        for labels, value in sorted(totals.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        shard = _shards.local()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """Gauge summed across threads, so one thread may increment and another decrement."""
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        shard = _shards.local()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            # One count per bucket (the last one is +Inf), then the sum
+            entry = shard[key] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def collect(self, shards: list) -> dict:
+        totals = {}
+        for shard in shards:
+            for (name, labels), entry in shard.items():
+                if name == self.name:
+                    total = totals.setdefault(labels, [0] * len(entry))
+                    for index, value in enumerate(entry):
+                        total[index] += value
+        return totals
+
+    def render(self, shards: list) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, entry in sorted(self.collect(shards).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Callback(Metric):
+    """Metric read at scrape time from `fn`, which returns {label values tuple: value}."""
+
+    def __init__(self, name: str, help: str, type: str, fn, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def collect(self, shards: list) -> dict:
+        return self.fn()
+
+
+def render() -> str:
+    """Return every registered metric in the Prometheus text exposition format."""
+    shards = _shards.snapshot()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(shards))
+    return "\n".join(lines) + "\n"
+
+
+# Define the assistant's metrics
+request_seconds = Histogram(
+    "assistant_request_seconds", "Wall-clock time of a user request.", ("answer_mode", "outcome"))
+runs_in_flight = Gauge("assistant_runs_in_flight", "User requests currently running.")
+guardrail_checks = Counter("assistant_guardrail_checks_total", "Guardrail checks run.", ("guardrail",))
+guardrail_trips = Counter("assistant_guardrail_trips_total", "Guardrail checks that tripped.", ("guardrail",))
+tool_call_seconds = Histogram("assistant_tool_call_seconds", "Duration of function tool calls.", ("tool",))
+tool_call_errors = Counter("assistant_tool_call_errors_total", "Function tool calls that failed.", ("tool",))
+model_tokens = Counter("assistant_model_tokens_total", "Model tokens by agent and direction.", ("agent", "direction"))
+model_calls = Counter("assistant_model_calls_total", "Model calls by agent.", ("agent",))
+upstream_seconds = Histogram(
+    "assistant_open_meteo_request_seconds", "Duration of Open-Meteo requests.", ("endpoint", "status"))
+upstream_errors = Counter(
+    "assistant_open_meteo_errors_total", "Failed Open-Meteo requests.", ("endpoint", "error"))
+
+
+def endpoint_name(url: str) -> str:
+    """Short label for an Open-Meteo URL, e.g. `forecast` or `air-quality`."""
+    return urlparse(url).path.rstrip("/").rsplit("/", 1)[-1] or url
+
+
+def _cache_stats(field: str):
+    # Imported lazily so this module does not pull in the cache for callers that never scrape
+    def collect():
+        from weather_cache import response_cache
+        return {(): response_cache.stats()[field]}
+    return collect
+
+
+def _answer_cache_stats(field: str):
+    def collect():
+        from answer_cache import answer_cache
+        return {(): answer_cache.stats()[field]}
+    return collect
+
+
+def _classifier_tiers():
+    from topic_classifier import topic_classifier
+    return {(tier,): count for tier, count in topic_classifier.counts.items()}
+
+
+Callback("assistant_weather_cache_hits_total", "Open-Meteo response cache hits.", "counter", _cache_stats("hits"))
+Callback("assistant_weather_cache_misses_total", "Open-Meteo response cache misses.", "counter", _cache_stats("misses"))
+Callback("assistant_weather_cache_hit_ratio", "Share of cache lookups that were hits.", "gauge", _cache_stats("hit_ratio"))
+Callback("assistant_answer_cache_hits_total", "Questions answered from the semantic answer cache.", "counter",
+         _answer_cache_stats("hits"))
+Callback("assistant_answer_cache_misses_total", "Cacheable questions the answer cache could not answer.", "counter",
+         _answer_cache_stats("misses"))
+Callback("assistant_topic_classifier_settled_total", "Off-topic checks settled by each classifier tier.", "counter",
+         _classifier_tiers, ("tier",))
+
+
+def _seconds(started_at: str, ended_at: str) -> float:
+    if not started_at or not ended_at:
+        return 0.0
+    return (datetime.fromisoformat(ended_at) - datetime.fromisoformat(started_at)).total_seconds()
+
+
+class MetricsProcessor(TracingProcessor):
+    """Records guardrail, tool and model token metrics from finished spans."""
+
+    def __init__(self):
+        # Agent name of each open span per trace, so model calls can be attributed to their agent
+        self._agents = {}
+
+    def on_trace_start(self, trace) -> None:
+        self._agents[trace.trace_id] = {}
+
+    def on_trace_end(self, trace) -> None:
+        self._agents.pop(trace.trace_id, None)
+
+    def on_span_start(self, span) -> None:
+        agents = self._agents.get(span.trace_id)
+        if agents is None:
+            return
+        if span.span_data.type == "agent":
+            agents[span.span_id] = span.span_data.name
+        elif span.parent_id in agents:
+            agents[span.span_id] = agents[span.parent_id]
+
+    def on_span_end(self, span) -> None:
+        data = span.span_data
+        if data.type == "guardrail":
+            guardrail_checks.inc(guardrail=data.name)
+            if data.triggered:
+                guardrail_trips.inc(guardrail=data.name)
+        elif data.type == TOOL_SPAN_TYPE:
+            tool_call_seconds.observe(_seconds(span.started_at, span.ended_at), tool=data.name)
+            if span.error:
+                tool_call_errors.inc(tool=data.name)
+        elif data.type in MODEL_SPAN_TYPES:
+            agent = self._agents.get(span.trace_id, {}).get(span.span_id, "unknown")
+            input_tokens, output_tokens = span_token_usage(data)
+            model_calls.inc(agent=agent)
+            model_tokens.inc(input_tokens, agent=agent, direction="input")
+            model_tokens.inc(output_tokens, agent=agent, direction="output")
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+
+add_trace_processor(MetricsProcessor())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Serve `/metrics` from a daemon thread and return the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def outcome_of(error: BaseException) -> str:
+    """Label for how a run ended, from the exception it raised (None if it succeeded)."""
+    if error is None:
+        return "ok"
+    if isinstance(error, InputGuardrailTripwireTriggered):
+        return "input_guardrail"
+    if isinstance(error, OutputGuardrailTripwireTriggered):
+        return "output_guardrail"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return "error"
+
+
+@contextmanager
+def track_run(answer_mode: str):
+    """Record a user request's latency and outcome, and count it as in flight while the body runs."""
+    runs_in_flight.inc()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        runs_in_flight.dec()
+        request_seconds.observe(time.perf_counter() - start, answer_mode=answer_mode, outcome=outcome_of(error))
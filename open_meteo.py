@@ -0,0 +1,241 @@
+"""
+Shared async client for the Open-Meteo weather and air quality APIs.
+
+All agents fetch their data through this module so that tool calls reuse pooled
+keep-alive connections (HTTP/2 where the server negotiates it) instead of opening
+a new TCP+TLS connection for every request, and never block the event loop that
+`Runner.run` is driving.
+"""
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import time
+import weakref
+
+import httpx
+from agents.tracing import SpanError, custom_span
+
+import metrics
+from prewarm import prewarmer
+from singleflight import SingleFlight
+from weather_cache import response_cache
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+AIR_QUALITY_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+CURRENT_WEATHER_VARIABLES = "temperature_2m,relative_humidity_2m,dew_point_2m,apparent_temperature,precipitation,weathercode,windspeed_10m,winddirection_10m"
+CURRENT_AIR_QUALITY_VARIABLES = "european_aqi,us_aqi,pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone"
+
+HOURLY_WEATHER_VARIABLES = "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation_probability,precipitation,weathercode,windspeed_10m,uv_index,is_day"
+DAILY_WEATHER_VARIABLES = "weathercode,temperature_2m_max,temperature_2m_min,precipitation_sum,precipitation_probability_max,uv_index_max"
+# The air quality API has no daily block; days are aggregated from the hourly series
+HOURLY_AIR_QUALITY_VARIABLES = "european_aqi,us_aqi,pm10,pm2_5,nitrogen_dioxide,ozone"
+
+HISTORY_WEATHER_VARIABLES = CURRENT_WEATHER_VARIABLES
+# The archive API lags by a few days; more recent history comes from the forecast API
+ARCHIVE_DELAY_DAYS = 5
+
+# Days of forecast fetched per request; tools slice shorter horizons locally so they share one cache entry
+FORECAST_DAYS = 7
+
+# Connection pool settings shared by every client
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+# httpx clients are bound to the event loop they were first used on, so keep one per loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+# Concurrent misses for the same cache key share a single upstream request
+in_flight = SingleFlight()
+
+# Optional httpx transport for every client, e.g. the in-process stub in `fakes`
+_transport = None
+
+
+def set_transport(transport) -> None:
+    """Send all Open-Meteo requests through `transport` (None restores the network)."""
+    global _transport
+    _transport = transport
+    _clients.clear()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the pooled HTTP client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=True,
+            limits=POOL_LIMITS,
+            timeout=REQUEST_TIMEOUT,
+            transport=_transport,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the pooled client of the running event loop, if any."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def get_json(url: str, params: dict) -> dict:
+    """Send a GET request through the pooled client and return the decoded JSON body."""
+    # Recorded as a span of the current trace, so upstream time shows up next to the tool call
+    locations = str(params.get("latitude", "")).count(",") + 1
+    endpoint = metrics.endpoint_name(url)
+    start = time.perf_counter()
+    with custom_span("Open-Meteo request", {"url": url, "locations": locations}) as span:
+        try:
+            response = await get_client().get(url, params=params)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            span.set_error(SpanError(message=f"{type(e).__name__}: {e}", data=None))
+            status = str(e.response.status_code) if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+            metrics.upstream_errors.inc(endpoint=endpoint, error=status)
+            metrics.upstream_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+            raise
+        metrics.upstream_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=str(response.status_code))
+        return response.json()
+
+
+async def fetch_current(url: str, latitude: float, longitude: float, variables: str) -> dict:
+    """
+    Fetch the `current` block of an endpoint, served from the response cache when possible.
+
+    The request is made for the center of the cache grid cell, so every caller that maps
+    to the same cell receives the same payload. Concurrent misses for the same key are
+    coalesced into one upstream request whose result is written to the cache.
+    """
+    key = response_cache.make_key(url, latitude, longitude, variables)
+    prewarmer.note(url, key[1], variables)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    params = {"current": variables, "timezone": "auto"}
+    return await in_flight.do(key, lambda: _fetch_into_cache(url, key, params))
+
+
+async def _fetch_into_cache(url: str, key: tuple, params: dict) -> dict:
+    cell_latitude, cell_longitude = key[1]
+    data = await get_json(url, {"latitude": cell_latitude, "longitude": cell_longitude, **params})
+    response_cache.set(key, data)
+    return data
+
+
+async def fetch_forecast(url: str, latitude: float, longitude: float, hourly: str, daily: str = "") -> dict:
+    """
+    Fetch the `hourly` (and optionally `daily`) series of an endpoint for the next
+    `FORECAST_DAYS` days, cached and coalesced per grid cell like `fetch_current`.
+    """
+    variables = ",".join(
+        [f"hourly.{v}" for v in hourly.split(",")]
+        + [f"daily.{v}" for v in daily.split(",") if v]
+        + [f"forecast_days.{FORECAST_DAYS}"]
+    )
+    key = response_cache.make_key(url, latitude, longitude, variables)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    params = {"hourly": hourly, "forecast_days": FORECAST_DAYS, "timezone": "auto"}
+    if daily:
+        params["daily"] = daily
+    return await in_flight.do(key, lambda: _fetch_into_cache(url, key, params))
+
+
+async def fetch_current_batch(url: str, locations: list, variables: str) -> list:
+    """
+    Fetch the `current` block for several (latitude, longitude) pairs with one upstream request.
+
+    Cached cells are served from the response cache; the remaining distinct cells are requested
+    together using Open-Meteo's comma-separated coordinate lists and written to the cache.
+    Payloads are returned in the order of `locations`.
+    """
+    keys = [response_cache.make_key(url, latitude, longitude, variables) for latitude, longitude in locations]
+    payloads = {key: response_cache.get(key) for key in dict.fromkeys(keys)}
+    for key in payloads:
+        prewarmer.note(url, key[1], variables)
+    missing = [key for key, payload in payloads.items() if payload is None]
+    if missing:
+        payloads.update(zip(missing, await refresh_current_batch(url, missing, variables)))
+    return [payloads[key] for key in keys]
+
+
+async def refresh_current_batch(url: str, keys: list, variables: str) -> list:
+    """
+    Fetch the `current` block for distinct cache keys with one upstream request and store the
+    payloads. Keys already being fetched, by a single-place call or another batch, join that
+    flight instead of being requested again, and single-place calls made meanwhile join this one.
+    """
+    return await in_flight.do_many(keys, lambda leading: _fetch_batch_into_cache(url, leading, variables))
+
+
+async def _fetch_batch_into_cache(url: str, keys: list, variables: str) -> list:
+    params = {
+        "latitude": ",".join(str(key[1][0]) for key in keys),
+        "longitude": ",".join(str(key[1][1]) for key in keys),
+        "current": variables,
+        "timezone": "auto"
+    }
+    data = await get_json(url, params)
+    # One location is answered with an object, several with a list in request order
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or len(data) != len(keys):
+        count = len(data) if isinstance(data, list) else type(data).__name__
+        raise httpx.DecodingError(f"Expected {len(keys)} locations from {url}, got {count}")
+    for key, payload in zip(keys, data):
+        response_cache.set(key, payload)
+    return data
+
+
+async def fetch_current_weather(latitude: float, longitude: float) -> dict:
+    """Fetch the `current` weather block for the given coordinates."""
+    return await fetch_current(FORECAST_URL, latitude, longitude, CURRENT_WEATHER_VARIABLES)
+
+
+async def fetch_current_air_quality(latitude: float, longitude: float) -> dict:
+    """Fetch the `current` air quality block for the given coordinates."""
+    return await fetch_current(AIR_QUALITY_URL, latitude, longitude, CURRENT_AIR_QUALITY_VARIABLES)
+
+
+async def fetch_current_weather_batch(locations: list) -> list:
+    """Fetch the `current` weather block for a list of (latitude, longitude) pairs."""
+    return await fetch_current_batch(FORECAST_URL, locations, CURRENT_WEATHER_VARIABLES)
+
+
+async def fetch_current_air_quality_batch(locations: list) -> list:
+    """Fetch the `current` air quality block for a list of (latitude, longitude) pairs."""
+    return await fetch_current_batch(AIR_QUALITY_URL, locations, CURRENT_AIR_QUALITY_VARIABLES)
+
+
+async def fetch_weather_forecast(latitude: float, longitude: float) -> dict:
+    """Fetch the hourly and daily weather forecast for the given coordinates."""
+    return await fetch_forecast(FORECAST_URL, latitude, longitude, HOURLY_WEATHER_VARIABLES, DAILY_WEATHER_VARIABLES)
+
+
+async def fetch_air_quality_forecast(latitude: float, longitude: float) -> dict:
+    """Fetch the hourly air quality forecast for the given coordinates."""
+    return await fetch_forecast(AIR_QUALITY_URL, latitude, longitude, HOURLY_AIR_QUALITY_VARIABLES)
+
+
+async def fetch_history(latitude: float, longitude: float, start_date: str, end_date: str) -> dict:
+    """
+    Fetch the hourly weather of a past date range (inclusive, local dates) for the grid cell
+    of the given coordinates. Not cached here: callers store the result in `weather_archive`.
+    """
+    cell_latitude, cell_longitude = response_cache.quantize(latitude, longitude)
+    recent = datetime.now(timezone.utc).date() - timedelta(days=ARCHIVE_DELAY_DAYS)
+    url = FORECAST_URL if date.fromisoformat(end_date) > recent else ARCHIVE_URL
+    params = {
+        "latitude": cell_latitude,
+        "longitude": cell_longitude,
+        "hourly": HISTORY_WEATHER_VARIABLES,
+        "start_date": start_date,
+        "end_date": end_date,
+        "timezone": "auto",
+    }
+    key = (url, (cell_latitude, cell_longitude), start_date, end_date)
+    return await in_flight.do(key, lambda: get_json(url, params))
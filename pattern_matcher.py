@@ -0,0 +1,135 @@
+"""
+Multi-pattern phrase matching for the prompt injection guardrail.
+
+Patterns are compiled once into an Aho-Corasick automaton, so matching an input costs a
+single pass over its characters no matter how many phrases are loaded. Inputs and patterns
+go through the same Unicode/whitespace normalization, so fullwidth letters, zero-width
+characters or extra line breaks do not let a known phrase slip through.
+"""
+import os
+import threading
+import time
+import unicodedata
+
+
+def normalize_text(text: str, format_chars: str = " ") -> str:
+    """
+    NFKC-normalize, casefold, replace invisible format characters (zero-width spaces and
+    joiners) with `format_chars` and collapse whitespace. Format characters become spaces by
+    default, since one may be the only separator between two words.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(format_chars if unicodedata.category(c) == "Cf" else c for c in text)
+    return " ".join(text.split())
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over a fixed set of (already normalized) patterns."""
+
+    def __init__(self, patterns: list):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern, index)
+        self._link()
+
+    def _add(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] += (index,)
+
+    def _link(self) -> None:
+        # Breadth-first pass to compute failure links and merge outputs along them
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def search(self, text: str):
+        """Return the first pattern found in `text`, or None."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return self.patterns[output[state][0]]
+        return None
+
+    def find_all(self, text: str) -> list:
+        """Return every (end_offset, pattern) occurrence in `text`."""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for offset, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            matches.extend((offset, self.patterns[i]) for i in output[state])
+        return matches
+
+
+def load_patterns(path: str) -> list:
+    """Read one phrase per line, skipping blank lines and `#` comments."""
+    with open(path, encoding="utf-8") as f:
+        phrases = (normalize_text(line) for line in f if not line.lstrip().startswith("#"))
+        return sorted({phrase for phrase in phrases if phrase})
+
+
+class PatternFileMatcher:
+    """Matcher over a pattern file that is rebuilt when the file changes on disk."""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._checked_at = time.monotonic()
+        self._automaton = AhoCorasick(load_patterns(path))
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self._automaton.patterns)
+
+    def reload_if_changed(self) -> bool:
+        """Rebuild the automaton if the pattern file changed; return True if it was reloaded."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            automaton = AhoCorasick(load_patterns(self.path))
+            self._automaton, self._mtime = automaton, mtime
+            return True
+
+    def search(self, text: str):
+        """Return the first known phrase contained in `text` after normalization, or None."""
+        self.reload_if_changed()
+        match = self._automaton.search(normalize_text(text))
+        if match is None and any(unicodedata.category(c) == "Cf" for c in text):
+            # Format characters can also split a word ("ign\u200bore"), so try them removed too
+            match = self._automaton.search(normalize_text(text, format_chars=""))
+        return match
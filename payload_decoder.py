@@ -0,0 +1,78 @@
+"""
+Compact decoding of Open-Meteo `current` payloads for tool output.
+
+The raw JSON carries a `current_units` block, `generationtime_ms`, `elevation`, timezone
+metadata and long variable names, all of which the model would otherwise read as prompt
+tokens on every tool call. `decode_current` keeps only the observation time and the
+requested variables, and `CurrentConditions.compact()` renders them as one line with short
+stable names in request order and each value's unit written right after it, e.g.
+
+    time=2026-10-18T12:00 temperature=31.2°C humidity=74% weather_code=3 wind_speed=9.4km/h
+"""
+from dataclasses import dataclass
+
+# Shorter names for the requested variables; variables not listed keep their API name
+SHORT_NAMES = {
+    "temperature_2m": "temperature",
+    "relative_humidity_2m": "humidity",
+    "dew_point_2m": "dew_point",
+    "apparent_temperature": "feels_like",
+    "weathercode": "weather_code",
+    "windspeed_10m": "wind_speed",
+    "winddirection_10m": "wind_direction",
+}
+
+# Units that the variable name already implies
+IMPLIED_UNITS = {"", "wmo code", "EAQI", "USAQI", "iso8601", "unixtime"}
+
+
+@dataclass(frozen=True, slots=True)
+class Reading:
+    name: str
+    value: float
+    unit: str
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentConditions:
+    time: str
+    readings: tuple
+
+    def get(self, name: str):
+        """Return the value of a reading by its short name, or None."""
+        for reading in self.readings:
+            if reading.name == name:
+                return reading.value
+        return None
+
+    def compact(self) -> str:
+        parts = [f"time={self.time}"] if self.time else []
+        parts.extend(f"{r.name}={format_number(r.value)}{r.unit}" for r in self.readings)
+        return " ".join(parts)
+
+
+def format_number(value) -> str:
+    """Render a number with at most two decimals and no trailing `.0`."""
+    if isinstance(value, float):
+        value = round(value, 2)
+        if value.is_integer():
+            value = int(value)
+    return str(value)
+
+
+def decode_current(payload: dict, variables: str) -> CurrentConditions:
+    """Decode the `current` block of a payload, keeping `variables` (comma-separated) in order."""
+    current = payload.get("current", {})
+    units = payload.get("current_units", {})
+    readings = []
+    for variable in variables.split(","):
+        value = current.get(variable)
+        if value is None:
+            continue
+        unit = units.get(variable, "")
+        readings.append(Reading(
+            SHORT_NAMES.get(variable, variable),
+            value,
+            "" if unit in IMPLIED_UNITS else unit,
+        ))
+    return CurrentConditions(current.get("time"), tuple(readings))
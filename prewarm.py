@@ -0,0 +1,174 @@
+"""
+Background pre-warming of the Open-Meteo response cache for popular grid cells.
+
+Every cache entry expires at the upstream refresh boundary, so the first user to ask about a
+city after each boundary waits for the upstream fetch. `Prewarmer` counts `current` lookups
+per (endpoint, grid cell, variable set), and a few seconds after each boundary refreshes the
+top-K cells that are not warm yet, batched into multi-location requests, so interactive
+requests find them in the cache. Counts decay every cycle, so the set follows recent demand.
+The batches go through open_meteo's single-flight, so a user request for a cell being
+refreshed waits for the refresh instead of fetching the cell again.
+
+`PREWARM_BUDGET` caps the upstream requests made per cycle (0 disables pre-warming) and
+`PREWARM_TOP_K` the cells considered; a cell needs `PREWARM_MIN_SCORE` decayed lookups to be
+worth a request. Worker processes sharing a cache file skip cells another worker already
+warmed, and start at a random offset within `PREWARM_JITTER_SECONDS` to make that likely.
+"""
+from collections import defaultdict
+import asyncio
+import logging
+import os
+import random
+import threading
+
+import httpx
+
+import metrics
+from weather_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+PREWARM_BUDGET = int(os.getenv("PREWARM_BUDGET", "4"))
+PREWARM_TOP_K = int(os.getenv("PREWARM_TOP_K", "40"))
+PREWARM_MIN_SCORE = float(os.getenv("PREWARM_MIN_SCORE", "1.0"))
+# Seconds after a refresh boundary to start, giving the upstream time to publish the new data
+PREWARM_DELAY_SECONDS = float(os.getenv("PREWARM_DELAY_SECONDS", "5"))
+PREWARM_JITTER_SECONDS = float(os.getenv("PREWARM_JITTER_SECONDS", "5"))
+
+# Share of each count kept from one refresh cycle to the next
+DECAY = 0.5
+# Locations per upstream request, like the batch tools
+BATCH_SIZE = 50
+MAX_TRACKED = 4096
+
+prewarm_locations = metrics.Counter(
+    "assistant_prewarm_locations_total", "Grid cells refreshed ahead of demand.", ("endpoint",)
+)
+prewarm_requests = metrics.Counter(
+    "assistant_prewarm_requests_total", "Upstream requests made to refresh cells ahead of demand.", ("endpoint",)
+)
+prewarm_errors = metrics.Counter(
+    "assistant_prewarm_errors_total", "Pre-warming requests that failed.", ("endpoint",)
+)
+
+
+class Prewarmer:
+    """Demand counts per cache key and the loop that refreshes the most requested ones."""
+
+    def __init__(self, cache=response_cache, budget: int = PREWARM_BUDGET, top_k: int = PREWARM_TOP_K,
+                 min_score: float = PREWARM_MIN_SCORE, delay: float = PREWARM_DELAY_SECONDS,
+                 jitter: float = PREWARM_JITTER_SECONDS):
+        self.cache = cache
+        self.budget = budget
+        self.top_k = top_k
+        self.min_score = min_score
+        self.delay = delay
+        self.jitter = jitter
+        self.cycles = 0
+        self.refreshed = 0
+        self.requests = 0
+        self.already_warm = 0
+        self.errors = 0
+        self._scores = {}  # (url, cell, variables) -> decayed lookup count
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def note(self, url: str, cell: tuple, variables: str) -> None:
+        """Count one lookup of a cell's `current` block."""
+        key = (url, cell, variables)
+        with self._lock:
+            self._scores[key] = self._scores.get(key, 0.0) + 1.0
+
+    def popular(self) -> list:
+        """Return the top-K (url, cell, variables) keys with enough demand, most requested first."""
+        with self._lock:
+            ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)
+        return [key for key, score in ranked[:self.top_k] if score >= self.min_score]
+
+    def decay(self) -> None:
+        """Age the counts by one cycle and forget keys that no longer matter."""
+        with self._lock:
+            scores = {key: score * DECAY for key, score in self._scores.items()}
+            scores = {key: score for key, score in scores.items() if score >= self.min_score * DECAY}
+            if len(scores) > MAX_TRACKED:
+                scores = dict(sorted(scores.items(), key=lambda item: item[1], reverse=True)[:MAX_TRACKED])
+            self._scores = scores
+
+    async def refresh(self) -> int:
+        """
+        Refresh the popular cells that are not warm with at most `budget` batched requests, most
+        requested first; return how many cells were fetched.
+        """
+        # Imported here because open_meteo reports its lookups to this module
+        import open_meteo
+
+        groups = defaultdict(list)
+        for url, cell, variables in self.popular():
+            key = self.cache.make_key(url, cell[0], cell[1], variables)
+            if self.cache.contains(key):
+                self.already_warm += 1
+                continue
+            groups[(url, variables)].append(key)
+        batches = [
+            (url, variables, keys[i:i + BATCH_SIZE])
+            for (url, variables), keys in groups.items()
+            for i in range(0, len(keys), BATCH_SIZE)
+        ]
+        # Each batch is one upstream request; groups are in order of their most requested cell
+        batches = batches[:self.budget]
+        results = await asyncio.gather(
+            *(open_meteo.refresh_current_batch(url, keys, variables) for url, variables, keys in batches),
+            return_exceptions=True,
+        )
+        fetched = 0
+        for (url, _, keys), result in zip(batches, results):
+            endpoint = metrics.endpoint_name(url)
+            self.requests += 1
+            prewarm_requests.inc(endpoint=endpoint)
+            if isinstance(result, httpx.HTTPError):
+                self.errors += 1
+                prewarm_errors.inc(endpoint=endpoint)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                fetched += len(keys)
+                prewarm_locations.inc(len(keys), endpoint=endpoint)
+        self.refreshed += fetched
+        return fetched
+
+    def seconds_until_next_cycle(self) -> float:
+        now = self.cache.clock()
+        return self.cache.expires_at(now) - now + self.delay + random.uniform(0, self.jitter)
+
+    async def run(self) -> None:
+        """Refresh popular cells just after every upstream refresh boundary, until cancelled."""
+        while True:
+            await asyncio.sleep(self.seconds_until_next_cycle())
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Pre-warming failed: %s: %s", type(e).__name__, e)
+            self.decay()
+            self.cycles += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            tracked = len(self._scores)
+        return {
+            "tracked": tracked,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "requests": self.requests,
+            "already_warm": self.already_warm,
+            "errors": self.errors,
+        }
+
+
+# Process-wide pre-warmer fed by every `current` lookup in open_meteo
+prewarmer = Prewarmer()
+
+metrics.Callback("assistant_prewarm_tracked_cells", "Cache keys with recent demand tracked for pre-warming.", "gauge",
+                 lambda: {(): prewarmer.stats()["tracked"]})
@@ -0,0 +1,136 @@
+"""
+Model calls, tool calls, tokens and latency of agent runs, compared across answer modes.
+
+Nested specialist runs (agents used as tools) do not show up in the outer run's result, but
+they do record their model and tool calls as spans of the same trace. `TraceUsageCounter` is
+a tracing processor that sums those spans per trace, so a whole chain of runs can be measured.
+Counts are read with `pop` before the trace ends; whatever is left is dropped at trace end.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import statistics
+import threading
+import time
+
+from agents import add_trace_processor, trace
+from agents.tracing import get_current_trace
+from agents.tracing import TracingProcessor
+
+from streaming import LatencySamples
+
+# Span types recorded for each request to a model, and for each function tool call
+MODEL_SPAN_TYPES = ("response", "generation")
+TOOL_SPAN_TYPE = "function"
+
+USAGE_FIELDS = ("model_calls", "tool_calls", "input_tokens", "output_tokens")
+
+
+def span_token_usage(span_data):
+    """Return (input_tokens, output_tokens) reported by a model call span."""
+    usage = getattr(span_data, "usage", None)
+    if isinstance(usage, dict):
+        return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+    response = getattr(span_data, "response", None)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return usage.input_tokens or 0, usage.output_tokens or 0
+    return 0, 0
+
+
+class TraceUsageCounter(TracingProcessor):
+    """Sums model calls, tool calls and tokens per trace id."""
+
+    def __init__(self):
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def on_trace_start(self, trace) -> None:
+        pass
+
+    def on_trace_end(self, trace) -> None:
+        with self._lock:
+            self._usage.pop(trace.trace_id, None)
+
+    def on_span_start(self, span) -> None:
+        pass
+
+    def on_span_end(self, span) -> None:
+        span_type = span.span_data.type
+        if span_type in MODEL_SPAN_TYPES:
+            input_tokens, output_tokens = span_token_usage(span.span_data)
+            update = {"model_calls": 1, "input_tokens": input_tokens, "output_tokens": output_tokens}
+        elif span_type == TOOL_SPAN_TYPE:
+            update = {"tool_calls": 1}
+        else:
+            return
+        with self._lock:
+            self._usage.setdefault(span.trace_id, Counter()).update(update)
+
+    def peek(self, trace_id: str) -> dict:
+        """Return the usage recorded so far for a trace without forgetting it."""
+        with self._lock:
+            usage = Counter(self._usage.get(trace_id, ()))
+        return {field: usage[field] for field in USAGE_FIELDS}
+
+    def pop(self, trace_id: str) -> dict:
+        """Return and forget the usage recorded so far for a trace."""
+        with self._lock:
+            usage = self._usage.pop(trace_id, Counter())
+        return {field: usage[field] for field in USAGE_FIELDS}
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+
+trace_usage = TraceUsageCounter()
+add_trace_processor(trace_usage)
+
+
+class ModeComparison:
+    """Latency and model calls per run, grouped by mode."""
+
+    def __init__(self, modes):
+        self._latencies = {mode: LatencySamples() for mode in modes}
+        self._model_calls = {mode: [] for mode in modes}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, seconds: float, model_calls: int) -> None:
+        self._latencies[mode].record(seconds)
+        with self._lock:
+            self._model_calls[mode].append(model_calls)
+
+    @contextmanager
+    def measure(self, mode: str, workflow_name: str = "Weather assistant"):
+        """
+        Record the latency and model calls of the body under `mode`. The body runs in its own
+        trace, or, when called inside a trace (e.g. a batch run), is measured within that one.
+        """
+        start = time.perf_counter()
+        current = get_current_trace()
+        if current is not None:
+            before = trace_usage.peek(current.trace_id)["model_calls"]
+            try:
+                yield
+            finally:
+                calls = trace_usage.peek(current.trace_id)["model_calls"] - before
+                self.record(mode, time.perf_counter() - start, calls)
+            return
+        with trace(workflow_name) as current:
+            try:
+                yield
+            finally:
+                self.record(mode, time.perf_counter() - start, trace_usage.pop(current.trace_id)["model_calls"])
+
+    def summary(self) -> dict:
+        with self._lock:
+            model_calls = {mode: list(calls) for mode, calls in self._model_calls.items()}
+        return {
+            mode: {
+                **latencies.summary(),
+                "mean_model_calls": round(statistics.fmean(model_calls[mode]), 2) if model_calls[mode] else None,
+            }
+            for mode, latencies in self._latencies.items()
+        }
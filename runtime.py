@@ -0,0 +1,51 @@
+"""
+Long-lived event loop for running agents from synchronous code such as Streamlit scripts.
+
+`asyncio.run` creates and closes a fresh event loop on every call, which throws away the
+pooled Open-Meteo connections and the model client's connection pool with it. An
+`AgentRuntime` owns one loop on a background thread for the lifetime of the process;
+agent runs are submitted to it, so those connections survive across runs.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+
+class AgentRuntime:
+    """An event loop running forever on a daemon thread."""
+
+    def __init__(self, name: str = "agent-runtime"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the runtime loop and return a thread-safe future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the runtime loop and block until it finishes."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Cancel outstanding tasks, stop the loop and wait for its thread to exit."""
+        async def cancel_tasks():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.loop.is_running():
+            self.run(cancel_tasks(), timeout)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+        self.loop.close()
@@ -0,0 +1,333 @@
+"""
+Headless HTTP API for the guardrailed orchestrator of app.py, as an ASGI app.
+
+    uvicorn service:app --workers 4 --timeout-graceful-shutdown 30
+    python service.py --workers 4 --port 8000
+
+Endpoints:
+    POST /v1/answer         {"query": ..., "answer_mode"?, "guardrail_mode"?, "routing"?} -> {"output": ...}
+    POST /v1/answer/stream  same body; server-sent events `update` (progress and tokens), then `done` or `error`
+    GET  /healthz           liveness
+    GET  /readyz            503 from SIGTERM on, so a load balancer stops routing new requests here
+    GET  /metrics           Prometheus metrics of this worker
+
+Each worker process runs at most `SERVICE_MAX_CONCURRENT_RUNS` agent runs at once and lets at
+most `SERVICE_MAX_QUEUED_RUNS` more wait for a slot; beyond that, or after waiting
+`SERVICE_QUEUE_TIMEOUT_SECONDS`, requests are shed with 503 and `Retry-After` so the load
+balancer can retry elsewhere instead of the queue growing without bound. On SIGTERM a worker
+stops admitting requests and reports not ready, but keeps its listener open for
+`SERVICE_READINESS_GRACE_SECONDS` so the load balancer sees the failing readiness check before
+uvicorn shuts down; it then waits up to `SERVICE_DRAIN_SECONDS` for running requests to finish.
+
+Workers share Open-Meteo responses through the SQLite cache file in `WEATHER_CACHE_PATH`;
+`python service.py --workers N` sets one up when it is not configured. Each worker pre-warms the
+cells it is asked about most just after every upstream refresh (see `prewarm.py`).
+"""
+from contextlib import asynccontextmanager, suppress
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+
+from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app import run_agent
+from fanout import ROUTING_MODES
+from guardrails import GUARDRAIL_MODES
+import metrics
+import open_meteo
+from prewarm import prewarmer
+from weather_summaries import ANSWER_MODES
+
+MAX_CONCURRENT_RUNS = int(os.getenv("SERVICE_MAX_CONCURRENT_RUNS", "16"))
+MAX_QUEUED_RUNS = int(os.getenv("SERVICE_MAX_QUEUED_RUNS", "32"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("SERVICE_QUEUE_TIMEOUT_SECONDS", "10"))
+RUN_TIMEOUT_SECONDS = float(os.getenv("SERVICE_RUN_TIMEOUT_SECONDS", "120"))
+DRAIN_SECONDS = float(os.getenv("SERVICE_DRAIN_SECONDS", "30"))
+READINESS_GRACE_SECONDS = float(os.getenv("SERVICE_READINESS_GRACE_SECONDS", "5"))
+
+# Seconds a shed client is asked to wait before retrying
+RETRY_AFTER_SECONDS = 1
+
+MAX_QUERY_CHARS = 2000
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised instead of admitting a request; `reason` is "draining", "queue_full" or "queue_timeout"."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Admission:
+    """Per-worker concurrency limit with a bounded wait queue and graceful drain."""
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self.draining = False
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def check(self) -> None:
+        """Raise `Overloaded` if a new request would be shed right now."""
+        if self.draining:
+            raise Overloaded("draining")
+        if self.running + self.waiting >= self.max_concurrent + self.max_queued:
+            raise Overloaded("queue_full")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the worker's run slots, waiting in the queue for at most `queue_timeout`."""
+        self.check()
+        self.waiting += 1
+        self._idle.clear()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded("queue_timeout") from None
+        finally:
+            self.waiting -= 1
+            self._set_idle()
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+            self._set_idle()
+
+    def _set_idle(self) -> None:
+        if self.running == 0 and self.waiting == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop admitting requests and wait for the admitted ones; return False if some were still running."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+admission = Admission(MAX_CONCURRENT_RUNS, MAX_QUEUED_RUNS, QUEUE_TIMEOUT_SECONDS)
+
+requests_shed = metrics.Counter("assistant_requests_shed_total", "Requests rejected by load shedding.", ("reason",))
+metrics.Callback("assistant_queued_runs", "Requests waiting for a run slot in this worker.", "gauge",
+                 lambda: {(): admission.waiting})
+
+
+def overloaded_response(error: Overloaded) -> JSONResponse:
+    requests_shed.inc(reason=error.reason)
+    return JSONResponse(
+        {"error": "overloaded", "reason": error.reason},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+async def parse_request(request: Request) -> dict:
+    """Validate the JSON body and return the keyword arguments for `run_agent`."""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("Body must be a JSON object") from None
+    if not isinstance(body, dict):
+        raise ValueError("Body must be a JSON object")
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("`query` must be a non-empty string")
+    if len(query) > MAX_QUERY_CHARS:
+        raise ValueError(f"`query` must be at most {MAX_QUERY_CHARS} characters")
+    options = {"user_input": query}
+    for name, choices in (("answer_mode", ANSWER_MODES), ("guardrail_mode", GUARDRAIL_MODES), ("routing", ROUTING_MODES)):
+        value = body.get(name, choices[0])
+        if value not in choices:
+            raise ValueError(f"`{name}` must be one of {list(choices)}")
+        options[name] = value
+    return options
+
+
+def error_body(error: Exception) -> tuple:
+    """Return (status code, JSON body) for an exception raised by a run."""
+    if isinstance(error, InputGuardrailTripwireTriggered):
+        return 422, {"error": "input_guardrail", "info": str(error.guardrail_result.output.output_info)}
+    if isinstance(error, OutputGuardrailTripwireTriggered):
+        return 422, {"error": "output_guardrail", "info": str(error.guardrail_result.output.output_info)}
+    if isinstance(error, asyncio.TimeoutError):
+        return 504, {"error": "timeout"}
+    return 500, {"error": "internal", "info": f"{type(error).__name__}: {error}"}
+
+
+async def answer(request: Request):
+    try:
+        options = await parse_request(request)
+    except ValueError as e:
+        return JSONResponse({"error": "bad_request", "info": str(e)}, status_code=400)
+    start = time.perf_counter()
+    try:
+        async with admission.slot():
+            output = await asyncio.wait_for(run_agent(**options), RUN_TIMEOUT_SECONDS)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        status, body = error_body(e)
+        return JSONResponse(body, status_code=status)
+    return JSONResponse({"output": str(output), "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+
+def sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def answer_stream(request: Request):
+    try:
+        options = await parse_request(request)
+        # Shed before the 200 headers go out; the slot itself is taken inside the stream
+        admission.check()
+    except ValueError as e:
+        return JSONResponse({"error": "bad_request", "info": str(e)}, status_code=400)
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    async def events():
+        updates = asyncio.Queue()
+        start = time.perf_counter()
+        try:
+            async with admission.slot():
+                run = asyncio.create_task(asyncio.wait_for(
+                    run_agent(**options, on_update=updates.put_nowait), RUN_TIMEOUT_SECONDS
+                ))
+                try:
+                    while not run.done() or not updates.empty():
+                        getter = asyncio.ensure_future(updates.get())
+                        await asyncio.wait((getter, run), return_when=asyncio.FIRST_COMPLETED)
+                        if getter.done():
+                            update = getter.result()
+                            yield sse("update", {"kind": update.kind, "text": update.text})
+                        else:
+                            getter.cancel()
+                    output = run.result()
+                finally:
+                    # The client went away or the stream failed: stop the run and let it unwind
+                    # before its slot is released
+                    if not run.done():
+                        run.cancel()
+                        with suppress(asyncio.CancelledError):
+                            await run
+            yield sse("done", {"output": str(output), "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+        except Overloaded as e:
+            requests_shed.inc(reason=e.reason)
+            yield sse("error", {"error": "overloaded", "reason": e.reason})
+        except Exception as e:
+            status, body = error_body(e)
+            yield sse("error", {**body, "status": status})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def healthz(request: Request):
+    return PlainTextResponse("ok")
+
+
+async def readyz(request: Request):
+    if admission.draining:
+        return PlainTextResponse("draining", status_code=503)
+    return PlainTextResponse("ok")
+
+
+async def metrics_endpoint(request: Request):
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def install_drain_handler(loop, grace: float):
+    """
+    Make SIGTERM start draining at once and reach the server's own handler `grace` seconds
+    later; a second SIGTERM is passed on immediately. Return the replaced handler, or None if
+    there is no server handler to pass the signal on to (or this is not the main thread).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return None
+
+    def on_sigterm(signum, frame):
+        if admission.draining:
+            previous(signum, frame)
+            return
+        admission.draining = True
+        loop.call_soon_threadsafe(loop.call_later, grace, previous, signum, frame)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    return previous
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Uvicorn installs its signal handlers before the lifespan starts, so this one wraps them
+    server_sigterm = install_drain_handler(asyncio.get_running_loop(), READINESS_GRACE_SECONDS)
+    prewarming = asyncio.create_task(prewarmer.run()) if prewarmer.enabled else None
+    yield
+    if server_sigterm is not None:
+        signal.signal(signal.SIGTERM, server_sigterm)
+    if prewarming is not None:
+        prewarming.cancel()
+    # Uvicorn has stopped accepting connections; let admitted runs finish, then release the pool
+    if not await admission.drain(DRAIN_SECONDS):
+        logger.warning("Drain timed out with %d runs still going", admission.running)
+    await open_meteo.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/answer", answer, methods=["POST"]),
+        Route("/v1/answer/stream", answer_stream, methods=["POST"]),
+        Route("/healthz", healthz),
+        Route("/readyz", readyz),
+        Route("/metrics", metrics_endpoint),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the weather assistant over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    args = parser.parse_args()
+
+    if args.workers > 1 and not os.getenv("WEATHER_CACHE_PATH"):
+        # Workers inherit the environment, so they all open the same cache file
+        os.environ["WEATHER_CACHE_PATH"] = os.path.join(tempfile.gettempdir(), "weather_cache.sqlite3")
+    uvicorn.run(
+        "service:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=DRAIN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
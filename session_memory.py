@@ -0,0 +1,186 @@
+"""
+Bounded conversational memory for the chat app.
+
+`ConversationMemory` keeps the last few turns verbatim, folds older turns into a rolling
+summary, and tracks structured facts the tools discovered: the last resolved place and the
+latest readings fetched per place. `build_input` turns that into the input of the next run,
+so a follow-up like "and tomorrow?" keeps its context while the prompt stays bounded: every
+part has a character cap, so its size does not grow with the length of the chat.
+
+Tools record facts through `remember_place` and `remember_reading`, which write to the
+memory of the run in progress (set with `collecting`) and do nothing outside of one. The
+facts of a run that raises, such as a turn cancelled by a guardrail tripwire, are discarded.
+"""
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import asyncio
+
+from agents import Agent, Runner
+
+import geocoder
+
+# Turns replayed verbatim, and character caps of each part of the memory preamble
+MAX_TURNS = 4
+MAX_MESSAGE_CHARS = 1200
+MAX_SUMMARY_CHARS = 1200
+MAX_READINGS = 4
+
+# Coordinates closer than this (degrees) to the last resolved place are attributed to it
+SAME_PLACE_DEGREES = 0.1
+# Otherwise they are named after the nearest gazetteer place within this distance
+NEAREST_PLACE_KM = 25
+
+summarizer_agent = Agent(
+    name="Conversation Summarizer",
+    instructions=f"""
+    You maintain a running summary of a chat between a user and a weather and air quality assistant.
+    You receive the current summary and the exchanges that are about to leave the chat window.
+    Return an updated summary in at most {MAX_SUMMARY_CHARS // 6} words: the places discussed, what the user
+    wanted to know, the key readings and advice given, and any stated plans or preferences.
+    Write plain sentences without headings, and drop details that later exchanges made obsolete.
+    """,
+    model="gpt-4o-mini",
+)
+
+
+def clip(text: str, limit: int) -> str:
+    """Shorten `text` to at most `limit` characters, cutting at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rsplit(" ", 1)[0] + "…"
+
+
+@dataclass
+class SessionFacts:
+    # Last place resolved by a tool, as returned by `Place.to_dict()`
+    location: dict = None
+    # (kind, place name) -> compact readings line, most recent last
+    readings: OrderedDict = field(default_factory=OrderedDict)
+
+    def place_name(self, latitude: float, longitude: float) -> str:
+        if self.location is not None and abs(self.location["latitude"] - latitude) <= SAME_PLACE_DEGREES \
+                and abs(self.location["longitude"] - longitude) <= SAME_PLACE_DEGREES:
+            return self.location["name"]
+        place, distance_km = geocoder.nearest(latitude, longitude)
+        if distance_km <= NEAREST_PLACE_KM:
+            return place.name
+        return f"{latitude:.2f},{longitude:.2f}"
+
+    def copy(self) -> "SessionFacts":
+        return SessionFacts(self.location, OrderedDict(self.readings))
+
+    def add_reading(self, kind: str, place: str, line: str) -> None:
+        key = (kind, place)
+        self.readings.pop(key, None)
+        self.readings[key] = line
+        while len(self.readings) > MAX_READINGS:
+            self.readings.popitem(last=False)
+
+    def render(self) -> str:
+        lines = []
+        if self.location is not None:
+            place = self.location
+            lines.append(f"Current place: {place['name']}, {place['country_code']} ({place['latitude']}, {place['longitude']})")
+        for (kind, place), line in self.readings.items():
+            lines.append(f"Last {kind.replace('_', ' ')} reading for {place}: {clip(line, 300)}")
+        return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Recent turns, a rolling summary of older ones and tool facts for one chat session."""
+
+    def __init__(self, max_turns: int = MAX_TURNS, max_message_chars: int = MAX_MESSAGE_CHARS,
+                 max_summary_chars: int = MAX_SUMMARY_CHARS):
+        self.max_turns = max_turns
+        self.max_message_chars = max_message_chars
+        self.max_summary_chars = max_summary_chars
+        self.turns = deque()
+        self.summary = ""
+        self.facts = SessionFacts()
+        self._summarizing = None
+
+    def preamble(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        facts = self.facts.render()
+        if facts:
+            parts.append(f"Known facts from earlier tool calls (re-fetch if the user asks for fresh data):\n{facts}")
+        return "\n\n".join(parts)
+
+    async def build_input(self, prompt: str) -> list:
+        """Return the input items for the next run: memory preamble, recent turns, then `prompt`."""
+        if self._summarizing is not None:
+            # A summary update started after the previous answer may still be running
+            await asyncio.shield(self._summarizing)
+        items = []
+        preamble = self.preamble()
+        if preamble:
+            items.append({"role": "developer", "content": preamble})
+        for user, assistant in self.turns:
+            items.append({"role": "user", "content": clip(user, self.max_message_chars)})
+            items.append({"role": "assistant", "content": clip(assistant, self.max_message_chars)})
+        items.append({"role": "user", "content": prompt})
+        return items
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        """Remember a finished turn; turns beyond `max_turns` are summarized in the background."""
+        self.turns.append((user, str(assistant)))
+        evicted = []
+        while len(self.turns) > self.max_turns:
+            evicted.append(self.turns.popleft())
+        if evicted:
+            previous = self._summarizing
+            self._summarizing = asyncio.ensure_future(self._fold(evicted, previous))
+
+    async def _fold(self, evicted: list, previous) -> None:
+        if previous is not None:
+            await previous
+        exchanges = "\n".join(
+            f"User: {clip(user, self.max_message_chars)}\nAssistant: {clip(assistant, self.max_message_chars)}"
+            for user, assistant in evicted
+        )
+        try:
+            result = await Runner.run(
+                summarizer_agent, f"Current summary: {self.summary or '(none)'}\n\nExchanges:\n{exchanges}"
+            )
+            summary = str(result.final_output)
+        except Exception:
+            # Keep the user's questions rather than losing the evicted turns entirely
+            summary = f"{self.summary} " + " ".join(f"The user asked: {clip(user, 120)}" for user, _ in evicted)
+        self.summary = clip(summary, self.max_summary_chars)
+
+    @contextmanager
+    def collecting(self):
+        """
+        Record facts reported by tools while the body runs (including nested specialist runs).
+        They are kept only if the body returns; a run stopped by a guardrail tripwire or any other
+        error leaves the memory as it was.
+        """
+        scratch = self.facts.copy()
+        token = _current_facts.set(scratch)
+        try:
+            yield
+        finally:
+            _current_facts.reset(token)
+        self.facts = scratch
+
+
+_current_facts: ContextVar = ContextVar("session_facts", default=None)
+
+
+def remember_place(place) -> None:
+    """Record a resolved `geocoder.Place` as the current place of the chat, if one is collecting."""
+    facts = _current_facts.get()
+    if facts is not None:
+        facts.location = place.to_dict()
+
+
+def remember_reading(kind: str, line: str, place: str = None, latitude: float = None, longitude: float = None) -> None:
+    """Record the latest `kind` ("weather" or "air_quality") readings for a place, if a chat is collecting."""
+    facts = _current_facts.get()
+    if facts is not None:
+        facts.add_reading(kind, place or facts.place_name(latitude, longitude), line)
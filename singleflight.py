@@ -0,0 +1,105 @@
+"""
+Request coalescing ("single-flight") for concurrent identical fetches.
+
+When several agent runs ask for the same grid cell at the same moment, only the first
+caller goes upstream; everyone else awaits the result of that in-flight call. Flights are
+tracked with thread-safe futures so that runs driven by different event loops (one per
+Streamlit session) are coalesced as well.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share the same key."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._flights = {}  # key -> (concurrent.futures.Future, asyncio.Task)
+        self._lock = threading.Lock()
+
+    async def do(self, key, fn):
+        """
+        Await `fn()` for the first caller of `key`; later callers share its result.
+
+        The call runs in its own task, so cancelling one waiter (including the caller that
+        started it) does not cancel the fetch the other waiters depend on.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                future = concurrent.futures.Future()
+                task = asyncio.get_running_loop().create_task(fn())
+                task.add_done_callback(lambda t: self._finish(key, future, t))
+                self._flights[key] = (future, task)
+                self.leaders += 1
+            else:
+                future = flight[0]
+                self.followers += 1
+        return await asyncio.wrap_future(future)
+
+    async def do_many(self, keys: list, fn) -> list:
+        """
+        Like `do` for several keys at once: the keys with no call in flight are led by a single
+        `fn(leading_keys)` call, which returns their results in order, and the other keys share
+        the results of the flights they joined. Return the results in the order of `keys`.
+        """
+        futures = {}
+        with self._lock:
+            leading = []
+            for key in dict.fromkeys(keys):
+                flight = self._flights.get(key)
+                if flight is None:
+                    futures[key] = concurrent.futures.Future()
+                    leading.append(key)
+                else:
+                    futures[key] = flight[0]
+                    self.followers += 1
+            if leading:
+                task = asyncio.get_running_loop().create_task(fn(leading))
+                task.add_done_callback(lambda t: self._finish_many(leading, futures, t))
+                for key in leading:
+                    self._flights[key] = (futures[key], task)
+                self.leaders += 1
+        return [await asyncio.wrap_future(futures[key]) for key in keys]
+
+    def _finish(self, key, future: concurrent.futures.Future, task: asyncio.Task) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def _finish_many(self, keys: list, futures: dict, task: asyncio.Task) -> None:
+        with self._lock:
+            for key in keys:
+                self._flights.pop(key, None)
+        if task.cancelled():
+            for key in keys:
+                futures[key].cancel()
+        elif task.exception() is not None:
+            for key in keys:
+                futures[key].set_exception(task.exception())
+        else:
+            results = list(task.result())
+            for key, result in zip(keys, results):
+                futures[key].set_result(result)
+            # A short response must not leave the remaining waiters hanging
+            for key in keys[len(results):]:
+                futures[key].set_exception(ValueError(f"Expected {len(keys)} results, got {len(results)}"))
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        """Return how many calls went upstream and how many were coalesced onto them."""
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": self.in_flight(),
+        }
@@ -0,0 +1,233 @@
+"""
+Per-span timings of agent runs, kept for a debug waterfall and exported as OTLP/JSON.
+
+`SpanTimeline` is a tracing processor that records every finished span of a trace: agent
+runs (including specialists run as tools), model calls with their token counts, function
+tools, guardrails, handoffs and the upstream Open-Meteo requests. When a trace ends it is
+kept in a short list of recent traces and, if an export file is configured, appended to it
+as one OTLP/JSON `ExportTraceServiceRequest` per line, the format of the OpenTelemetry
+Collector file exporter, which any OTLP-aware viewer can load.
+
+The export file is taken from the `OTLP_TRACES_FILE` environment variable when a trace ends,
+so it can be set in `.env`; without it traces are only kept in memory.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+from agents import add_trace_processor
+from agents.tracing import TracingProcessor
+
+from run_stats import MODEL_SPAN_TYPES, span_token_usage
+
+# Number of finished traces kept for the debug view
+MAX_RECENT_TRACES = 20
+
+SERVICE_NAME = "weather-assistant"
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+
+@dataclass(frozen=True, slots=True)
+class SpanRecord:
+    span_id: str
+    parent_id: str
+    kind: str
+    name: str
+    start_ns: int
+    end_ns: int
+    attributes: dict
+    error: str = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+@dataclass(slots=True)
+class TraceRecord:
+    trace_id: str
+    name: str
+    start_ns: int
+    end_ns: int = None
+    spans: list = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def waterfall(self) -> list:
+        """Return one row per span, each followed by its children, with offsets in ms from the trace start."""
+        span_ids = {span.span_id for span in self.spans}
+        children = {}
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            parent = span.parent_id if span.parent_id in span_ids else None
+            children.setdefault(parent, []).append(span)
+        rows = []
+        pending = [(span, 0) for span in reversed(children.get(None, []))]
+        while pending:
+            span, depth = pending.pop()
+            rows.append({
+                "span": span.name,
+                "kind": span.kind,
+                "depth": depth,
+                "start_ms": round((span.start_ns - self.start_ns) / 1e6, 1),
+                "end_ms": round((span.end_ns - self.start_ns) / 1e6, 1),
+                "duration_ms": round(span.duration_ms, 1),
+                **{k: v for k, v in span.attributes.items() if k in ("input_tokens", "output_tokens", "triggered")},
+                "error": span.error,
+            })
+            pending.extend((child, depth + 1) for child in reversed(children.get(span.span_id, [])))
+        return rows
+
+
+def _timestamp_ns(value: str) -> int:
+    """Convert an SDK span timestamp (ISO 8601) to nanoseconds since the epoch."""
+    if not value:
+        return time.time_ns()
+    return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def describe_span(span_data) -> tuple:
+    """Return (kind, name, attributes) for a span's data."""
+    exported = span_data.export() or {}
+    kind = exported.get("type", span_data.type)
+    attributes = {}
+    if kind in MODEL_SPAN_TYPES:
+        input_tokens, output_tokens = span_token_usage(span_data)
+        model = exported.get("model") or getattr(getattr(span_data, "response", None), "model", None)
+        attributes.update(input_tokens=input_tokens, output_tokens=output_tokens)
+        if model:
+            attributes["model"] = str(model)
+        name = f"model call ({model})" if model else "model call"
+    elif kind == "handoff":
+        name = f"handoff {exported.get('from_agent')} → {exported.get('to_agent')}"
+    elif kind == "guardrail":
+        name = f"guardrail {exported.get('name')}"
+        attributes["triggered"] = bool(exported.get("triggered"))
+    elif kind == "function":
+        name = f"tool {exported.get('name')}"
+    elif kind == "agent":
+        name = f"agent {exported.get('name')}"
+    else:
+        name = exported.get("name") or kind
+        attributes.update((k, v) for k, v in (exported.get("data") or {}).items() if isinstance(v, (str, int, float, bool)))
+    return kind, name, attributes
+
+
+def _otlp_id(sdk_id: str, length: int) -> str:
+    """OTLP ids are fixed-length hex; the SDK's are `trace_<hex>` / `span_<hex>`."""
+    hex_part = (sdk_id or "").rsplit("_", 1)[-1]
+    return hex_part[:length].rjust(length, "0")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: TraceRecord) -> dict:
+    """Render a finished trace as an OTLP/JSON `ExportTraceServiceRequest`."""
+    trace_id = _otlp_id(trace.trace_id, 32)
+    root_id = _otlp_id(trace.trace_id, 16)
+    spans = [{
+        "traceId": trace_id,
+        "spanId": root_id,
+        "name": trace.name,
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(trace.start_ns),
+        "endTimeUnixNano": str(trace.end_ns),
+        "attributes": [],
+        "status": {"code": STATUS_UNSET},
+    }]
+    for span in trace.spans:
+        attributes = {"agents.span.type": span.kind, **span.attributes}
+        spans.append({
+            "traceId": trace_id,
+            "spanId": _otlp_id(span.span_id, 16),
+            "parentSpanId": _otlp_id(span.parent_id, 16) if span.parent_id else root_id,
+            "name": span.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": span.error} if span.error else {"code": STATUS_UNSET},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "openai-agents"}, "spans": spans}],
+    }]}
+
+
+class SpanTimeline(TracingProcessor):
+    """Records the spans of each trace and keeps the most recent finished traces."""
+
+    def __init__(self, max_traces: int = MAX_RECENT_TRACES):
+        self._active = {}
+        self._recent = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def on_trace_start(self, trace) -> None:
+        with self._lock:
+            self._active[trace.trace_id] = TraceRecord(trace.trace_id, trace.name, time.time_ns())
+
+    def on_trace_end(self, trace) -> None:
+        with self._lock:
+            record = self._active.pop(trace.trace_id, None)
+            if record is None:
+                return
+            record.end_ns = time.time_ns()
+            self._recent.append(record)
+        path = os.getenv("OTLP_TRACES_FILE")
+        if path:
+            with self._lock, open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(to_otlp(record), ensure_ascii=False) + "\n")
+
+    def on_span_start(self, span) -> None:
+        pass
+
+    def on_span_end(self, span) -> None:
+        kind, name, attributes = describe_span(span.span_data)
+        error = span.error.get("message") if span.error else None
+        record = SpanRecord(
+            span.span_id,
+            span.parent_id,
+            kind,
+            name,
+            _timestamp_ns(span.started_at),
+            _timestamp_ns(span.ended_at),
+            attributes,
+            error,
+        )
+        with self._lock:
+            # Spans ending after their trace (e.g. cancelled background tasks) are dropped
+            trace = self._active.get(span.trace_id)
+            if trace is not None:
+                trace.spans.append(record)
+
+    def recent(self) -> list:
+        """Return the finished traces, newest first."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+
+span_timeline = SpanTimeline()
+add_trace_processor(span_timeline)
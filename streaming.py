@@ -0,0 +1,131 @@
+"""
+Streamed agent runs that report tokens and tool/handoff progress as they happen.
+
+`run()` drives an agent either with the blocking `Runner.run` or, when an `on_update`
+callback is given, with `Runner.run_streamed`, forwarding each text delta and progress
+event to the callback and recording the time to first token.
+"""
+from dataclasses import dataclass
+import statistics
+import threading
+import time
+
+from agents import Runner
+from agents.tracing import guardrail_span
+from openai.types.responses import ResponseTextDeltaEvent
+
+
+@dataclass
+class StreamUpdate:
+    # One of "text", "agent", "tool_call", "tool_output", "handoff" or "info"
+    kind: str
+    text: str
+
+
+class LatencySamples:
+    """Thread-safe latency samples with percentile summaries."""
+
+    def __init__(self):
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50_ms": round(statistics.median(samples) * 1000, 1),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 1),
+            "mean_ms": round(statistics.fmean(samples) * 1000, 1),
+        }
+
+
+# Process-wide time-to-first-token samples of streamed runs
+time_to_first_token = LatencySamples()
+
+
+def _call_id(raw_item):
+    return raw_item.get("call_id") if isinstance(raw_item, dict) else getattr(raw_item, "call_id", None)
+
+
+def describe_event(event, tool_names: dict):
+    """
+    Translate a runner stream event into a `StreamUpdate`, or None if it is not shown to users.
+
+    `tool_names` maps tool call ids to tool names so that tool outputs can be labeled.
+    """
+    if event.type == "raw_response_event":
+        if isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+            return StreamUpdate("text", event.data.delta)
+        return None
+    if event.type == "agent_updated_stream_event":
+        return StreamUpdate("agent", event.new_agent.name)
+    if event.name == "tool_called":
+        name = getattr(event.item.raw_item, "name", None) or "tool"
+        tool_names[_call_id(event.item.raw_item)] = name
+        return StreamUpdate("tool_call", name)
+    if event.name == "tool_output":
+        return StreamUpdate("tool_output", tool_names.get(_call_id(event.item.raw_item), "tool"))
+    if event.name == "handoff_occured":
+        return StreamUpdate("handoff", event.item.target_agent.name)
+    return None
+
+
+async def stream(agent, input, on_update, output_check=None, context=None):
+    """
+    Run `agent` with streaming, passing every `StreamUpdate` to `on_update`; return the run result.
+
+    If an incremental `output_check` (see `guardrails.IncrementalProfessionalismCheck`) is given,
+    it replaces the agent's own output guardrails: the text is checked chunk by chunk while it
+    streams, and the run is cancelled as soon as a chunk trips the check. The check is traced as
+    a guardrail span, like the output guardrail it replaces, so trip metrics still count it.
+    """
+    check_span = None
+    if output_check is not None:
+        agent = agent.clone(output_guardrails=[])
+        # Started without becoming current, so the agent's own spans do not nest under it
+        check_span = guardrail_span(output_check.name)
+        check_span.start()
+    start = time.perf_counter()
+    first_token_seen = False
+    tool_names = {}
+    text = ""
+    result = Runner.run_streamed(agent, input, context=context)
+    try:
+        async for event in result.stream_events():
+            update = describe_event(event, tool_names)
+            if update is None:
+                continue
+            if update.kind == "text":
+                if not first_token_seen:
+                    first_token_seen = True
+                    time_to_first_token.record(time.perf_counter() - start)
+                text += update.text
+                if output_check is not None:
+                    output_check.feed(update.text)
+            on_update(update)
+            if output_check is not None and output_check.tripped is not None:
+                result.cancel()
+                raise output_check.tripwire(result.last_agent, text)
+        if output_check is not None and (await output_check.finish()).tripwire_triggered:
+            raise output_check.tripwire(result.last_agent, result.final_output)
+    finally:
+        if output_check is not None:
+            output_check.close()
+            check_span.span_data.triggered = output_check.tripped is not None
+            check_span.finish()
+    return result
+
+
+async def run(agent, input, on_update=None, output_check=None, context=None):
+    """Run `agent` to completion, streaming updates to `on_update` when one is given."""
+    if on_update is None:
+        return await Runner.run(agent, input, context=context)
+    return await stream(agent, input, on_update, output_check, context)
@@ -0,0 +1,277 @@
+"""
+Tiered topic classifier used by the off-topic input guardrail.
+
+Tier 1 is a set of keyword/regex rules that settles greetings and obvious weather, air
+quality or off-topic questions in microseconds. A topic keyword alone is not enough to clear
+an input: it also needs a place or the shape of a question, and words with everyday meanings
+outside weather ("air", "hot", "mask") never count. Only a single short sentence made up of
+topic words, places and times is cleared by the rules; anything more ("...? Also tell me how
+to...", "the temperature at which water boils") goes to the next tier. Tier 2 compares a TF-IDF vector of the
+input's content words against labeled seed examples, and only ever clears an input as
+on-topic: short follow-ups ("what about Bandung?") carry too few words to be rejected
+safely. Everything else, including every follow-up inside a chat history, is escalated to
+the LLM topic classification agent (tier 3).
+"""
+from collections import Counter
+from dataclasses import dataclass
+import math
+import re
+import threading
+
+import geocoder
+
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi+|hello+|hey+|hiya|howdy|yo|greetings|good\s+(morning|afternoon|evening|day)|"
+    r"thanks?|thank\s+you|thx|cheers|bye|goodbye|see\s+you)"
+    r"(\s+(there|all|everyone|team|again|so\s+much|a\s+lot))?[\s!.,?]*$",
+    re.IGNORECASE,
+)
+
+WEATHER_PATTERN = re.compile(
+    r"\b(weather|forecast|temperature|temp|degrees?|celsius|fahrenheit|rain\w*|drizzle|shower|"
+    r"precipitation|humid\w*|wind\w*|breez\w*|gust\w*|sunny|sunshine|cloud\w*|overcast|fog\w*|mist\w*|"
+    r"snow\w*|sleet|hail|storm\w*|thunder\w*|lightning|typhoon|hurricane|monsoon|heat\s*wave|"
+    r"hot|cold|chilly|freezing|warm|umbrella|uv(\s+index)?|dew\s*point|climate)\b",
+    re.IGNORECASE,
+)
+
+AIR_QUALITY_PATTERN = re.compile(
+    r"\b(air(\s+quality)?|aqi|pollut\w*|pm\s*2[.,]?5|pm\s*10|ozone|smog|haze|hazy|smoke|dust|"
+    r"nitrogen\s+dioxide|no2|sulphur\s+dioxide|sulfur\s+dioxide|so2|carbon\s+monoxide|"
+    r"particulates?|allerg\w*|pollen|mask)\b",
+    re.IGNORECASE,
+)
+
+OFF_TOPIC_PATTERN = re.compile(
+    r"(\b\d+(\.\d+)?\s*[-+*/^x]\s*\d+(\.\d+)?\b|\b(recipe|cook\w*|bake|ingredients?|"
+    r"python|javascript|code|coding|program\w*|debug\w*|sql|"
+    r"football|soccer|basketball|score|match|stock\w*|crypto\w*|bitcoin|invest\w*|"
+    r"poem|song|lyrics|movie|film|novel|story|stories|joke|homework|essay|translate|"
+    r"ransomware|malware|virus|keylogger|phishing|hack\w*|exploit\w*|"
+    r"capital\s+of|president|election|politic\w*)\b)",
+    re.IGNORECASE,
+)
+
+# Topic keywords common outside weather ("air fryer", "cold as liquid nitrogen"); they never clear an input
+AMBIGUOUS_TOPIC_PATTERN = re.compile(
+    r"air|hot|cold|chilly|freezing|warm|mask|dust|smoke|temp|degrees?|shower|climate|allerg\w*",
+    re.IGNORECASE,
+)
+
+# Evidence that a keyword is used in a weather or air quality question
+QUESTION_PATTERN = re.compile(
+    r"^\s*(what|whats|what's|how|hows|how's|is|are|was|were|will|would|should|shall|do|does|did|"
+    r"can|could|any|when|where|which)\b|\?\s*$",
+    re.IGNORECASE,
+)
+PLACE_PATTERN = re.compile(r"\b(in|at|near|around|across|over|for)\s+(the\s+)?[A-Z][\w'-]+|(?i:\b(here|outside|outdoors)\b)")
+
+# Inputs the rules may clear: one sentence of at most this many words...
+MAX_RULE_WORDS = 12
+# ...with at most this many content words that are not topic words, places or these context words
+MAX_RULE_OTHER_WORDS = 1
+CONTEXT_WORDS = frozenset({
+    "now", "right", "currently", "current", "today", "tonight", "tomorrow", "yesterday", "morning",
+    "afternoon", "evening", "night", "weekend", "week", "later", "soon", "outside", "outdoors", "level",
+    "levels", "index", "conditions", "expected", "looking", "need", "bring", "wear", "much", "chance",
+})
+SENTENCE_BREAK_PATTERN = re.compile(r"[.?!;:\n]+\s*\S")
+
+# Labeled seed examples for the TF-IDF tier
+ON_TOPIC_EXAMPLES = [
+    "what is the weather like today",
+    "how hot is it right now",
+    "is it going to rain this afternoon",
+    "should i bring an umbrella to work",
+    "do i need a jacket tonight",
+    "what should i wear outside today",
+    "is it a good day for a run outside",
+    "can i go hiking this weekend",
+    "is it safe to go to the beach today",
+    "how windy is it at the coast",
+    "will it be sunny tomorrow",
+    "is the air clean enough to exercise outdoors",
+    "how bad is the air pollution here",
+    "should i wear a mask outside today",
+    "is the air safe for my kids to play outside",
+    "how is the sky looking tonight",
+    "is it humid outside",
+    "what are the conditions outside",
+    "tell me the current conditions",
+    "can i dry my laundry outside today",
+    "is it nice outside",
+    "how are conditions for cycling to work",
+    "is there a storm coming",
+    "good morning what is it like outside",
+    "weather forecast for tomorrow",
+    "temperature and humidity this afternoon",
+    "air quality index and pm2.5 levels",
+    "rain or snow expected this week",
+]
+
+OFF_TOPIC_EXAMPLES = [
+    "what is the capital of france",
+    "write me a python function to sort a list",
+    "how do i cook fried rice",
+    "tell me a joke about cats",
+    "who won the football match last night",
+    "what is the square root of 144",
+    "help me write an essay about history",
+    "translate this sentence into spanish",
+    "what stocks should i buy",
+    "recommend a good movie to watch",
+    "how do i fix my laptop",
+    "explain quantum physics to me",
+    "what is the meaning of life",
+    "book me a flight",
+    "who is the president of the united states",
+    "write a poem about love",
+    "how do i reset my password",
+    "what is your favorite color",
+    "summarize this article for me",
+    "how many calories are in a banana",
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+# Function words dropped before vectorizing, so they cannot tip the TF-IDF margin either way
+STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "it", "its", "s", "this", "that",
+    "these", "those", "there", "here", "i", "me", "my", "we", "us", "our", "you", "your", "he", "she",
+    "they", "them", "their", "what", "whats", "which", "who", "whom", "how", "hows", "when", "where",
+    "why", "about", "of", "to", "in", "on", "at", "for", "with", "by", "from", "into", "and", "or", "but",
+    "so", "if", "then", "than", "do", "does", "did", "can", "could", "should", "would", "will", "shall",
+    "may", "might", "must", "have", "has", "had", "not", "no", "any", "some", "just", "please", "tell",
+    "like", "get", "going", "up",
+})
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def content_words(text: str) -> list:
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+@dataclass
+class TopicDecision:
+    is_off_topic: bool
+    tier: str
+    reasoning: str
+
+
+class TfidfCentroidClassifier:
+    """Cosine similarity of a TF-IDF vector against per-class centroids of seed examples."""
+
+    def __init__(self, on_topic: list, off_topic: list):
+        documents = [content_words(text) for text in on_topic + off_topic]
+        document_frequency = Counter(token for tokens in documents for token in set(tokens))
+        self.idf = {
+            token: math.log((1 + len(documents)) / (1 + count)) + 1
+            for token, count in document_frequency.items()
+        }
+        # Weight of a word no seed example contains
+        self.unseen_idf = math.log(1 + len(documents)) + 1
+        vectors = [self.vectorize(tokens) for tokens in documents]
+        self.on_topic_centroid = self._centroid(vectors[:len(on_topic)])
+        self.off_topic_centroid = self._centroid(vectors[len(on_topic):])
+
+    def vectorize(self, tokens: list) -> dict:
+        # Unseen words stay in the vector, so "air fryer" is mostly unlike either class
+        counts = Counter(tokens)
+        vector = {token: count * self.idf.get(token, self.unseen_idf) for token, count in counts.items()}
+        return self._normalized(vector)
+
+    @staticmethod
+    def _normalized(vector: dict) -> dict:
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {k: v / norm for k, v in vector.items()} if norm else {}
+
+    def _centroid(self, vectors: list) -> dict:
+        total = Counter()
+        for vector in vectors:
+            total.update(vector)
+        return self._normalized(dict(total))
+
+    def margin(self, text: str) -> float:
+        """Return on-topic similarity minus off-topic similarity, in [-1, 1]."""
+        vector = self.vectorize(content_words(text))
+        on_topic = sum(v * self.on_topic_centroid.get(k, 0.0) for k, v in vector.items())
+        off_topic = sum(v * self.off_topic_centroid.get(k, 0.0) for k, v in vector.items())
+        return on_topic - off_topic
+
+
+class TieredTopicClassifier:
+    """Rule and TF-IDF tiers in front of the LLM topic classifier, with per-tier hit counters."""
+
+    TIERS = ("rules", "tfidf", "llm")
+
+    def __init__(self, tfidf_margin: float = 0.15):
+        self.tfidf_margin = tfidf_margin
+        self.tfidf = TfidfCentroidClassifier(ON_TOPIC_EXAMPLES, OFF_TOPIC_EXAMPLES)
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def classify_locally(self, text: str, follow_up: bool = False):
+        """
+        Return a `TopicDecision` from the rule or TF-IDF tier, or None if the input must go to
+        the LLM. A `follow_up` (the latest turn of a chat history) is settled locally only by
+        an on-topic rule, since earlier turns may give it its meaning.
+        """
+        decision = self._classify_by_rules(text)
+        if follow_up and decision is not None and decision.is_off_topic:
+            decision = None
+        elif decision is None and not follow_up:
+            decision = self._classify_by_tfidf(text)
+        self.record(decision.tier if decision else "llm")
+        return decision
+
+    def _classify_by_rules(self, text: str):
+        if GREETING_PATTERN.match(text):
+            return TopicDecision(False, "rules", "The input is a greeting.")
+        matches = [*WEATHER_PATTERN.finditer(text), *AIR_QUALITY_PATTERN.finditer(text)]
+        on_topic = next((m for m in matches if not AMBIGUOUS_TOPIC_PATTERN.fullmatch(m.group(0))), None)
+        off_topic = OFF_TOPIC_PATTERN.search(text)
+        if (on_topic and not off_topic and (QUESTION_PATTERN.search(text) or PLACE_PATTERN.search(text))
+                and self._only_asks_about_topic(text)):
+            return TopicDecision(False, "rules", f"The input asks about '{on_topic.group(0)}'.")
+        if off_topic and not matches:
+            return TopicDecision(True, "rules", f"The input is about '{off_topic.group(0)}', which is unrelated to weather or air quality.")
+        return None
+
+    @staticmethod
+    def _only_asks_about_topic(text: str) -> bool:
+        """Whether `text` is one short sentence of topic words, places and times."""
+        if SENTENCE_BREAK_PATTERN.search(text.strip()) or len(tokenize(text)) > MAX_RULE_WORDS:
+            return False
+        rest = AIR_QUALITY_PATTERN.sub(" ", WEATHER_PATTERN.sub(" ", PLACE_PATTERN.sub(" ", text)))
+        place_words = {word for place in geocoder.find_in_text(text) for word in geocoder.normalize(place.name).split()}
+        other_words = [word for word in content_words(rest) if word not in place_words and word not in CONTEXT_WORDS]
+        return len(other_words) <= MAX_RULE_OTHER_WORDS
+
+    def _classify_by_tfidf(self, text: str):
+        # Only ever clears an input; an off-topic verdict is left to the LLM
+        if OFF_TOPIC_PATTERN.search(text):
+            return None
+        margin = self.tfidf.margin(text)
+        if margin >= self.tfidf_margin:
+            return TopicDecision(False, "tfidf", f"The input resembles weather and air quality questions (margin {margin:.2f}).")
+        return None
+
+    def record(self, tier: str) -> None:
+        with self._lock:
+            self.counts[tier] += 1
+
+    def stats(self) -> dict:
+        """Return the number of inputs settled by each tier and the tier hit rates."""
+        total = sum(self.counts.values())
+        return {
+            "total": total,
+            **{f"{tier}_hits": self.counts[tier] for tier in self.TIERS},
+            **{f"{tier}_rate": self.counts[tier] / total if total else 0.0 for tier in self.TIERS},
+        }
+
+
+# Process-wide classifier shared by the off-topic guardrails
+topic_classifier = TieredTopicClassifier()
@@ -0,0 +1,151 @@
+"""
+Streamlit helpers shared by the apps.
+"""
+import logging
+import queue
+import time
+
+import streamlit as st
+
+import metrics
+from prewarm import prewarmer
+from runtime import AgentRuntime
+
+PROGRESS_LABELS = {
+    "agent": "Running {}",
+    "tool_call": "Calling `{}`",
+    "tool_output": "Received `{}` result",
+    "handoff": "Handed off to {}",
+}
+
+# How often the script thread checks for updates from a run on the agent runtime
+POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def get_runtime() -> AgentRuntime:
+    """Return the agent runtime shared by every session and rerun of this Streamlit server."""
+    return AgentRuntime()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Start the `/metrics` endpoint once per Streamlit server; None if its port is taken."""
+    try:
+        return metrics.start_http_server()
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on port %s: %s", metrics.METRICS_PORT, e)
+        return None
+
+
+@st.cache_resource
+def start_prewarming():
+    """Start pre-warming popular cells on the shared runtime once per Streamlit server; None if disabled."""
+    if not prewarmer.enabled:
+        return None
+    return get_runtime().submit(prewarmer.run())
+
+
+class StreamView:
+    """
+    Renders a streamed agent run: progress events in a status box and tokens as they arrive.
+
+    Use as a context manager around the run; if the run raises (for example on a guardrail
+    tripwire) the partial answer is removed before the exception propagates.
+
+    Runs execute on the agent runtime's loop thread, where Streamlit elements cannot be
+    drawn, so `update` only queues; `wait` renders the queued updates on the script thread.
+    """
+
+    def __init__(self):
+        self.status = st.status("Thinking...", expanded=False)
+        self.notices = st.container()
+        self.placeholder = st.empty()
+        self.updates = queue.SimpleQueue()
+        self.text = ""
+        self.started_at = time.perf_counter()
+        self.first_token_ms = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.placeholder.empty()
+            self.status.update(label="Stopped", state="error")
+        return False
+
+    def update(self, update) -> None:
+        """Callback for `streaming.run`; safe to call from any thread."""
+        self.updates.put(update)
+
+    def wait(self, future):
+        """Render updates until the run behind `future` finishes, then return its result."""
+        try:
+            while not future.done():
+                self._render_pending(timeout=POLL_INTERVAL)
+            self._render_pending()
+            return future.result()
+        except BaseException:
+            # Streamlit stops the script on reruns; do not leave the run going on the runtime
+            future.cancel()
+            raise
+
+    def _render_pending(self, timeout: float = None) -> None:
+        try:
+            self._render(self.updates.get(timeout=timeout) if timeout else self.updates.get_nowait())
+            while True:
+                self._render(self.updates.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _render(self, update) -> None:
+        if update.kind == "info":
+            self.notices.info(update.text)
+            return
+        if update.kind == "text":
+            if self.first_token_ms is None:
+                self.first_token_ms = (time.perf_counter() - self.started_at) * 1000
+                self.status.update(label="Answering...")
+            self.text += update.text
+            self.placeholder.markdown(self.text + "▌")
+            return
+        label = PROGRESS_LABELS[update.kind].format(update.text)
+        self.status.update(label=label)
+        self.status.write(label)
+
+    def finish(self, final_output) -> None:
+        """Replace the streamed text with the final output and report the time to first token."""
+        self.placeholder.markdown(str(final_output))
+        elapsed_ms = (time.perf_counter() - self.started_at) * 1000
+        if self.first_token_ms is not None:
+            label = f"Done in {elapsed_ms:.0f} ms (first token after {self.first_token_ms:.0f} ms)"
+        else:
+            label = f"Done in {elapsed_ms:.0f} ms"
+        self.status.update(label=label, state="complete")
+
+
+def render_waterfall(trace) -> None:
+    """Draw the spans of a `span_timeline.TraceRecord` as a waterfall, one bar per span."""
+    rows = trace.waterfall()
+    if not rows:
+        st.caption("No spans were recorded for this request.")
+        return
+    for index, row in enumerate(rows):
+        # Labels must be unique rows on the axis; the dots show nesting
+        row["label"] = f"{index + 1:>2}. {'· ' * row['depth']}{row['span']}"
+    st.vega_lite_chart({
+        "data": {"values": rows},
+        "mark": {"type": "bar", "cornerRadius": 2},
+        "height": max(120, 22 * len(rows)),
+        "encoding": {
+            "y": {"field": "label", "type": "nominal", "sort": None, "axis": {"title": None, "labelLimit": 320}},
+            "x": {"field": "start_ms", "type": "quantitative", "title": "ms since request start"},
+            "x2": {"field": "end_ms"},
+            "color": {"field": "kind", "type": "nominal", "title": None, "legend": {"orient": "bottom"}},
+            "tooltip": [{"field": k} for k in ("span", "duration_ms", "input_tokens", "output_tokens", "triggered", "error")],
+        },
+    })
+    st.dataframe(rows, column_order=["span", "start_ms", "duration_ms", "input_tokens", "output_tokens", "triggered", "error"])
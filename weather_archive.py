@@ -0,0 +1,312 @@
+"""
+Local archive of hourly weather per grid cell, stored as append-only memory-mapped columns.
+
+"How does today compare to last week?" needs past readings, and fetching them from Open-Meteo
+on every question would make each comparison a slow upstream call. Each grid cell of the
+response cache gets a directory under `WEATHER_ARCHIVE_DIR`/<source> with one raw file per column:
+
+    time.i8           UTC minutes since the epoch (int64)
+    <variable>.f4     one float32 per row for each of `COLUMNS`, NaN where unknown
+    segments.i8       time index: (first time, last time, first row, rows) per sorted run
+    meta.json         the cell's UTC offset and data source
+
+Rows are only ever appended. Each append is a run sorted by time; a run that starts after the
+previous one ends extends it, anything else (a backfill of older days) starts a new segment.
+`read` looks up the segments overlapping a range in the small index, binary-searches their
+slice of the memory-mapped time column and maps only those rows of the value columns, so a
+query touches the pages of its range instead of loading whole files. Where segments overlap,
+the row appended last wins.
+
+The archive fills from the past hours of every forecast the tools fetch and from backfills
+of the ranges history questions ask about, so a range is fetched from Open-Meteo at most once.
+Rows are kept apart by the source they came from: `fakes.install()` points the archive at a
+temporary directory under the "fake" source, so fake readings are never served as history.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+import json
+import os
+import threading
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+from forecast_series import Series, daily_means, local_now
+import metrics
+import open_meteo
+from weather_cache import response_cache
+from weather_summaries import describe_weather_code
+
+ARCHIVE_DIR = os.getenv("WEATHER_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "archive"))
+# Source of the archived rows when they come from the real Open-Meteo API
+ARCHIVE_SOURCE = "open-meteo"
+
+COLUMNS = open_meteo.HISTORY_WEATHER_VARIABLES.split(",")
+
+# Share of the expected hours a range needs before it is answered without a backfill
+MIN_COVERAGE = 0.9
+
+# Longest range and furthest day back a history question may ask about
+MAX_HISTORY_DAYS = 31
+MAX_DAYS_AGO = 3660
+# Ranges longer than this are returned as period totals without a row per day
+MAX_LISTED_DAYS = 14
+
+TIME_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+EPOCH = np.datetime64(0, "m")
+
+archive_lookups = metrics.Counter(
+    "weather_archive_lookups_total", "History lookups by whether the archive had the range.", ("source",)
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Segment:
+    start: int
+    end: int
+    first_row: int
+    rows: int
+
+
+class WeatherArchive:
+    """Append-only columnar files of hourly weather, one directory per grid cell."""
+
+    def __init__(self, root: str = ARCHIVE_DIR, source: str = ARCHIVE_SOURCE):
+        self.root = root
+        self.source = source
+        self.rows_appended = 0
+        self._lock = threading.Lock()
+
+    def use(self, root: str, source: str) -> None:
+        """Read and write the rows of `source` under `root` from now on."""
+        with self._lock:
+            self.root = root
+            self.source = source
+
+    def cell_dir(self, cell: tuple) -> str:
+        return os.path.join(self.root, self.source, f"{cell[0]:+.4f}_{cell[1]:+.4f}")
+
+    def segments(self, cell: tuple) -> list:
+        path = os.path.join(self.cell_dir(cell), "segments.i8")
+        if not os.path.exists(path):
+            return []
+        return [Segment(*map(int, row)) for row in np.fromfile(path, dtype=TIME_DTYPE).reshape(-1, 4)]
+
+    def utc_offset(self, cell: tuple) -> Optional[int]:
+        try:
+            with open(os.path.join(self.cell_dir(cell), "meta.json")) as f:
+                return json.load(f)["utc_offset_seconds"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _map(self, cell: tuple, name: str, dtype: np.dtype, segment: Segment) -> np.ndarray:
+        path = os.path.join(self.cell_dir(cell), name)
+        return np.memmap(path, dtype=dtype, mode="r", offset=segment.first_row * dtype.itemsize, shape=(segment.rows,))
+
+    def read(self, cell: tuple, start: int, end: int) -> tuple:
+        """Return (UTC minutes, {column: values}) of the rows with `start <= time < end`, in time order."""
+        times, columns = [], {name: [] for name in COLUMNS}
+        for segment in self.segments(cell):
+            if segment.end < start or segment.start >= end:
+                continue
+            segment_times = self._map(cell, "time.i8", TIME_DTYPE, segment)
+            i, j = np.searchsorted(segment_times, [start, end])
+            if i == j:
+                continue
+            times.append(np.array(segment_times[i:j]))
+            for name in COLUMNS:
+                columns[name].append(np.array(self._map(cell, f"{name}.f4", VALUE_DTYPE, segment)[i:j], dtype=float))
+        if not times:
+            return np.array([], dtype=TIME_DTYPE), {name: np.array([]) for name in COLUMNS}
+        times = np.concatenate(times)
+        columns = {name: np.concatenate(values) for name, values in columns.items()}
+        if len(times) and np.any(np.diff(times) <= 0):
+            # Overlapping segments: keep the last appended row of each time
+            reverse = times[::-1]
+            _, last = np.unique(reverse, return_index=True)
+            keep = len(times) - 1 - last
+            times = times[keep]
+            columns = {name: values[keep] for name, values in columns.items()}
+        return times, columns
+
+    def append(self, cell: tuple, times: np.ndarray, columns: dict, utc_offset_seconds: int) -> int:
+        """Append rows (UTC minutes and {column: values}) not already archived; return how many were written."""
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        _, unique = np.unique(times, return_index=True)
+        times, order = times[unique], order[unique]
+        if not len(times):
+            return 0
+        known, _ = self.read(cell, int(times[0]), int(times[-1]) + 1)
+        new = ~np.isin(times, known)
+        times, order = times[new], order[new]
+        if not len(times):
+            return 0
+        directory = self.cell_dir(cell)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, open(os.path.join(directory, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = self.segments(cell)
+            # The index is the commit point: rows past its end are leftovers of an interrupted append
+            row = segments[-1].first_row + segments[-1].rows if segments else 0
+            for name in COLUMNS:
+                values = columns.get(name)
+                values = np.full(len(order), np.nan) if values is None else np.asarray(values, dtype=float)[order]
+                self._write(os.path.join(directory, f"{name}.f4"), row, values.astype(VALUE_DTYPE))
+            self._write(os.path.join(directory, "time.i8"), row, times.astype(TIME_DTYPE))
+            if segments and times[0] > segments[-1].end:
+                last = segments.pop()
+                segments.append(Segment(last.start, int(times[-1]), last.first_row, last.rows + len(times)))
+            else:
+                segments.append(Segment(int(times[0]), int(times[-1]), row, len(times)))
+            index = np.array([[s.start, s.end, s.first_row, s.rows] for s in segments], dtype=TIME_DTYPE)
+            self._write(os.path.join(directory, "segments.i8"), 0, index.ravel())
+            with open(os.path.join(directory, "meta.json"), "w") as f:
+                json.dump({"utc_offset_seconds": utc_offset_seconds, "source": self.source}, f)
+        self.rows_appended += len(times)
+        return len(times)
+
+    @staticmethod
+    def _write(path: str, row: int, values: np.ndarray) -> None:
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(row * values.dtype.itemsize)
+            f.write(values.tobytes())
+            f.truncate()
+
+    def record(self, cell: tuple, payload: dict, until=None) -> int:
+        """Archive the hourly rows of an Open-Meteo payload that are before `until` (local time, default now)."""
+        hourly = Series.decode(payload, "hourly")
+        until = local_now(payload) if until is None else until
+        hourly = hourly.select(hourly.time < until)
+        offset = int(payload.get("utc_offset_seconds", 0))
+        times = (hourly.time - EPOCH).astype("timedelta64[m]").astype(np.int64) - offset // 60
+        return self.append(cell, times, hourly.columns, offset)
+
+    def stats(self) -> dict:
+        return {"source": self.source, "rows_appended": self.rows_appended}
+
+
+# Process-wide archive used by the weather tools
+archive = WeatherArchive()
+
+
+class HistoryDay(BaseModel):
+    date: str
+    conditions: str = Field(description="Most severe WMO weather code of the day, decoded")
+    temperature_min_c: Optional[float] = None
+    temperature_max_c: Optional[float] = None
+    temperature_mean_c: Optional[float] = None
+    precipitation_mm: Optional[float] = None
+    humidity_mean_pct: Optional[float] = None
+    wind_max_kmh: Optional[float] = None
+
+
+class WeatherHistorySummary(BaseModel):
+    location: str
+    start_date: str
+    end_date: str
+    hours: int = Field(default=0, description="Hourly readings the summary is computed from")
+    days: list[HistoryDay] = Field(default_factory=list)
+    temperature_min_c: Optional[float] = None
+    temperature_max_c: Optional[float] = None
+    temperature_mean_c: Optional[float] = None
+    precipitation_mm: Optional[float] = None
+    rainy_days: int = 0
+
+    def headline(self) -> str:
+        """One compact line for the chat memory."""
+        return (f"{self.start_date}..{self.end_date}: {self.temperature_min_c}-{self.temperature_max_c}°C "
+                f"mean {self.temperature_mean_c}°C rain {self.precipitation_mm}mm")
+
+
+def _number(value, digits: int = 1):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def summarize_history(location: str, series: Series, start_date: date, end_date: date) -> WeatherHistorySummary:
+    """Aggregate an hourly series in local time into days and period totals."""
+    summary = WeatherHistorySummary(
+        location=location, start_date=start_date.isoformat(), end_date=end_date.isoformat(), hours=len(series)
+    )
+    if not len(series):
+        return summary
+    dates, starts = series.day_starts()
+    temperature = series.get("temperature_2m")
+    precipitation = np.add.reduceat(np.nan_to_num(series.get("precipitation")), starts)
+    with np.errstate(invalid="ignore"):
+        # fmin/fmax skip missing hours; a day with none stays NaN
+        minima = np.fmin.reduceat(temperature, starts)
+        maxima = np.fmax.reduceat(temperature, starts)
+        codes = np.fmax.reduceat(series.get("weathercode"), starts)
+        wind = np.fmax.reduceat(series.get("windspeed_10m"), starts)
+    means = daily_means(series, "temperature_2m")
+    humidity = daily_means(series, "relative_humidity_2m")
+    if len(dates) <= MAX_LISTED_DAYS:
+        summary.days = [
+            HistoryDay(
+                date=str(day),
+                conditions=describe_weather_code(None if np.isnan(codes[i]) else int(codes[i])),
+                temperature_min_c=_number(minima[i]),
+                temperature_max_c=_number(maxima[i]),
+                temperature_mean_c=_number(means[i]),
+                precipitation_mm=_number(precipitation[i]),
+                humidity_mean_pct=_number(humidity[i], 0),
+                wind_max_kmh=_number(wind[i]),
+            )
+            for i, day in enumerate(dates)
+        ]
+    present = temperature[~np.isnan(temperature)]
+    if len(present):
+        summary.temperature_min_c = _number(present.min())
+        summary.temperature_max_c = _number(present.max())
+        summary.temperature_mean_c = _number(present.mean())
+    summary.precipitation_mm = _number(precipitation.sum())
+    summary.rainy_days = int(np.count_nonzero(precipitation >= 1.0))
+    return summary
+
+
+def utc_range(start_date: np.datetime64, end_date: np.datetime64, offset: int) -> tuple:
+    """UTC minutes from local midnight of `start_date` to the end of `end_date` or now, whichever is first."""
+    now = local_now({"utc_offset_seconds": offset})
+    start = (start_date - EPOCH).astype("timedelta64[m]").astype(np.int64)
+    end = min((end_date + 1 - EPOCH).astype("timedelta64[m]").astype(np.int64), (now - EPOCH).astype(np.int64))
+    return int(start) - offset // 60, int(end) - offset // 60
+
+
+async def history(place, days_ago: int, days: int) -> WeatherHistorySummary:
+    """
+    Summarize the weather of `place` over the `days` days ending `days_ago` days before today
+    (local dates), backfilling the range from Open-Meteo if the archive does not cover it.
+    """
+    days = max(1, min(days, MAX_HISTORY_DAYS))
+    days_ago = max(0, min(days_ago, MAX_DAYS_AGO))
+    cell = response_cache.quantize(place.latitude, place.longitude)
+    offset = archive.utc_offset(cell)
+    if offset is None:
+        # Solar time until the cell's first payload tells its real offset
+        offset = round(place.longitude / 15) * 3600
+    end_date = local_now({"utc_offset_seconds": offset}).astype("datetime64[D]") - days_ago
+    start_date = end_date - (days - 1)
+
+    start, end = utc_range(start_date, end_date, offset)
+    times, columns = archive.read(cell, start, end)
+    if len(times) < MIN_COVERAGE * max(1, (end - start) // 60):
+        archive_lookups.inc(source="backfill")
+        payload = await open_meteo.fetch_history(place.latitude, place.longitude, str(start_date), str(end_date))
+        archive.record(cell, payload)
+        offset = int(payload.get("utc_offset_seconds", offset))
+        times, columns = archive.read(cell, *utc_range(start_date, end_date, offset))
+    else:
+        archive_lookups.inc(source="archive")
+    local_times = EPOCH + (times + offset // 60).astype("timedelta64[m]")
+    series = Series(local_times, columns)
+    return summarize_history(place.name, series, start_date.astype(date), end_date.astype(date))
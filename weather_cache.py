@@ -0,0 +1,194 @@
+"""
+TTL + geo-quantized response cache for Open-Meteo tool calls.
+
+Coordinates chosen by the LLM vary slightly between turns ("Jakarta" may come back as
+-6.2 / 106.85 one time and -6.21 / 106.845 the next), so responses are keyed on the
+lat/lon snapped to a configurable grid plus the requested variable set. Entries expire
+at the next upstream refresh boundary, because Open-Meteo only updates the `current`
+block every 15 minutes.
+
+Several worker processes (e.g. `service.py --workers 4`) can share one cache by pointing
+`WEATHER_CACHE_PATH` at a SQLite file: each process keeps its in-memory LRU in front of the
+shared file, so a cell fetched by one worker is served from the file by the others.
+"""
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Open-Meteo refreshes the `current` block every 15 minutes
+UPSTREAM_REFRESH_SECONDS = 900
+
+
+class GeoTTLCache:
+    """LRU cache of API responses keyed on a lat/lon grid cell and a variable set."""
+
+    def __init__(self, grid_degrees: float = 0.1, max_entries: int = 1024,
+                 refresh_seconds: int = UPSTREAM_REFRESH_SECONDS, clock=time.time):
+        self.grid_degrees = grid_degrees
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "GeoTTLCache":
+        """Build a cache configured from WEATHER_CACHE_* environment variables."""
+        settings = dict(
+            grid_degrees=float(os.getenv("WEATHER_CACHE_GRID_DEGREES", "0.1")),
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1024")),
+            refresh_seconds=int(os.getenv("WEATHER_CACHE_REFRESH_SECONDS", str(UPSTREAM_REFRESH_SECONDS))),
+        )
+        path = os.getenv("WEATHER_CACHE_PATH")
+        if path:
+            return SharedGeoTTLCache(path, **settings)
+        return cls(**settings)
+
+    def quantize(self, latitude: float, longitude: float) -> tuple:
+        """Snap coordinates to the center of their grid cell."""
+        step = self.grid_degrees
+        return (round(round(latitude / step) * step, 4), round(round(longitude / step) * step, 4))
+
+    def make_key(self, endpoint: str, latitude: float, longitude: float, variables: str) -> tuple:
+        """Build the cache key for an endpoint, a location and a comma-separated variable set."""
+        cell = self.quantize(latitude, longitude)
+        return (endpoint, cell, ",".join(sorted(variables.split(","))))
+
+    def expires_at(self, now: float) -> float:
+        """Return the next upstream refresh boundary after `now`."""
+        return (now // self.refresh_seconds + 1) * self.refresh_seconds
+
+    def get(self, key: tuple):
+        """Return the cached value for `key`, or None on a miss or an expired entry."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def contains(self, key: tuple) -> bool:
+        """Return whether `key` has an unexpired entry, without counting a lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > self.clock()
+
+    def set(self, key: tuple, value) -> None:
+        """Store `value` until the next refresh boundary, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (self.expires_at(self.clock()), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SharedGeoTTLCache(GeoTTLCache):
+    """
+    `GeoTTLCache` backed by a SQLite file that several processes read and write.
+
+    Lookups try the in-memory LRU first and then the file; a hit in the file is copied into
+    memory with its original expiry. Entries expire at the same refresh boundaries in every
+    process, so the two tiers never disagree for long.
+    """
+
+    def __init__(self, path: str, **settings):
+        super().__init__(**settings)
+        self.path = path
+        self.shared_hits = 0
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections may not be shared between threads, so keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, key: tuple):
+        value = super().get(key)
+        if value is not None:
+            return value
+        now = self.clock()
+        row = self._connection().execute(
+            "SELECT expires_at, value FROM entries WHERE key = ? AND expires_at > ?", (json.dumps(key), now)
+        ).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[1])
+        with self._lock:
+            # Counted as a hit: the lookup did not go upstream
+            self.misses -= 1
+            self.hits += 1
+            self.shared_hits += 1
+            self._entries[key] = (row[0], value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def contains(self, key: tuple) -> bool:
+        if super().contains(key):
+            return True
+        row = self._connection().execute(
+            "SELECT 1 FROM entries WHERE key = ? AND expires_at > ?", (json.dumps(key), self.clock())
+        ).fetchone()
+        return row is not None
+
+    def set(self, key: tuple, value) -> None:
+        super().set(key, value)
+        now = self.clock()
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, expires_at, value) VALUES (?, ?, ?)",
+                (json.dumps(key), self.expires_at(now), json.dumps(value)),
+            )
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+
+    def clear(self) -> None:
+        super().clear()
+        with self._connection() as db:
+            db.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "shared_hits": self.shared_hits}
+
+
+# Process-wide cache shared by all Open-Meteo tool calls
+response_cache = GeoTTLCache.from_env()
@@ -0,0 +1,174 @@
+"""
+Typed summaries of Open-Meteo payloads, computed locally for the "data tools" answer mode.
+
+In the "specialist agents" mode every specialist is an LLM agent that reads the raw JSON and
+writes prose, which the orchestrator then rewrites. In the "data tools" mode the orchestrator
+calls plain function tools that decode weather codes, band AQI values and flag thresholds
+here, so the only model work left is the orchestrator's own answer.
+"""
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+# Answer modes of the agents-as-tools apps
+ANSWER_MODES = ("specialist agents", "data tools")
+
+# WMO weather interpretation codes used by Open-Meteo
+WEATHER_CODES = {
+    0: "clear sky",
+    1: "mainly clear",
+    2: "partly cloudy",
+    3: "overcast",
+    45: "fog",
+    48: "depositing rime fog",
+    51: "light drizzle",
+    53: "moderate drizzle",
+    55: "dense drizzle",
+    56: "light freezing drizzle",
+    57: "dense freezing drizzle",
+    61: "slight rain",
+    63: "moderate rain",
+    65: "heavy rain",
+    66: "light freezing rain",
+    67: "heavy freezing rain",
+    71: "slight snowfall",
+    73: "moderate snowfall",
+    75: "heavy snowfall",
+    77: "snow grains",
+    80: "slight rain showers",
+    81: "moderate rain showers",
+    82: "violent rain showers",
+    85: "slight snow showers",
+    86: "heavy snow showers",
+    95: "thunderstorm",
+    96: "thunderstorm with slight hail",
+    99: "thunderstorm with heavy hail",
+}
+
+# Upper bounds of the European and US AQI bands
+EUROPEAN_AQI_BANDS = [(20, "good"), (40, "fair"), (60, "moderate"), (80, "poor"), (100, "very poor")]
+EUROPEAN_AQI_TOP_BAND = "extremely poor"
+US_AQI_BANDS = [
+    (50, "good"),
+    (100, "moderate"),
+    (150, "unhealthy for sensitive groups"),
+    (200, "unhealthy"),
+    (300, "very unhealthy"),
+]
+US_AQI_TOP_BAND = "hazardous"
+
+# Pollutant concentrations (µg/m³) above the WHO 2021 air quality guidelines
+POLLUTANT_GUIDELINES = {
+    "pm2_5": 15,
+    "pm10": 45,
+    "ozone": 100,
+    "nitrogen_dioxide": 25,
+    "sulphur_dioxide": 40,
+    "carbon_monoxide": 4000,
+}
+
+# Weather thresholds that call for precautions
+HEAT_FEELS_LIKE_C = 35
+FREEZING_C = 0
+HEAVY_RAIN_MM = 7.6
+STRONG_WIND_KMH = 50
+
+COMPASS_POINTS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+
+
+class WeatherSummary(BaseModel):
+    location: str
+    observed_at: Optional[str] = None
+    conditions: str = Field(description="Decoded WMO weather code")
+    temperature_c: Optional[float] = None
+    feels_like_c: Optional[float] = None
+    humidity_pct: Optional[float] = None
+    dew_point_c: Optional[float] = None
+    precipitation_mm: Optional[float] = None
+    wind_kmh: Optional[float] = None
+    wind_from: Optional[str] = Field(default=None, description="Compass direction the wind blows from")
+    flags: list[str] = Field(default_factory=list, description="Conditions that need precautions")
+
+
+class AirQualitySummary(BaseModel):
+    location: str
+    observed_at: Optional[str] = None
+    european_aqi: Optional[float] = None
+    european_band: Optional[str] = None
+    us_aqi: Optional[float] = None
+    us_band: Optional[str] = None
+    pollutants_ugm3: dict[str, float] = Field(default_factory=dict)
+    flags: list[str] = Field(default_factory=list, description="Pollutants above WHO guidelines")
+
+
+def describe_weather_code(code) -> str:
+    if code is None:
+        return "unknown"
+    return WEATHER_CODES.get(int(code), f"unknown (code {code})")
+
+
+def band(value, bands: list, top_band: str):
+    """Return the name of the band `value` falls in, or None if there is no value."""
+    if value is None:
+        return None
+    for upper, name in bands:
+        if value <= upper:
+            return name
+    return top_band
+
+
+def compass(degrees):
+    if degrees is None:
+        return None
+    return COMPASS_POINTS[round(degrees / 45) % 8]
+
+
+def summarize_weather(location: str, payload: dict) -> WeatherSummary:
+    """Summarize an Open-Meteo forecast payload with a `current` block."""
+    current = payload.get("current", {})
+    code = current.get("weathercode")
+    summary = WeatherSummary(
+        location=location,
+        observed_at=current.get("time"),
+        conditions=describe_weather_code(code),
+        temperature_c=current.get("temperature_2m"),
+        feels_like_c=current.get("apparent_temperature"),
+        humidity_pct=current.get("relative_humidity_2m"),
+        dew_point_c=current.get("dew_point_2m"),
+        precipitation_mm=current.get("precipitation"),
+        wind_kmh=current.get("windspeed_10m"),
+        wind_from=compass(current.get("winddirection_10m")),
+    )
+    if code is not None and 95 <= code <= 99:
+        summary.flags.append("thunderstorm")
+    if summary.feels_like_c is not None and summary.feels_like_c >= HEAT_FEELS_LIKE_C:
+        summary.flags.append("extreme heat")
+    if summary.temperature_c is not None and summary.temperature_c <= FREEZING_C:
+        summary.flags.append("freezing")
+    if summary.precipitation_mm is not None and summary.precipitation_mm >= HEAVY_RAIN_MM:
+        summary.flags.append("heavy rain")
+    if summary.wind_kmh is not None and summary.wind_kmh >= STRONG_WIND_KMH:
+        summary.flags.append("strong wind")
+    return summary
+
+
+def summarize_air_quality(location: str, payload: dict) -> AirQualitySummary:
+    """Summarize an Open-Meteo air quality payload with a `current` block."""
+    current = payload.get("current", {})
+    pollutants = {
+        name: current[name] for name in POLLUTANT_GUIDELINES if current.get(name) is not None
+    }
+    return AirQualitySummary(
+        location=location,
+        observed_at=current.get("time"),
+        european_aqi=current.get("european_aqi"),
+        european_band=band(current.get("european_aqi"), EUROPEAN_AQI_BANDS, EUROPEAN_AQI_TOP_BAND),
+        us_aqi=current.get("us_aqi"),
+        us_band=band(current.get("us_aqi"), US_AQI_BANDS, US_AQI_TOP_BAND),
+        pollutants_ugm3=pollutants,
+        flags=[
+            f"{name} above WHO guideline ({value} > {POLLUTANT_GUIDELINES[name]})"
+            for name, value in pollutants.items()
+            if value > POLLUTANT_GUIDELINES[name]
+        ],
+    )
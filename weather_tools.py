@@ -0,0 +1,266 @@
+"""
+Function tools shared by every weather and air quality agent.
+"""
+from agents import function_tool
+from typing import Optional
+import httpx
+
+from forecast_series import summarize_air_quality_forecast, summarize_weather_forecast
+import geocoder
+import open_meteo
+from payload_decoder import decode_current
+from session_memory import remember_place, remember_reading
+from weather_archive import archive, history
+from weather_cache import response_cache
+from weather_summaries import summarize_air_quality, summarize_weather
+
+# Upper bound on the places fetched by one batch tool call
+MAX_BATCH_LOCATIONS = 50
+
+def unknown_location(location: str) -> str:
+    return f"Unknown location: {location}. Pass its latitude and longitude if you know them, or ask the user for a nearby city."
+
+@function_tool
+async def get_current_weather(latitude: float, longitude: float) -> str:
+    """
+    Fetches current weather data for a given location using the Open-Meteo API.
+
+    Args:
+        latitude (float): The latitude of the location.
+        longitude (float): The longitude of the location.
+
+    Returns:
+        str: The observation time and readings as `name=value` pairs with units (weather_code is a WMO code), or an error message if the request fails.
+    """
+    try:
+        payload = await open_meteo.fetch_current_weather(latitude, longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch weather data: {e}"
+    readings = decode_current(payload, open_meteo.CURRENT_WEATHER_VARIABLES).compact()
+    remember_reading("weather", readings, latitude=latitude, longitude=longitude)
+    return readings
+
+@function_tool
+async def get_current_air_quality(latitude: float, longitude: float) -> str:
+    """
+    Fetches current air quality data for a given location using the Open-Meteo API.
+
+    Args:
+        latitude (float): The latitude of the location.
+        longitude (float): The longitude of the location.
+
+    Returns:
+        str: The observation time and readings as `name=value` pairs with units, or an error message if the request fails.
+    """
+    try:
+        payload = await open_meteo.fetch_current_air_quality(latitude, longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch air quality data: {e}"
+    readings = decode_current(payload, open_meteo.CURRENT_AIR_QUALITY_VARIABLES).compact()
+    remember_reading("air_quality", readings, latitude=latitude, longitude=longitude)
+    return readings
+
+async def _fetch_batch(locations: list, fetch, variables: str, kind: str) -> str:
+    """Geocode `locations`, fetch all known places with one request and return a line per place."""
+    requested = locations[:MAX_BATCH_LOCATIONS]
+    places = [geocoder.resolve(location) for location in requested]
+    found = [place for place in places if place is not None]
+    try:
+        payloads = iter(await fetch([(place.latitude, place.longitude) for place in found]) if found else [])
+    except httpx.HTTPError as e:
+        return f"Failed to fetch {kind} data: {e}"
+    lines = []
+    for location, place in zip(requested, places):
+        if place is None:
+            lines.append(f"{location}: unknown location, retry it with coordinates or ask the user for a nearby city")
+            continue
+        readings = decode_current(next(payloads), variables).compact()
+        remember_reading(kind.replace(" ", "_"), readings, place=place.name)
+        lines.append(f"{place.name}: {readings}")
+    if len(locations) > MAX_BATCH_LOCATIONS:
+        lines.append(f"Only the first {MAX_BATCH_LOCATIONS} locations were fetched.")
+    return "\n".join(lines)
+
+@function_tool
+async def get_current_weather_batch(locations: list[str]) -> str:
+    """
+    Fetches current weather data for several places with a single Open-Meteo request.
+    Use it instead of repeated `get_current_weather` calls when a question is about more than one place.
+
+    Args:
+        locations (list[str]): City names, each optionally followed by a comma and an ISO country code (e.g. ["Jakarta", "Portland, US"]).
+            For a place the gazetteer does not know, add its coordinates in parentheses (e.g. "Tromsø (69.65, 18.96)").
+
+    Returns:
+        str: One line per place with its readings as `name=value` pairs with units, or an error message if the request fails.
+    """
+    return await _fetch_batch(locations, open_meteo.fetch_current_weather_batch, open_meteo.CURRENT_WEATHER_VARIABLES, "weather")
+
+@function_tool
+async def get_current_air_quality_batch(locations: list[str]) -> str:
+    """
+    Fetches current air quality data for several places with a single Open-Meteo request.
+    Use it instead of repeated `get_current_air_quality` calls when a question is about more than one place.
+
+    Args:
+        locations (list[str]): City names, each optionally followed by a comma and an ISO country code (e.g. ["Jakarta", "Portland, US"]).
+            For a place the gazetteer does not know, add its coordinates in parentheses (e.g. "Tromsø (69.65, 18.96)").
+
+    Returns:
+        str: One line per place with its readings as `name=value` pairs with units, or an error message if the request fails.
+    """
+    return await _fetch_batch(locations, open_meteo.fetch_current_air_quality_batch, open_meteo.CURRENT_AIR_QUALITY_VARIABLES, "air quality")
+
+@function_tool
+def geocode(place: str) -> dict:
+    """
+    Resolves a place name to coordinates using the bundled offline gazetteer.
+
+    Args:
+        place (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+
+    Returns:
+        dict: The matched place name, country code, latitude and longitude, or an error message if the place is unknown.
+    """
+    match = geocoder.lookup(place)
+    if match is None:
+        return {"error": f"Unknown place: {place}. Use its latitude and longitude if you know them, or ask the user for a nearby city."}
+    remember_place(match)
+    return match.to_dict()
+
+@function_tool
+async def get_weather_summary(location: str, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """
+    Returns a summary of the current weather for a place, with the weather code decoded and
+    flags for conditions that need precautions.
+
+    Args:
+        location (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+        latitude (float | None): The latitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+        longitude (float | None): The longitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+
+    Returns:
+        str: The weather summary as JSON, or an error message if the place is unknown or the request fails.
+    """
+    place = geocoder.resolve(location, latitude, longitude)
+    if place is None:
+        return unknown_location(location)
+    try:
+        payload = await open_meteo.fetch_current_weather(place.latitude, place.longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch weather data: {e}"
+    remember_place(place)
+    remember_reading("weather", decode_current(payload, open_meteo.CURRENT_WEATHER_VARIABLES).compact(), place=place.name)
+    return summarize_weather(place.name, payload).model_dump_json(exclude_none=True)
+
+@function_tool
+async def get_air_quality_summary(location: str, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """
+    Returns a summary of the current air quality for a place, with AQI bands and flags for
+    pollutants above the WHO guidelines.
+
+    Args:
+        location (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+        latitude (float | None): The latitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+        longitude (float | None): The longitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+
+    Returns:
+        str: The air quality summary as JSON, or an error message if the place is unknown or the request fails.
+    """
+    place = geocoder.resolve(location, latitude, longitude)
+    if place is None:
+        return unknown_location(location)
+    try:
+        payload = await open_meteo.fetch_current_air_quality(place.latitude, place.longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch air quality data: {e}"
+    remember_place(place)
+    remember_reading("air_quality", decode_current(payload, open_meteo.CURRENT_AIR_QUALITY_VARIABLES).compact(), place=place.name)
+    return summarize_air_quality(place.name, payload).model_dump_json(exclude_none=True)
+
+@function_tool
+async def get_weather_forecast(location: str, days: int = 2, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """
+    Returns the hourly weather forecast for a place, summarized: each day's temperature range,
+    rain chance and peak UV hour, the periods when rain is likely, the best hours to be outdoors
+    and conditions that need precautions. Use it for questions about later today, tonight,
+    tomorrow or the coming days.
+
+    Args:
+        location (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+        days (int): Days to cover starting today: 1 for the rest of today, 2 to include tomorrow, up to 7.
+        latitude (float | None): The latitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+        longitude (float | None): The longitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+
+    Returns:
+        str: The forecast summary as JSON with local times, or an error message if the place is unknown or the request fails.
+    """
+    place = geocoder.resolve(location, latitude, longitude)
+    if place is None:
+        return unknown_location(location)
+    try:
+        payload = await open_meteo.fetch_weather_forecast(place.latitude, place.longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch weather forecast: {e}"
+    # The hours already past are observations worth keeping for history questions
+    archive.record(response_cache.quantize(place.latitude, place.longitude), payload)
+    summary = summarize_weather_forecast(place.name, payload, days=max(1, min(days, open_meteo.FORECAST_DAYS)))
+    remember_place(place)
+    remember_reading("weather_forecast", summary.headline(), place=place.name)
+    return summary.model_dump_json(exclude_none=True)
+
+@function_tool
+async def get_air_quality_forecast(location: str, days: int = 2, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """
+    Returns the hourly air quality forecast for a place, summarized: each day's peak AQI and its
+    hour, daily mean pollutants against the WHO guidelines, the periods of poor air and the
+    cleanest daytime hours. Use it for questions about later today, tomorrow or the coming days.
+
+    Args:
+        location (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+        days (int): Days to cover starting today: 1 for the rest of today, 2 to include tomorrow, up to 7.
+        latitude (float | None): The latitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+        longitude (float | None): The longitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+
+    Returns:
+        str: The forecast summary as JSON with local times, or an error message if the place is unknown or the request fails.
+    """
+    place = geocoder.resolve(location, latitude, longitude)
+    if place is None:
+        return unknown_location(location)
+    try:
+        payload = await open_meteo.fetch_air_quality_forecast(place.latitude, place.longitude)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch air quality forecast: {e}"
+    summary = summarize_air_quality_forecast(place.name, payload, days=max(1, min(days, open_meteo.FORECAST_DAYS)))
+    remember_place(place)
+    remember_reading("air_quality_forecast", summary.headline(), place=place.name)
+    return summary.model_dump_json(exclude_none=True)
+
+@function_tool
+async def get_weather_history(location: str, days_ago: int = 7, days: int = 1, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """
+    Returns past weather for a place from the local archive: per-day temperature range and mean,
+    rain, humidity, wind and conditions, plus totals for the period. Use it to compare today with
+    yesterday, last week or the same day last year; fetch today's readings with the current tools.
+
+    Args:
+        location (str): The city name, optionally followed by a comma and an ISO country code (e.g. "Portland, US").
+        days_ago (int): How many days before today the period ends: 1 for yesterday, 7 for a week ago, 365 for a year ago.
+        days (int): Length of the period in days, ending on that day (up to 31).
+        latitude (float | None): The latitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+        longitude (float | None): The longitude of the place, used if the gazetteer does not know the place or knows another place of that name.
+
+    Returns:
+        str: The history summary as JSON with local dates, or an error message if the place is unknown or the request fails.
+    """
+    place = geocoder.resolve(location, latitude, longitude)
+    if place is None:
+        return unknown_location(location)
+    try:
+        summary = await history(place, days_ago, days)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch weather history: {e}"
+    remember_place(place)
+    remember_reading("weather_history", summary.headline(), place=place.name)
+    return summary.model_dump_json(exclude_none=True)